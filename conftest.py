@@ -0,0 +1,19 @@
+import pytest
+
+
+@pytest.fixture(scope='session', autouse=True)
+def yatube_test_settings(django_test_environment):
+    from core.testing import test_settings
+
+    with test_settings():
+        yield
+
+
+@pytest.fixture(autouse=True)
+def drain_thumbnail_pool():
+    # Тесты с transaction=True выполняют on_commit, и пул миниатюр не
+    # должен работать с базой, которую следующий тест уже очищает.
+    yield
+    from posts.thumbnails import wait_for_thumbnails
+
+    wait_for_thumbnails()
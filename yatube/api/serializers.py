@@ -0,0 +1,39 @@
+from rest_framework import serializers
+
+from posts.models import Comment, Post
+
+
+class CommentSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field='username', read_only=True)
+
+    class Meta:
+        model = Comment
+        fields = ('id', 'author', 'text', 'created')
+
+
+class PostSerializer(serializers.ModelSerializer):
+    author = serializers.SlugRelatedField(
+        slug_field='username', read_only=True)
+    group = serializers.SlugRelatedField(slug_field='slug', read_only=True)
+
+    class Meta:
+        model = Post
+        fields = (
+            'id',
+            'text',
+            'pub_date',
+            'updated',
+            'author',
+            'group',
+            'image',
+            'thumbnail',
+            'comments_count',
+        )
+
+
+class PostDetailSerializer(PostSerializer):
+    comments = CommentSerializer(many=True, read_only=True)
+
+    class Meta(PostSerializer.Meta):
+        fields = PostSerializer.Meta.fields + ('comments',)
@@ -0,0 +1,242 @@
+import json
+from http import HTTPStatus
+
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, User
+
+TEST_USERNAME = 'test-user'
+TEST_READER_USERNAME = 'test-reader'
+TEST_POST_TEXT = 'Тест текст поста'
+TEST_EDITED_POST_TEXT = 'Исправленный текст поста'
+TEST_COMMENT_TEXT = 'Тестовый текст комментария'
+TEST_GROUP_TITLE = 'Тест группа'
+TEST_GROUP_SLUG = 'test-slug'
+TEST_GROUP_DESCRIPTION = 'Тест описание группы'
+
+
+class FeedApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP_TITLE,
+            slug=TEST_GROUP_SLUG,
+            description=TEST_GROUP_DESCRIPTION,
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=TEST_POST_TEXT, author=cls.user, group=cls.group)
+            for _ in range(3)
+        ]
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.feeds = [
+            reverse('api:index'),
+            reverse('api:group', kwargs={'slug': TEST_GROUP_SLUG}),
+            reverse('api:profile', kwargs={'username': TEST_USERNAME}),
+            reverse('api:follow'),
+            reverse('api:post', kwargs={'post_id': cls.posts[0].pk}),
+        ]
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedApiTests.reader)
+
+    def test_feeds_return_posts(self):
+        """Ленты API отдают посты с автором, группой и счётчиком."""
+        for url in FeedApiTests.feeds[:-1]:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                post = response.json()['results'][0]
+                self.assertEqual(post['id'], FeedApiTests.posts[-1].pk)
+                self.assertEqual(post['author'], TEST_USERNAME)
+                self.assertEqual(post['group'], TEST_GROUP_SLUG)
+                self.assertEqual(post['comments_count'], 0)
+
+    def test_post_detail_contains_comments(self):
+        """Пост в API отдаётся вместе с комментариями."""
+        Comment.objects.create(
+            post=FeedApiTests.posts[0],
+            author=FeedApiTests.reader,
+            text=TEST_COMMENT_TEXT,
+        )
+        response = self.guest_client.get(FeedApiTests.feeds[-1])
+        data = response.json()
+        self.assertEqual(data['comments_count'], 1)
+        self.assertEqual(data['comments'][0]['author'], TEST_READER_USERNAME)
+
+    def test_follow_feed_requires_authentication(self):
+        """Лента подписок недоступна анониму."""
+        response = self.guest_client.get(reverse('api:follow'))
+        self.assertIn(
+            response.status_code,
+            (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN),
+        )
+
+    def test_unchanged_feeds_return_not_modified(self):
+        """По совпавшему ETag приходит 304 без тела."""
+        for url in FeedApiTests.feeds:
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertFalse(response.has_header('Last-Modified'))
+                response = self.authorized_client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag'])
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.content, b'')
+
+    def test_changes_invalidate_etag(self):
+        """Правка поста и новый комментарий меняют ETag."""
+        url = FeedApiTests.feeds[0]
+        etag = self.guest_client.get(url)['ETag']
+        post = FeedApiTests.posts[-1]
+        post.text = TEST_EDITED_POST_TEXT
+        post.save()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        Comment.objects.create(
+            post=post, author=FeedApiTests.reader, text=TEST_COMMENT_TEXT)
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_deleted_post_invalidates_etag(self):
+        """Удаление самого нового поста ленты меняет ETag."""
+        url = FeedApiTests.feeds[0]
+        etag = self.guest_client.get(url)['ETag']
+        Post.objects.filter(pk=FeedApiTests.posts[-1].pk).delete()
+        response = self.guest_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(SORT_POSTS=2)
+    def test_feed_pages_by_cursor(self):
+        """Ссылка next ведёт на следующую страницу ленты."""
+        data = self.guest_client.get(reverse('api:index')).json()
+        self.assertIsNone(data['previous'])
+        data = self.guest_client.get(data['next']).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [FeedApiTests.posts[0].pk],
+        )
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+    def test_feed_queries_do_not_depend_on_page_size(self):
+        """Лента API делает одинаковое число запросов на любой странице."""
+        queries = []
+        for page_size in (1, 3):
+            with override_settings(SORT_POSTS=page_size):
+                with CaptureQueriesContext(connection) as captured:
+                    self.guest_client.get(reverse('api:index'))
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+
+class ImportApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ImportApiTests.user)
+
+    def post_ndjson(self, client, body):
+        return client.post(
+            reverse('api:import'),
+            data=body,
+            content_type='application/x-ndjson',
+        )
+
+    def test_import_creates_posts_of_current_user(self):
+        """Импорт создаёт посты от имени пользователя и сообщает ошибки."""
+        body = '\n'.join([
+            json.dumps({'text': TEST_POST_TEXT}),
+            json.dumps({'text': ''}),
+        ])
+        response = self.post_ndjson(self.authorized_client, body)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertEqual(data['posts'], 1)
+        self.assertEqual(data['errors'][0]['line'], 2)
+        self.assertTrue(Post.objects.filter(
+            author=ImportApiTests.user, text=TEST_POST_TEXT).exists())
+
+    def test_import_rejects_bad_batch_size(self):
+        """Размер пачки меньше единицы или не число — ошибка 400."""
+        for batch_size in ('-1', '0', 'many'):
+            with self.subTest(batch_size=batch_size):
+                response = self.authorized_client.post(
+                    f'{reverse("api:import")}?batch_size={batch_size}',
+                    data=json.dumps({'text': TEST_POST_TEXT}),
+                    content_type='application/x-ndjson',
+                )
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+
+    def test_import_requires_authentication(self):
+        """Аноним не может импортировать посты."""
+        response = self.post_ndjson(
+            self.guest_client, json.dumps({'text': TEST_POST_TEXT}))
+        self.assertIn(
+            response.status_code,
+            (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN),
+        )
+        self.assertFalse(Post.objects.exists())
+
+
+class ExportApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.admin = User.objects.create_user(
+            username=TEST_READER_USERNAME, is_staff=True)
+        Post.objects.create(text=TEST_POST_TEXT, author=cls.user)
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ExportApiTests.user)
+        self.admin_client = Client()
+        self.admin_client.force_login(ExportApiTests.admin)
+
+    def export_url(self, table, export_format):
+        return reverse(
+            'api:export',
+            kwargs={'table': table, 'export_format': export_format},
+        )
+
+    def test_admin_streams_export(self):
+        """Администратор получает потоковую выгрузку таблицы."""
+        response = self.admin_client.get(self.export_url('posts', 'ndjson'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(rows[0])['text'], TEST_POST_TEXT)
+
+    def test_export_is_admin_only(self):
+        """Обычный пользователь выгрузку не получает."""
+        response = self.authorized_client.get(
+            self.export_url('posts', 'csv'))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_export_rejects_bad_params(self):
+        """Неизвестная таблица или формат дают 400."""
+        for url in (
+            self.export_url('users', 'csv'),
+            self.export_url('posts', 'xml'),
+        ):
+            with self.subTest(url=url):
+                response = self.admin_client.get(url)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.BAD_REQUEST)
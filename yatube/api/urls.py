@@ -0,0 +1,37 @@
+from django.urls import include, path
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView,
+    TokenRefreshView,
+)
+
+from . import views
+
+app_name = 'api'
+
+v1_patterns = [
+    path('posts/', views.FeedView.as_view(), name='index'),
+    path('posts/<int:post_id>/', views.PostDetailView.as_view(), name='post'),
+    path(
+        'groups/<slug:slug>/posts/',
+        views.GroupFeedView.as_view(),
+        name='group',
+    ),
+    path(
+        'profiles/<str:username>/posts/',
+        views.AuthorFeedView.as_view(),
+        name='profile',
+    ),
+    path('follow/', views.FollowFeedView.as_view(), name='follow'),
+    path('import/', views.ImportView.as_view(), name='import'),
+    path(
+        'export/<str:table>.<str:export_format>',
+        views.ExportView.as_view(),
+        name='export',
+    ),
+    path('jwt/create/', TokenObtainPairView.as_view(), name='jwt_create'),
+    path('jwt/refresh/', TokenRefreshView.as_view(), name='jwt_refresh'),
+]
+
+urlpatterns = [
+    path('v1/', include(v1_patterns)),
+]
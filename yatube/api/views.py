@@ -0,0 +1,180 @@
+import hashlib
+
+from django.conf import settings
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from posts.feeds import (
+    author_feed,
+    follow_feed,
+    group_feed,
+    index_feed,
+    paginate,
+    post_detail_queryset,
+)
+from posts.exporter import CONTENT_TYPES, export_lines, parse_since
+from posts.importer import import_lines
+from posts.models import Comment, Group, User
+
+from .serializers import PostDetailSerializer, PostSerializer
+
+# Меняется вместе с форматом ответов, чтобы старые ETag не совпадали.
+ETAG_VERSION = 'v1'
+
+
+def make_etag(posts, *extra):
+    """
+    ETag набора постов. Версия поста — Post.updated: она сдвигается при
+    правке, смене имени автора или группы и готовности миниатюры;
+    добавление и удаление комментариев видно по comments_count, новые и
+    удалённые посты — по набору id. Last-Modified не отдаётся: дата
+    последней правки не меняется, когда пост или комментарий удаляют.
+    """
+    digest = hashlib.md5(ETAG_VERSION.encode())
+    for post in posts:
+        digest.update(
+            f'{post.pk}:{post.updated.isoformat()}:{post.comments_count};'
+            .encode()
+        )
+    for value in extra:
+        digest.update(f'{value};'.encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def conditional(request, posts, *extra):
+    """
+    Возвращает (ответ 304/412 или None, заголовки валидаторов) —
+    до сериализации, чтобы неизменённая страница не собиралась заново.
+    """
+    etag = make_etag(posts, *extra)
+    headers = {'ETag': etag}
+    not_modified = get_conditional_response(request, etag=etag)
+    if not_modified is not None:
+        not_modified['ETag'] = etag
+    return not_modified, headers
+
+
+class FeedView(APIView):
+    """
+    Лента постов страницами по SORT_POSTS с курсорами ?after= и
+    ?before=, как на HTML-страницах. feed — функция ленты из
+    posts.feeds; ленты владельца переопределяют get_feed.
+    """
+    feed = staticmethod(index_feed)
+
+    def get_feed(self):
+        return self.feed()
+
+    def page_url(self, param, cursor):
+        if cursor is None:
+            return None
+        return self.request.build_absolute_uri(
+            f'{self.request.path}?{param}={cursor}')
+
+    def get(self, request, *args, **kwargs):
+        page = paginate(request, self.get_feed(), settings.SORT_POSTS)
+        posts = list(page)
+        not_modified, headers = conditional(
+            request, posts, page.next_cursor, page.previous_cursor)
+        if not_modified is not None:
+            return not_modified
+        serializer = PostSerializer(
+            posts, many=True, context={'request': request})
+        data = {
+            'next': self.page_url('after', page.next_cursor),
+            'previous': self.page_url('before', page.previous_cursor),
+            'results': serializer.data,
+        }
+        return Response(data, headers=headers)
+
+
+class GroupFeedView(FeedView):
+    feed = staticmethod(group_feed)
+
+    def get_feed(self):
+        return self.feed(
+            get_object_or_404(Group, slug=self.kwargs['slug']))
+
+
+class AuthorFeedView(FeedView):
+    feed = staticmethod(author_feed)
+
+    def get_feed(self):
+        return self.feed(
+            get_object_or_404(User, username=self.kwargs['username']))
+
+
+class FollowFeedView(FeedView):
+    permission_classes = (IsAuthenticated,)
+    feed = staticmethod(follow_feed)
+
+    def get_feed(self):
+        return self.feed(self.request.user)
+
+
+class PostDetailView(APIView):
+    def get(self, request, post_id):
+        post = get_object_or_404(post_detail_queryset(), pk=post_id)
+        not_modified, headers = conditional(request, [post])
+        if not_modified is not None:
+            return not_modified
+        prefetch_related_objects([post], Prefetch(
+            'comments', queryset=Comment.objects.select_related('author')))
+        serializer = PostDetailSerializer(post, context={'request': request})
+        return Response(serializer.data, headers=headers)
+
+
+class ImportView(APIView):
+    """
+    Массовый импорт постов и комментариев текущего пользователя из тела
+    запроса в NDJSON. Тело читается построчно, не целиком в память.
+    """
+    permission_classes = (IsAuthenticated,)
+
+    def post(self, request):
+        batch_size = request.query_params.get('batch_size')
+        if batch_size is not None:
+            try:
+                batch_size = int(batch_size)
+            except ValueError:
+                batch_size = 0
+            if batch_size < 1:
+                raise ValidationError(
+                    {'batch_size': 'Ожидается целое число больше нуля.'})
+            batch_size = min(batch_size, settings.IMPORT_BATCH_SIZE)
+        report = import_lines(
+            request.stream or (), request.user, batch_size=batch_size)
+        return Response(report)
+
+
+class ExportView(APIView):
+    """
+    Потоковая выгрузка таблицы для администраторов: /export/posts.csv
+    или /export/posts.ndjson, продолжение с ?after_id= или ?since=.
+    """
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, table, export_format):
+        params = request.query_params
+        try:
+            after_id = params.get('after_id')
+            since = params.get('since')
+            lines = export_lines(
+                table,
+                export_format,
+                after_id=int(after_id) if after_id else None,
+                since=parse_since(since) if since else None,
+            )
+        except ValueError as error:
+            raise ValidationError(str(error))
+        response = StreamingHttpResponse(
+            lines, content_type=CONTENT_TYPES[export_format])
+        response['Content-Disposition'] = (
+            f'attachment; filename="{table}.{export_format}"')
+        return response
@@ -0,0 +1,159 @@
+"""
+ASGI для Django 2.2, в котором нет ни ASGI, ни асинхронных представлений.
+
+Событийный цикл сервера (uvicorn) держит соединения и читает тело
+запроса, а представления Django, по-прежнему синхронные, выполняются в
+ограниченном пуле из ASGI_THREADS потоков. Медленный клиент занимает
+только сопрограмму: поток берётся, когда запрос прочитан целиком, и
+освобождается, как только готов ответ, — отправляет его событийный цикл.
+
+Потоковый ответ (выгрузка таблиц) читается в том же потоке, в котором
+начат запрос: его курсор привязан к соединению с базой этого потока.
+Ответ с атрибутом async_streaming_content (асинхронный итератор, как у
+живой ленты posts.live) отдаётся из событийного цикла и потока не
+занимает; свою синхронную работу такой итератор выполняет в пуле
+обработчика — он доступен через executor.
+В конце запроса вызывается response.close(), чтобы Django, как и под
+WSGI, закрыл старые соединения с базой; у ответа с
+async_streaming_content — только когда поток отправлен или клиент
+отключился, иначе сигнал request_finished закрыл бы соединения, которые
+поток ещё читает.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from tempfile import SpooledTemporaryFile
+from types import SimpleNamespace
+
+from asgiref.wsgi import WsgiToAsgiInstance
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+
+# Пул обработчика, который выполняет текущий запрос; вне core.asgi —
+# None, то есть пул событийного цикла по умолчанию.
+executor = ContextVar('executor', default=None)
+
+
+class ASGIHandler:
+    def __init__(self, threads=None):
+        self.wsgi_application = get_wsgi_application()
+        self.executor = ThreadPoolExecutor(
+            threads or settings.ASGI_THREADS, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Неподдерживаемый тип {scope["type"]}.')
+        executor.set(self.executor)
+        with SpooledTemporaryFile(
+                max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE) as body:
+            while True:
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    return
+                body.write(message.get('body', b''))
+                if not message.get('more_body'):
+                    break
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            start, content = await loop.run_in_executor(
+                self.executor, self.run, scope, body, loop, send)
+        if isinstance(content, bytes):
+            await send(start)
+            await send({'type': 'http.response.body', 'body': content})
+        elif content is not None:
+            try:
+                await self.stream(start, content, receive, send)
+            finally:
+                await loop.run_in_executor(self.executor, content.close)
+
+    async def stream(self, start, response, receive, send):
+        """
+        Отправляет response.async_streaming_content, пока клиент не
+        отключится.
+        """
+        async def send_chunks():
+            await send(start)
+            async for chunk in response.async_streaming_content:
+                await send({
+                    'type': 'http.response.body',
+                    'body': response.make_bytes(chunk),
+                    'more_body': True,
+                })
+            await send({'type': 'http.response.body'})
+
+        async def wait_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+
+        sending = asyncio.ensure_future(send_chunks())
+        disconnect = asyncio.ensure_future(wait_disconnect())
+        await asyncio.wait(
+            (sending, disconnect), return_when=asyncio.FIRST_COMPLETED)
+        disconnect.cancel()
+        if not sending.done():
+            sending.cancel()
+        elif not sending.cancelled():
+            sending.result()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def run(self, scope, body, loop, send):
+        """
+        Выполняется в потоке пула. Возвращает начало и тело обычного
+        ответа или ответ с async_streaming_content для событийного
+        цикла; прочие потоковые ответы отправляет сам.
+        """
+        start = {}
+
+        def start_response(status, headers, exc_info=None):
+            # Django пишет Set-Cookie с пробелом в начале значения, а
+            # серверы ASGI такие заголовки отвергают.
+            start.update(
+                type='http.response.start',
+                status=int(status.split(' ', 1)[0]),
+                headers=[
+                    (name.lower().encode('latin1'),
+                     value.strip().encode('latin1'))
+                    for name, value in headers
+                ],
+            )
+
+        environ = WsgiToAsgiInstance.build_environ(
+            SimpleNamespace(scope=scope), scope, body)
+        response = self.wsgi_application(environ, start_response)
+        close = True
+        try:
+            if not getattr(response, 'streaming', False):
+                return start, b''.join(response)
+            if hasattr(response, 'async_streaming_content'):
+                # Закроет __call__, когда поток будет отправлен.
+                close = False
+                return start, response
+            self.send_from_thread(loop, send, start)
+            for chunk in response:
+                if chunk:
+                    self.send_from_thread(loop, send, {
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            self.send_from_thread(loop, send, {'type': 'http.response.body'})
+            return None, None
+        finally:
+            if close:
+                response.close()
+
+    @staticmethod
+    def send_from_thread(loop, send, message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
@@ -0,0 +1,203 @@
+"""
+Бэкенд sqlite3 с настройкой соединений из DATABASES[...]['OPTIONS']:
+
+    'pragmas' — PRAGMA, выполняемые при каждом новом соединении
+        (journal_mode, synchronous, mmap_size, cache_size, busy_timeout,
+        temp_store и любые другие);
+    'transaction_mode' — режим BEGIN для transaction.atomic: DEFERRED
+        (как у Django), IMMEDIATE или EXCLUSIVE;
+    'pool_size' — сколько закрытых соединений держать открытыми в пуле
+        процесса для следующих запросов (0 — без пула).
+
+И ключ CONN_HEALTH_CHECKS самой базы, как в Django 4.1: постоянное
+соединение (CONN_MAX_AGE) проверяется запросом SELECT 1 перед первым
+запросом к базе в следующем HTTP-запросе, соединение из пула — когда
+его берут. CONN_MAX_AGE > 0 ограничивает жизнь соединения и в пуле:
+отслужившее срок или сломанное соединение закрывается, а не
+возвращается в пул; при CONN_MAX_AGE = 0 соединение уходит в пул после
+каждого запроса.
+
+В режиме WAL читатели не ждут писателя. IMMEDIATE берёт блокировку
+записи в начале транзакции, и писатели ждут друг друга busy_timeout.
+При DEFERRED транзакция, которая сначала читала, а потом пишет, сразу
+падает с «database is locked», если писатель уже есть.
+Остальные ключи OPTIONS, как обычно, уходят в sqlite3.connect().
+
+Пул нужен многопоточным серверам: без него у каждого потока своё
+соединение, и при CONN_MAX_AGE = 0 оно открывается заново на каждый
+запрос. Время открытия соединений за запрос копится в connect_seconds.
+"""
+import os
+import re
+import threading
+import time
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+PRAGMA_VALUE = re.compile(r'-?\w+')
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+CUSTOM_OPTIONS = ('pragmas', 'transaction_mode', 'pool_size')
+
+
+class ConnectionPool:
+    """
+    Свободные соединения sqlite3 одной базы, общие для потоков процесса.
+    После fork пул не используется: соединения SQLite нельзя переносить
+    в дочерний процесс.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.pid = os.getpid()
+        self.idle = []
+        self.lock = threading.Lock()
+
+    def take(self):
+        """(соединение, время открытия) или (None, None)."""
+        with self.lock:
+            if self.pid != os.getpid():
+                self.idle, self.pid = [], os.getpid()
+            return self.idle.pop() if self.idle else (None, None)
+
+    def give_back(self, connection, created_at):
+        """False, если пул полон и соединение надо закрыть."""
+        with self.lock:
+            if self.pid != os.getpid() or len(self.idle) >= self.size:
+                return False
+            self.idle.append((connection, created_at))
+            return True
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, size):
+    with _pools_lock:
+        if name not in _pools:
+            _pools[name] = ConnectionPool(size)
+        return _pools[name]
+
+
+def is_alive(connection):
+    try:
+        connection.execute('SELECT 1')
+    except base.Database.Error:
+        return False
+    return True
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('pragmas', {}))
+        for name, value in self.pragmas.items():
+            if not (name.isidentifier() and PRAGMA_VALUE.fullmatch(
+                    str(value))):
+                raise ImproperlyConfigured(
+                    f'Недопустимая PRAGMA {name} = {value!r}.')
+        self.transaction_mode = options.get(
+            'transaction_mode', 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'Неизвестный transaction_mode {self.transaction_mode}.')
+        self.connect_seconds = 0.0
+        self.created_at = None
+        self.health_check_done = False
+
+    @property
+    def pool(self):
+        size = self.settings_dict['OPTIONS'].get('pool_size', 0)
+        if not size or self.is_in_memory_db():
+            return None
+        return get_pool(self.settings_dict['NAME'], size)
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        for option in CUSTOM_OPTIONS:
+            params.pop(option, None)
+        return params
+
+    @property
+    def health_checks(self):
+        return bool(self.settings_dict.get('CONN_HEALTH_CHECKS'))
+
+    def is_expired(self, created_at):
+        # time.time(), как close_at в Django 2.2.
+        max_age = self.settings_dict['CONN_MAX_AGE']
+        return bool(max_age) and time.time() - created_at >= max_age
+
+    def connect(self):
+        started = time.perf_counter()
+        super().connect()
+        self.connect_seconds += time.perf_counter() - started
+        # Срок жизни считается от открытия соединения, а не от того,
+        # когда его взяли из пула.
+        max_age = self.settings_dict['CONN_MAX_AGE']
+        if max_age:
+            self.close_at = self.created_at + max_age
+        self.health_check_done = True
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        while pool is not None:
+            connection, created_at = pool.take()
+            if connection is None:
+                break
+            if not self.is_expired(created_at) and (
+                    not self.health_checks or is_alive(connection)):
+                self.created_at = created_at
+                return connection
+            connection.close()
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        self.created_at = time.time()
+        return connection
+
+    def is_usable(self):
+        return is_alive(self.connection)
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if self.connection is not None:
+            # Оставленное соединение проверяется при первом использовании.
+            self.health_check_done = False
+
+    def close_if_health_check_failed(self):
+        if (
+            self.connection is None
+            or self.health_check_done
+            or not self.health_checks
+        ):
+            return
+        if not self.is_usable():
+            # Мёртвое соединение не должно вернуться в пул.
+            self.errors_occurred = True
+            self.close()
+        self.health_check_done = True
+
+    def _cursor(self, name=None):
+        self.close_if_health_check_failed()
+        return super()._cursor(name)
+
+    def _close(self):
+        pool = self.pool
+        if (
+            pool is not None
+            and self.connection is not None
+            and not self.in_atomic_block
+            and not self.errors_occurred
+            and not self.is_expired(self.created_at)
+        ):
+            if self.connection.in_transaction:
+                self.connection.rollback()
+            if pool.give_back(self.connection, self.created_at):
+                return
+        super()._close()
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
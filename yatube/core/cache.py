@@ -0,0 +1,286 @@
+import functools
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+MEMORY_PREFIX = 'memory:'
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    'key TEXT PRIMARY KEY, '
+    'value BLOB NOT NULL, '
+    'expires REAL, '
+    'accessed REAL NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+)
+# Чтение обновляет время доступа для LRU не чаще раза в секунду,
+# иначе каждый get превращался бы в запись.
+ACCESS_RESOLUTION = 1.0
+SQLITE_INTEGER = range(-2 ** 63, 2 ** 63)
+# Базы в памяти открыты в режиме shared cache: там конфликт блокировок
+# таблицы сразу даёт «database table is locked», busy_timeout не ждёт.
+# Поэтому потоки процесса обращаются к такой базе по очереди.
+_memory_locks = defaultdict(threading.RLock)
+
+
+def connect(location, busy_timeout):
+    """
+    Соединение в режиме autocommit с файлом SQLite, общим для процессов,
+    или с базой memory:<имя> в памяти процесса.
+    """
+    if location.startswith(MEMORY_PREFIX):
+        name = location[len(MEMORY_PREFIX):]
+        return sqlite3.connect(
+            f'file:{name}?mode=memory&cache=shared',
+            uri=True,
+            timeout=busy_timeout,
+            isolation_level=None,
+        )
+    directory = os.path.dirname(location)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    connection = sqlite3.connect(
+        location,
+        timeout=busy_timeout,
+        isolation_level=None,
+    )
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    return connection
+
+
+def serialized(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кэш в файле SQLite, общий для всех процессов-воркеров на сервере.
+
+    Запись идёт в режиме WAL, поэтому читатели не ждут писателей.
+    Целые числа хранятся как INTEGER, остальное — в pickle; incr и add
+    выполняются в транзакции BEGIN IMMEDIATE и атомарны между процессами.
+    При переполнении MAX_ENTRIES вытесняются давно не читавшиеся записи;
+    проверка делается раз в CULL_EVERY записей каждого потока.
+
+    LOCATION — путь к файлу или memory:<имя> для общей базы в памяти
+    одного процесса (для тестов и разработки).
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._location = location
+        self._busy_timeout = float(options.get('BUSY_TIMEOUT', 5))
+        self._cull_every = int(options.get('CULL_EVERY', 50))
+        self._local = threading.local()
+        self._lock = (
+            _memory_locks[location] if location.startswith(MEMORY_PREFIX)
+            else nullcontext()
+        )
+
+    @property
+    def _connection(self):
+        local = self._local
+        if getattr(local, 'pid', None) != os.getpid():
+            local.connection = self._connect()
+            local.pid = os.getpid()
+            local.writes = 0
+        return local.connection
+
+    def _connect(self):
+        connection = connect(self._location, self._busy_timeout)
+        for statement in SCHEMA:
+            connection.execute(statement)
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        connection = self._connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def _encode(self, value):
+        if type(value) is int and value in SQLITE_INTEGER:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _decode(self, value):
+        if isinstance(value, int):
+            return value
+        return pickle.loads(value)
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @serialized
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            cursor = connection.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, accessed) '
+                'VALUES (?, ?, ?, ?)',
+                (
+                    key,
+                    self._encode(value),
+                    self.get_backend_timeout(timeout),
+                    now,
+                ),
+            )
+            added = cursor.rowcount == 1
+        if added:
+            self._maybe_cull()
+        return added
+
+    @serialized
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        connection = self._connection
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,),
+        ).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        if expires is not None and expires <= now:
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                (key, now),
+            )
+            return default
+        if now - accessed > ACCESS_RESOLUTION:
+            connection.execute(
+                'UPDATE cache SET accessed = ? WHERE key = ?', (now, key))
+        return self._decode(value)
+
+    @serialized
+    def get_many(self, keys, version=None):
+        made_keys = {self._key(key, version): key for key in keys}
+        if not made_keys:
+            return {}
+        now = time.time()
+        placeholders = ', '.join('?' * len(made_keys))
+        rows = self._connection.execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+            'AND (expires IS NULL OR expires > ?)',
+            (*made_keys, now),
+        ).fetchall()
+        return {made_keys[key]: self._decode(value) for key, value in rows}
+
+    @serialized
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        self._connection.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires, accessed) '
+            'VALUES (?, ?, ?, ?)',
+            (
+                key,
+                self._encode(value),
+                self.get_backend_timeout(timeout),
+                time.time(),
+            ),
+        )
+        self._maybe_cull()
+
+    @serialized
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        cursor = self._connection.execute(
+            'UPDATE cache SET expires = ? '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    @serialized
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        now = time.time()
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT value FROM cache '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, now),
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = self._decode(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ?, accessed = ? WHERE key = ?',
+                (self._encode(value), now, key),
+            )
+        return value
+
+    @serialized
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection.execute(
+            'SELECT 1 FROM cache '
+            'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (key, time.time()),
+        ).fetchone()
+        return row is not None
+
+    @serialized
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        cursor = self._connection.execute(
+            'DELETE FROM cache WHERE key = ?', (key,))
+        return cursor.rowcount == 1
+
+    @serialized
+    def delete_many(self, keys, version=None):
+        self._connection.executemany(
+            'DELETE FROM cache WHERE key = ?',
+            ((self._key(key, version),) for key in keys),
+        )
+
+    @serialized
+    def clear(self):
+        self._connection.execute('DELETE FROM cache')
+
+    def _maybe_cull(self):
+        self._local.writes += 1
+        if self._local.writes % self._cull_every == 0:
+            self._cull()
+
+    def _cull(self):
+        with self._transaction() as connection:
+            connection.execute(
+                'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()[0]
+            if count <= self._max_entries:
+                return
+            if self._cull_frequency == 0:
+                connection.execute('DELETE FROM cache')
+                return
+            connection.execute(
+                'DELETE FROM cache WHERE key IN ('
+                'SELECT key FROM cache ORDER BY accessed LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
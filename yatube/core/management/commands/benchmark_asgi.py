@@ -0,0 +1,201 @@
+import asyncio
+import multiprocessing
+import socket
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.db import connections
+
+HOST = '127.0.0.1'
+STARTUP_TIMEOUT = 10
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+class PooledWSGIServer(ThreadingMixIn, WSGIServer):
+    """Сервер WSGI с пулом потоков, как gunicorn --threads."""
+    threads = 1
+    request_queue_size = 1024
+
+    def process_request(self, request, client_address):
+        if not hasattr(self, 'executor'):
+            self.executor = ThreadPoolExecutor(self.threads)
+        self.executor.submit(
+            self.process_request_thread, request, client_address)
+
+
+def production_mode():
+    """
+    В дочернем процессе сервера: без панели отладки и журнала запросов,
+    которые иначе занимают большую часть времени ответа.
+    """
+    settings.DEBUG = False
+
+
+def serve_wsgi(port, threads):
+    production_mode()
+    PooledWSGIServer.threads = threads
+    server = make_server(
+        HOST,
+        port,
+        get_wsgi_application(),
+        server_class=PooledWSGIServer,
+        handler_class=QuietHandler,
+    )
+    server.serve_forever()
+
+
+def serve_asgi(port, threads):
+    import uvicorn
+
+    from core.asgi import ASGIHandler
+
+    production_mode()
+    uvicorn.run(
+        ASGIHandler(threads),
+        host=HOST,
+        port=port,
+        log_level='warning',
+        backlog=1024,
+    )
+
+
+SERVERS = {'wsgi': serve_wsgi, 'asgi': serve_asgi}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port):
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Сервер на порту {port} не запустился.')
+
+
+async def fetch(port, path, header_delay=0.0):
+    """
+    GET-запрос; при header_delay заголовки уходят по одному с паузой,
+    как у клиента на медленной сети.
+    """
+    reader, writer = await asyncio.open_connection(HOST, port)
+    try:
+        lines = [
+            f'GET {path} HTTP/1.1\r\n',
+            f'Host: {HOST}\r\n',
+            'User-Agent: yatube-benchmark\r\n',
+            'Accept: text/html\r\n',
+            'Connection: close\r\n',
+            '\r\n',
+        ]
+        if header_delay:
+            for line in lines:
+                writer.write(line.encode())
+                await writer.drain()
+                await asyncio.sleep(header_delay)
+        else:
+            writer.write(''.join(lines).encode())
+        status = (await reader.readline()).split()
+        await reader.read()
+        return int(status[1]) if len(status) > 1 else None
+    finally:
+        writer.close()
+
+
+async def load(port, path, seconds, clients, slow_clients, header_delay):
+    deadline = time.monotonic() + seconds
+    latencies, errors = [], 0
+
+    async def fast_client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.monotonic()
+            try:
+                status = await fetch(port, path)
+            except OSError:
+                status = None
+            if status == 200:
+                latencies.append(time.monotonic() - started)
+            else:
+                errors += 1
+
+    async def slow_client():
+        while time.monotonic() < deadline:
+            try:
+                await fetch(port, path, header_delay)
+            except OSError:
+                pass
+
+    await asyncio.gather(
+        *(fast_client() for _ in range(clients)),
+        *(slow_client() for _ in range(slow_clients)),
+    )
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест: одна и та же страница под WSGI-сервером с '
+        'пулом потоков и под ASGI (uvicorn, core.asgi) с таким же пулом, '
+        'пока медленные клиенты по капле шлют заголовки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=10)
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument('--slow-clients', type=int, default=50)
+        parser.add_argument('--header-delay', type=float, default=0.2)
+        parser.add_argument('--threads', type=int, default=None)
+        parser.add_argument('--path', default='/')
+
+    def handle(self, *args, **options):
+        threads = options['threads'] or settings.ASGI_THREADS
+        context = multiprocessing.get_context('fork')
+        for name, serve in SERVERS.items():
+            connections.close_all()
+            port = free_port()
+            server = context.Process(
+                target=serve, args=(port, threads), daemon=True)
+            server.start()
+            try:
+                wait_for_port(port)
+                latencies, errors = asyncio.run(load(
+                    port,
+                    options['path'],
+                    options['seconds'],
+                    options['clients'],
+                    options['slow_clients'],
+                    options['header_delay'],
+                ))
+            finally:
+                server.terminate()
+                server.join()
+            self.report(name, latencies, errors, options['seconds'])
+
+    def report(self, name, latencies, errors, seconds):
+        if not latencies:
+            self.stdout.write(f'{name}: ни одного ответа, ошибок {errors}')
+            return
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        self.stdout.write(
+            f'{name}: {len(latencies) / seconds:.0f} запросов/с, '
+            f'p50 {statistics.median(latencies) * 1000:.1f} мс, '
+            f'p99 {p99 * 1000:.1f} мс, ошибок {errors}'
+        )
@@ -0,0 +1,69 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.test import Client
+from django.urls import reverse
+
+# Адрес не из INTERNAL_IPS, чтобы не включалась панель отладки.
+REMOTE_ADDR = '192.0.2.1'
+# Режим → (CONN_MAX_AGE, pool_size).
+MODES = {
+    'per-request': (0, 0),
+    'persistent': (60, 0),
+    'pool': (0, 4),
+}
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает время ответа страницы при новом соединении с базой '
+        'на каждый запрос, постоянном соединении (CONN_MAX_AGE) и пуле. '
+        'Запросы HEAD, чтобы не попадать в кэш страниц для анонимов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--url-name', default='posts:index')
+
+    def request(self, client, url):
+        # Тестовый клиент отключает close_old_connections, а сервер WSGI
+        # вызывает его в начале и в конце каждого запроса.
+        close_old_connections()
+        client.head(url)
+        close_old_connections()
+
+    def handle(self, *args, **options):
+        database = connections[DEFAULT_DB_ALIAS]
+        settings_dict = database.settings_dict
+        saved = settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS'].copy()
+        url = reverse(options['url_name'])
+        client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        try:
+            for mode, (max_age, pool_size) in MODES.items():
+                database.close()
+                settings_dict['CONN_MAX_AGE'] = max_age
+                settings_dict['OPTIONS']['pool_size'] = pool_size
+                self.request(client, url)
+                durations, connects = [], []
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    self.request(client, url)
+                    durations.append(time.perf_counter() - started)
+                    # Обнуляет ConnectionTimingMiddleware в начале запроса.
+                    connects.append(database.connect_seconds * 1000)
+                self.stdout.write(
+                    f'{mode}: p50 {percentile(durations, 0.5) * 1000:.2f} '
+                    f'мс, p95 {percentile(durations, 0.95) * 1000:.2f} мс, '
+                    f'p99 {percentile(durations, 0.99) * 1000:.2f} мс, '
+                    f'открытие соединения {statistics.mean(connects):.3f} мс'
+                )
+        finally:
+            database.close()
+            settings_dict['CONN_MAX_AGE'], settings_dict['OPTIONS'] = saved
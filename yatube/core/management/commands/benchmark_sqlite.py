@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, connections, transaction
+
+BENCHMARK_ALIAS = 'benchmark'
+READ_SQL = 'SELECT id, author, text FROM benchmark ORDER BY id DESC LIMIT 10'
+COUNT_SQL = 'SELECT COUNT(*) FROM benchmark WHERE author = %s'
+INSERT_SQL = 'INSERT INTO benchmark (author, text) VALUES (%s, %s)'
+BENCHMARK_TEXT = 'Пост для нагрузочного теста ' * 8
+
+
+def benchmark_databases(directory):
+    """Стандартный бэкенд Django и настроенный из DATABASES."""
+    tuned = connection.settings_dict
+    return {
+        'stock': {
+            **tuned,
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.path.join(directory, 'stock.sqlite3'),
+            'OPTIONS': {},
+        },
+        'tuned': {
+            **tuned,
+            'NAME': os.path.join(directory, 'tuned.sqlite3'),
+        },
+    }
+
+
+def run_worker(settings_dict, kind, number, deadline, results):
+    """
+    Читатель выбирает последние строки, писатель в одной транзакции
+    читает и пишет — как add_comment, который проверяет пост и
+    сохраняет комментарий.
+    """
+    connections.databases[BENCHMARK_ALIAS] = settings_dict
+    database = connections[BENCHMARK_ALIAS]
+    done = errors = 0
+    while time.monotonic() < deadline:
+        try:
+            if kind == 'read':
+                with database.cursor() as cursor:
+                    cursor.execute(READ_SQL)
+                    cursor.fetchall()
+            else:
+                with transaction.atomic(using=BENCHMARK_ALIAS):
+                    with database.cursor() as cursor:
+                        cursor.execute(COUNT_SQL, [number])
+                        cursor.execute(INSERT_SQL, [number, BENCHMARK_TEXT])
+            done += 1
+        except OperationalError:
+            errors += 1
+    database.close()
+    results.put((kind, done, errors))
+
+
+def run_benchmark(settings_dict, seconds, readers, writers):
+    connections.databases[BENCHMARK_ALIAS] = settings_dict
+    database = connections[BENCHMARK_ALIAS]
+    with database.cursor() as cursor:
+        cursor.execute(
+            'CREATE TABLE benchmark (id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'author INTEGER NOT NULL, text TEXT NOT NULL)'
+        )
+    database.close()
+    del connections[BENCHMARK_ALIAS]
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    deadline = time.monotonic() + seconds
+    workers = [
+        context.Process(
+            target=run_worker,
+            args=(settings_dict, kind, number, deadline, results),
+        )
+        for kind, count in (('read', readers), ('write', writers))
+        for number in range(count)
+    ]
+    for worker in workers:
+        worker.start()
+    totals = {'read': [0, 0], 'write': [0, 0]}
+    for _ in workers:
+        kind, done, errors = results.get()
+        totals[kind][0] += done
+        totals[kind][1] += errors
+    for worker in workers:
+        worker.join()
+    return totals
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite для параллельных '
+        'читателей и писателей: стандартный бэкенд Django против '
+        'настроек из DATABASES (WAL, busy_timeout, BEGIN IMMEDIATE).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=4)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            self.stderr.write('Бенчмарк нужен только для SQLite.')
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            for name, settings_dict in benchmark_databases(
+                    directory).items():
+                totals = run_benchmark(
+                    settings_dict,
+                    options['seconds'],
+                    options['readers'],
+                    options['writers'],
+                )
+                (reads, read_errors), (writes, write_errors) = (
+                    totals['read'], totals['write'])
+                self.stdout.write(
+                    f'{name}: чтений/с {reads / options["seconds"]:.0f}, '
+                    f'записей/с {writes / options["seconds"]:.0f}, '
+                    f'ошибок блокировки {read_errors + write_errors}'
+                )
+        connections.databases.pop(BENCHMARK_ALIAS, None)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from core.queries import sign_token
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает значение заголовка X-Query-Capture, включающего '
+        'перехват SQL-запросов для одного запроса.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(sign_token())
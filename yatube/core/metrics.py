@@ -0,0 +1,252 @@
+"""
+Гистограммы времени ответа, числа и времени SQL-запросов, времени
+отрисовки шаблонов и размера ответа по представлениям
+(resolver_match.view_name) в текстовом формате Prometheus.
+
+Каждый процесс копит наблюдения в памяти и не чаще раза в
+METRICS_FLUSH_INTERVAL секунд прибавляет их к общему файлу SQLite
+METRICS_LOCATION, как общий кэш core.cache. Значения корзин хранятся
+накопительными, поэтому суммы всех воркеров — тоже гистограмма; /metrics
+отдаёт их из этого файла. Если файл недоступен, ошибка пишется в лог, а
+наблюдения ждут следующей записи: запрос из-за метрик не падает.
+"""
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+from django.template.backends.django import Template
+
+from .cache import connect
+
+logger = logging.getLogger(__name__)
+
+# Прочие методы в метке — other, иначе каждый выдуманный клиентом метод
+# заводил бы новые ряды.
+METHODS = frozenset((
+    'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'TRACE',
+))
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+HISTOGRAMS = {
+    'duration': (
+        'yatube_request_duration_seconds',
+        'Время обработки запроса.',
+        LATENCY_BUCKETS,
+    ),
+    'queries': (
+        'yatube_request_db_queries',
+        'Число SQL-запросов за запрос.',
+        QUERY_BUCKETS,
+    ),
+    'db_time': (
+        'yatube_request_db_seconds',
+        'Время SQL-запросов за запрос.',
+        LATENCY_BUCKETS,
+    ),
+    'template_time': (
+        'yatube_request_template_seconds',
+        'Время отрисовки шаблонов за запрос.',
+        LATENCY_BUCKETS,
+    ),
+    'size': (
+        'yatube_response_size_bytes',
+        'Размер тела ответа; потоковые ответы не учитываются.',
+        SIZE_BUCKETS,
+    ),
+}
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS metrics ('
+    'metric TEXT NOT NULL, '
+    'labels TEXT NOT NULL, '
+    'sample TEXT NOT NULL, '
+    'le REAL NOT NULL, '
+    'value REAL NOT NULL, '
+    'PRIMARY KEY (metric, labels, sample, le))'
+)
+UPSERT = (
+    'INSERT INTO metrics (metric, labels, sample, le, value) '
+    'VALUES (?, ?, ?, ?, ?) '
+    'ON CONFLICT (metric, labels, sample, le) '
+    'DO UPDATE SET value = value + excluded.value'
+)
+
+_current = threading.local()
+
+
+def label_value(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('"', '\\"')
+        .replace('\n', '\\n')
+    )
+
+
+def format_number(value):
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value))
+
+
+class RequestStats:
+    """Счётчики одного запроса: SQL-запросы и отрисовка шаблонов."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    @contextmanager
+    def collect(self):
+        previous = getattr(_current, 'stats', None)
+        _current.stats = self
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(self))
+                yield self
+        finally:
+            _current.stats = previous
+
+
+def instrument_templates():
+    """
+    Засекает Template.render шаблонных бэкендов Django. Вложенные
+    отрисовки (render_to_string внутри шаблона) не считаются дважды.
+    """
+    render = Template.render
+    if getattr(render, 'instrumented', False):
+        return
+
+    def timed_render(self, context=None, request=None):
+        stats = getattr(_current, 'stats', None)
+        if stats is None or stats.rendering:
+            return render(self, context, request)
+        stats.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, context, request)
+        finally:
+            stats.rendering = False
+            stats.template_time += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+class Recorder:
+    """Наблюдения процесса, ещё не добавленные в общий файл."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(float)
+        self.pid = os.getpid()
+        self.flushed = time.monotonic()
+        self.local = threading.local()
+
+    def observe(self, key, labels, value):
+        metric, _, buckets = HISTOGRAMS[key]
+        with self.lock:
+            if self.pid != os.getpid():
+                # Наблюдения родителя после fork принадлежат ему.
+                self.samples.clear()
+                self.pid = os.getpid()
+            # Пустые корзины тоже записываются: Prometheus ждёт все.
+            for bound in buckets + (math.inf,):
+                self.samples[metric, labels, 'bucket', bound] += (
+                    value <= bound)
+            self.samples[metric, labels, 'sum', 0] += value
+            self.samples[metric, labels, 'count', 0] += 1
+
+    def observe_request(self, view, method, duration, stats, size):
+        if method not in METHODS:
+            method = 'other'
+        labels = f'view="{label_value(view)}",method="{label_value(method)}"'
+        self.observe('duration', labels, duration)
+        self.observe('queries', labels, stats.queries)
+        self.observe('db_time', labels, stats.db_time)
+        self.observe('template_time', labels, stats.template_time)
+        if size is not None:
+            self.observe('size', labels, size)
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    @property
+    def connection(self):
+        local = self.local
+        key = (os.getpid(), settings.METRICS_LOCATION)
+        if getattr(local, 'key', None) != key:
+            local.connection = connect(settings.METRICS_LOCATION, 5)
+            local.connection.execute(SCHEMA)
+            local.key = key
+        return local.connection
+
+    def flush(self):
+        with self.lock:
+            samples, self.samples = self.samples, defaultdict(float)
+            self.flushed = time.monotonic()
+        if not samples:
+            return
+        try:
+            self.write(samples)
+        except sqlite3.Error:
+            logger.exception(
+                'Не удалось записать метрики в %s', settings.METRICS_LOCATION)
+            with self.lock:
+                for key, value in samples.items():
+                    self.samples[key] += value
+
+    def write(self, samples):
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(UPSERT, [
+                (*key, value) for key, value in samples.items()])
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+
+    def render(self):
+        """Все метрики из общего файла в текстовом формате Prometheus."""
+        self.flush()
+        rows = self.connection.execute(
+            "SELECT metric, labels, sample, le, value FROM metrics "
+            "ORDER BY metric, labels, sample = 'bucket' DESC, sample, le"
+        ).fetchall()
+        values = defaultdict(list)
+        for metric, labels, sample, le, value in rows:
+            if sample == 'bucket':
+                labels = f'{labels},le="{format_number(le)}"'
+            values[metric].append(
+                f'{metric}_{sample}{{{labels}}} {format_number(value)}')
+        lines = []
+        for metric, documentation, _ in HISTOGRAMS.values():
+            lines.append(f'# HELP {metric} {documentation}')
+            lines.append(f'# TYPE {metric} histogram')
+            lines.extend(values[metric])
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+        self.connection.execute('DELETE FROM metrics')
+
+
+recorder = Recorder()
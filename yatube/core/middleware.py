@@ -0,0 +1,115 @@
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from .metrics import RequestStats, recorder
+from .queries import QueryCapture, has_valid_token
+from .routers import SAFE_METHODS, STICKY_COOKIE, read_from_replicas
+
+
+class ReplicaMiddleware:
+    """
+    GET и HEAD читают с реплик, если пользователь недавно ничего не
+    записывал; после записи ставит cookie, которая на
+    REPLICA_STICKY_SECONDS возвращает его чтения на основную базу.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        enabled = (
+            request.method in SAFE_METHODS
+            and STICKY_COOKIE not in request.COOKIES
+        )
+        with read_from_replicas(enabled) as state:
+            response = self.get_response(request)
+        if state.wrote:
+            response.set_cookie(
+                STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class ConnectionTimingMiddleware:
+    """
+    Заголовок Server-Timing с временем открытия соединений с базой за
+    запрос: db-connect;dur=0 значит, что запрос обошёлся уже открытым
+    соединением (CONN_MAX_AGE или пул). Только при DEBUG или по
+    подписанному заголовку X-Query-Capture (core.queries): посторонним
+    устройство базы не показывается.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        databases = [
+            database for database in connections.all()
+            if hasattr(database, 'connect_seconds')
+        ]
+        for database in databases:
+            database.connect_seconds = 0.0
+        response = self.get_response(request)
+        if settings.DEBUG or has_valid_token(request):
+            seconds = sum(
+                database.connect_seconds for database in databases)
+            response['Server-Timing'] = (
+                f'db-connect;dur={seconds * 1000:.3f}')
+        return response
+
+
+class MetricsMiddleware:
+    """
+    Время ответа, SQL-запросы, отрисовка шаблонов и размер ответа по
+    представлениям — в гистограммы core.metrics для /metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with RequestStats().collect() as stats:
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        recorder.observe_request(
+            match.view_name if match else 'none',
+            request.method,
+            duration,
+            stats,
+            None if response.streaming else len(response.content),
+        )
+        return response
+
+
+class QueryCaptureMiddleware:
+    """
+    Перехват SQL-запросов (core.queries) для доли
+    QUERY_CAPTURE_SAMPLE_RATE запросов или по подписанному заголовку
+    X-Query-Capture; во втором случае итог приходит в одноимённом
+    заголовке ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        forced = has_valid_token(request)
+        if not forced and (
+                random.random() >= settings.QUERY_CAPTURE_SAMPLE_RATE):
+            return self.get_response(request)
+        with QueryCapture().collect() as capture:
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        capture.report(match.view_name if match else request.path)
+        if forced:
+            response['X-Query-Capture'] = capture.summary()
+        return response
@@ -0,0 +1,136 @@
+import base64
+import binascii
+
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+CURSOR_SEPARATOR = '|'
+
+
+def encode_cursor(number, key, pk):
+    """
+    Упаковывает позицию в ленте в непрозрачный токен для URL. Ключ —
+    дата или число (например, ранг результата поиска).
+    """
+    key = key.isoformat() if hasattr(key, 'isoformat') else repr(key)
+    raw = CURSOR_SEPARATOR.join((str(number), key, str(pk)))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token, parse_key=parse_datetime):
+    """
+    Распаковывает токен, ключ разбирается функцией parse_key;
+    для испорченного токена возвращает None.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        number, key, pk = raw.split(CURSOR_SEPARATOR)
+        key = parse_key(key)
+        if key is None:
+            return None
+        return int(number), key, int(pk)
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        return None
+
+
+class CursorPaginator(Paginator):
+    """
+    Паджинатор по ключу (дата, id): вместо COUNT(*) и OFFSET выбирает
+    per_page + 1 записей после или до курсора, поэтому стоимость
+    любой страницы одинакова. Страницы получают атрибуты next_cursor
+    и previous_cursor для ссылок ?after= и ?before=.
+    """
+
+    def __init__(self, object_list, per_page, key='pub_date', **kwargs):
+        self.key = key
+        object_list = object_list.order_by(f'-{key}', '-pk')
+        super().__init__(object_list, per_page, **kwargs)
+
+    def get_page(self, number=None, after=None, before=None):
+        """
+        Возвращает страницу по курсору after/before, а для старых
+        ссылок ?page=N — по номеру. Ошибочные значения ведут на первую.
+        """
+        page = None
+        if after:
+            page = self.page_after(after)
+        elif before:
+            page = self.page_before(before)
+        elif number:
+            page = self.page_at(number)
+        return page or self.first_page()
+
+    def first_page(self):
+        items = list(self.object_list[:self.per_page + 1])
+        return self._build_page(items, 1, has_previous=False)
+
+    def page_after(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return None
+        number, key, pk = cursor
+        items = list(self.object_list.filter(
+            Q(**{f'{self.key}__lt': key})
+            | Q(**{self.key: key, 'pk__lt': pk})
+        )[:self.per_page + 1])
+        if not items:
+            return None
+        return self._build_page(items, number + 1, has_previous=True)
+
+    def page_before(self, token):
+        cursor = decode_cursor(token)
+        if cursor is None:
+            return None
+        number, key, pk = cursor
+        items = list(self.object_list.filter(
+            Q(**{f'{self.key}__gt': key})
+            | Q(**{self.key: key, 'pk__gt': pk})
+        ).order_by(self.key, 'pk')[:self.per_page + 1])
+        if not items:
+            return None
+        has_previous = len(items) > self.per_page
+        items = items[:self.per_page][::-1]
+        number = max(number - 1, 2) if has_previous else 1
+        page = self._get_page(items, number, self)
+        page.previous_cursor = (
+            self._cursor(page, items[0]) if has_previous else None
+        )
+        page.next_cursor = self._cursor(page, items[-1])
+        return page
+
+    def page_at(self, number):
+        """Совместимость со ссылками ?page=N: OFFSET, но без COUNT(*)."""
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            return None
+        if number < 1:
+            return None
+        bottom = (number - 1) * self.per_page
+        items = list(self.object_list[bottom:bottom + self.per_page + 1])
+        if not items:
+            if number == 1:
+                return None
+            # Номер за пределами ленты: как и Paginator, отдаём последнюю.
+            page = super().get_page(number)
+            return self._build_page(
+                list(page.object_list),
+                page.number,
+                has_previous=page.has_previous(),
+            )
+        return self._build_page(items, number, has_previous=number > 1)
+
+    def _build_page(self, items, number, has_previous):
+        has_next = len(items) > self.per_page
+        items = items[:self.per_page]
+        page = self._get_page(items, number, self)
+        page.previous_cursor = (
+            self._cursor(page, items[0]) if has_previous and items else None
+        )
+        page.next_cursor = self._cursor(page, items[-1]) if has_next else None
+        return page
+
+    def _cursor(self, page, item):
+        return encode_cursor(page.number, getattr(item, self.key), item.pk)
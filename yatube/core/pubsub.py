@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+
+class Channel:
+    """
+    Pub/sub внутри процесса: счётчик событий, которого сопрограммы ждут
+    через wait_async; публиковать можно из любого потока. Сами данные
+    подписчики читают из базы — канал только будит их, поэтому
+    пропущенное событие ничего не теряет.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self.lock = threading.Lock()
+        self.waiters = set()
+
+    def publish(self):
+        with self.lock:
+            self.version += 1
+            waiters = list(self.waiters)
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    async def wait_async(self, version, timeout):
+        """
+        Ждёт версии новее version не дольше timeout секунд и возвращает
+        текущую версию.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self.lock:
+            if self.version != version:
+                return self.version
+            self.waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self.lock:
+                self.waiters.discard(waiter)
+        return self.version
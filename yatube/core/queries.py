@@ -0,0 +1,141 @@
+"""
+Выборочный перехват SQL-запросов в рабочем режиме: медленные запросы
+и N+1 (одинаковые по форме запросы, повторённые за один HTTP-запрос).
+
+Перехват включается для доли QUERY_CAPTURE_SAMPLE_RATE запросов или
+для запроса с подписанным заголовком X-Query-Capture (значение даёт
+команда query_capture_token). В остальных запросах обёртка
+execute_wrapper не ставится, и перехват ничего не стоит.
+"""
+import logging
+import os
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+import django
+from django.conf import settings
+from django.core import signing
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'HTTP_X_QUERY_CAPTURE'
+SIGNING_SALT = 'core.queries'
+# Кадры Django и этого модуля не считаются местом, откуда пришёл запрос.
+SKIP_PATHS = (os.path.dirname(django.__file__), __file__)
+
+NORMALIZE = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    """Форма запроса: литералы и параметры — ?, списки IN — (...)."""
+    for pattern, replacement in NORMALIZE:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def sign_token():
+    """Значение заголовка X-Query-Capture на QUERY_CAPTURE_TOKEN_AGE."""
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign('on')
+
+
+def has_valid_token(request):
+    token = request.META.get(HEADER)
+    if not token:
+        return False
+    try:
+        signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            token, max_age=settings.QUERY_CAPTURE_TOKEN_AGE)
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def origin():
+    """
+    Место запроса: первая строка кода проекта в стеке и, если запрос
+    сделан при отрисовке, шаблон и строка в нём ('-' — не найдено).
+    """
+    code = template = '-'
+    frame = sys._getframe(1)
+    while frame is not None and (code == '-' or template == '-'):
+        node = frame.f_locals.get('self')
+        if (
+            template == '-' and isinstance(node, Node)
+            and getattr(node, 'token', None) is not None
+        ):
+            template = f'{node.origin.name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if code == '-' and not filename.startswith(SKIP_PATHS) and (
+                filename.startswith(str(settings.BASE_DIR))):
+            code = f'{filename}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code, template
+
+
+class QueryCapture:
+    """Формы, число и места SQL-запросов одного HTTP-запроса."""
+
+    def __init__(self):
+        self.queries = 0
+        self.counts = Counter()
+        self.sites = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            shape = fingerprint(sql)
+            self.queries += 1
+            self.counts[shape] += 1
+            # Второй одинаковый запрос обычно делается уже из цикла.
+            if self.counts[shape] == 2:
+                self.sites[shape] = origin()
+            if duration >= settings.QUERY_CAPTURE_SLOW_SECONDS:
+                self.slow.append((duration, shape, origin()))
+
+    @contextmanager
+    def collect(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    def repeated(self):
+        """(форма, сколько раз, место) для подозрений на N+1."""
+        return [
+            (shape, count, self.sites[shape])
+            for shape, count in self.counts.most_common()
+            if count >= settings.QUERY_CAPTURE_REPEAT_THRESHOLD
+        ]
+
+    def report(self, view):
+        for duration, shape, (code, template) in self.slow:
+            logger.warning(
+                'Медленный запрос %.3f с в %s (%s, шаблон %s): %s',
+                duration, view, code, template, shape,
+            )
+        for shape, count, (code, template) in self.repeated():
+            logger.warning(
+                'Запрос повторён %s раз в %s (%s, шаблон %s): %s',
+                count, view, code, template, shape,
+            )
+
+    def summary(self):
+        return (
+            f'queries={self.queries}; repeated={len(self.repeated())}; '
+            f'slow={len(self.slow)}'
+        )
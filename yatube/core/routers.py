@@ -0,0 +1,84 @@
+"""
+Чтение с реплик базы.
+
+ReplicaRouter отправляет чтения на одну из реплик DATABASE_REPLICAS,
+только пока включён read_from_replicas() — его включает ReplicaMiddleware
+для GET и HEAD запросов. Команды, фоновые потоки и запросы, меняющие
+данные, читают с основной базы, как раньше. Реплика выбирается одна на
+весь запрос: у реплик разное отставание, и список постов и счётчики
+одной страницы иначе могли бы прийти из разных снимков базы.
+
+Любая запись переключает текущий запрос на основную базу до его конца,
+а ReplicaMiddleware ставит cookie, с которой следующие
+REPLICA_STICKY_SECONDS секунд пользователь тоже читает с основной базы и
+видит свой пост, комментарий или подписку, даже если реплика отстала.
+"""
+import random
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+STICKY_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Сессия, не найденная на отставшей реплике, считается пустой, и
+# SessionMiddleware удаляет её cookie — пользователь разлогинивается.
+PRIMARY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+@contextmanager
+def read_from_replicas(enabled=True):
+    """
+    Разрешает чтение с реплик в текущем потоке. Отдаёт состояние, в
+    котором после выхода видно, была ли запись (state.wrote).
+    """
+    previous = getattr(_state, 'current', None)
+    _state.current = state = SimpleNamespace(
+        enabled=enabled, wrote=False, replica=None)
+    try:
+        yield state
+    finally:
+        _state.current = previous
+
+
+def mark_write():
+    state = getattr(_state, 'current', None)
+    if state is not None:
+        state.wrote = True
+
+
+def current_replica():
+    """Реплика для чтений текущего запроса или None — основная база."""
+    state = getattr(_state, 'current', None)
+    if state is None or not state.enabled or state.wrote:
+        return None
+    if state.replica is None:
+        state.replica = random.choice(settings.DATABASE_REPLICAS)
+    return state.replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (
+            settings.DATABASE_REPLICAS
+            and model._meta.app_label not in PRIMARY_APPS
+        ):
+            return current_replica() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        mark_write()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплики получают схему копированием основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
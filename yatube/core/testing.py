@@ -0,0 +1,33 @@
+"""
+Настройки, которые действуют только на время тестов. manage.py test
+включает их через TEST_RUNNER, pytest — фикстурой из conftest.py в
+корне репозитория; рабочие настройки от способа запуска не зависят.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+def test_settings():
+    return override_settings(
+        # Тесты не должны видеть кэш предыдущих прогонов и рабочего
+        # сервера.
+        CACHES={
+            alias: {**options, 'LOCATION': f'memory:yatube-{alias}'}
+            for alias, options in settings.CACHES.items()
+        },
+        METRICS_LOCATION='memory:yatube-metrics',
+        # Случайный перехват менял бы число запросов в тестах.
+        QUERY_CAPTURE_SAMPLE_RATE=0,
+    )
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.test_settings = test_settings()
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super().teardown_test_environment(**kwargs)
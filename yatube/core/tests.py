@@ -1,5 +1,58 @@
-from django.test import TestCase
+import asyncio
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
 from http import HTTPStatus
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.signals import request_finished
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template import engines
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import path, reverse
+
+from .asgi import ASGIHandler
+from .cache import SQLiteCache
+from .metrics import Recorder, RequestStats, recorder
+from .middleware import ReplicaMiddleware
+from .pubsub import Channel
+from .queries import QueryCapture, fingerprint, sign_token
+from .routers import STICKY_COOKIE, read_from_replicas
+
+REPLICA_ALIAS = 'replica'
+SHARED_COUNTER_KEY = 'counter'
+CHANNEL_TIMEOUT = 5
+WORKERS_COUNT = 4
+INCREMENTS_PER_WORKER = 25
+STREAM_CHUNKS = (b'first', b'second')
+METRICS_TOKEN = 'metrics-token'
+
+# URL потокового ответа для ASGIHandlerTests (ROOT_URLCONF='core.tests').
+stream_events = []
+
+
+def async_stream(request):
+    async def chunks():
+        for chunk in STREAM_CHUNKS:
+            await asyncio.sleep(0)
+            stream_events.append(chunk)
+            yield chunk
+
+    response = StreamingHttpResponse(())
+    response.async_streaming_content = chunks()
+    return response
+
+
+urlpatterns = [path('stream/', async_stream)]
 
 
 class ViewTests(TestCase):
@@ -11,3 +64,524 @@ class ViewTests(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def increment_shared_counter(location, times):
+    cache = SQLiteCache(location, {})
+    for _ in range(times):
+        cache.incr(SHARED_COUNTER_KEY)
+
+
+class SQLiteCacheTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.location, {})
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_workers_share_entries(self):
+        """Запись одного воркера видна другому, как и её удаление."""
+        other_worker = SQLiteCache(self.location, {})
+        self.cache.set('key', {'value': [1, 2]})
+        self.assertEqual(other_worker.get('key'), {'value': [1, 2]})
+        other_worker.delete('key')
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_add_and_expiry(self):
+        """add не перезаписывает живую запись, просроченная не читается."""
+        self.assertTrue(self.cache.add('key', 'first'))
+        self.assertFalse(self.cache.add('key', 'second'))
+        self.assertEqual(self.cache.get('key'), 'first')
+        self.cache.set('key', 'value', timeout=0)
+        self.assertFalse(self.cache.has_key('key'))
+        self.assertTrue(self.cache.add('key', 'again'))
+
+    def test_incr_is_atomic_across_processes(self):
+        """incr из нескольких процессов не теряет увеличений."""
+        self.cache.set(SHARED_COUNTER_KEY, 0)
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=increment_shared_counter,
+                args=(self.location, INCREMENTS_PER_WORKER),
+            )
+            for _ in range(WORKERS_COUNT)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.assertEqual(
+            self.cache.get(SHARED_COUNTER_KEY),
+            WORKERS_COUNT * INCREMENTS_PER_WORKER,
+        )
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_least_recently_used_entries_are_culled(self):
+        """При переполнении вытесняются давно не читавшиеся записи."""
+        cache = SQLiteCache(self.location, {
+            'OPTIONS': {'MAX_ENTRIES': 4, 'CULL_FREQUENCY': 2, 'CULL_EVERY': 1}
+        })
+        for number in range(4):
+            cache.set(f'key-{number}', number)
+        with mock.patch('core.cache.time.time', return_value=time.time() + 5):
+            cache.get('key-0')
+            cache.set('key-4', 4)
+        self.assertTrue(cache.has_key('key-0'))
+        self.assertTrue(cache.has_key('key-4'))
+        self.assertFalse(cache.has_key('key-1'))
+
+
+class SQLiteBackendTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.database = connections[DEFAULT_DB_ALIAS].__class__(
+            {
+                **connections[DEFAULT_DB_ALIAS].settings_dict,
+                'NAME': os.path.join(self.directory, 'db.sqlite3'),
+            },
+            alias='sqlite-backend-test',
+        )
+        self.addCleanup(self.database.close)
+
+    def make_database(self, **options):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        database = self.database.__class__(
+            {
+                **self.database.settings_dict,
+                'CONN_HEALTH_CHECKS': True,
+                'OPTIONS': {**settings_dict['OPTIONS'], **options},
+            },
+            alias='sqlite-backend-test',
+        )
+        self.addCleanup(database.close)
+        return database
+
+    def pragma(self, database, name):
+        with database.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_pragmas_from_settings(self):
+        """Соединение получает PRAGMA из DATABASES[...]['OPTIONS']."""
+        for name, value in (
+            ('journal_mode', 'wal'),
+            ('synchronous', 1),
+            ('cache_size', -64000),
+            ('busy_timeout', 5000),
+            ('temp_store', 2),
+        ):
+            with self.subTest(name=name):
+                self.assertEqual(self.pragma(self.database, name), value)
+
+    def test_transactions_take_write_lock_immediately(self):
+        """atomic начинается с BEGIN IMMEDIATE и сразу блокирует запись."""
+        with self.database.cursor() as cursor:
+            cursor.execute('CREATE TABLE test (value INTEGER)')
+        self.database.set_autocommit(
+            False, force_begin_transaction_with_broken_autocommit=True)
+        self.addCleanup(self.database.rollback)
+        other_writer = sqlite3.connect(
+            self.database.settings_dict['NAME'], timeout=0)
+        self.addCleanup(other_writer.close)
+        with self.assertRaisesMessage(
+                sqlite3.OperationalError, 'database is locked'):
+            other_writer.execute('INSERT INTO test VALUES (1)')
+
+    def test_pool_reuses_closed_connections(self):
+        """Закрытое соединение возвращается в пул и берётся снова."""
+        database = self.make_database(pool_size=1)
+        database.ensure_connection()
+        raw_connection = database.connection
+        self.assertGreater(database.connect_seconds, 0)
+        database.close()
+        database.ensure_connection()
+        self.assertIs(database.connection, raw_connection)
+
+    def test_broken_connection_is_replaced(self):
+        """
+        Проверка перед повторным использованием отбрасывает мёртвое
+        соединение, и оно не попадает в пул.
+        """
+        database = self.make_database(pool_size=1)
+        database.ensure_connection()
+        broken = database.connection
+        broken.close()
+        database.close_if_unusable_or_obsolete()
+        with database.cursor() as cursor:
+            cursor.execute('SELECT 2')
+        self.assertIsNot(database.connection, broken)
+        database.close()
+        self.assertIsNot(database.pool.take()[0], broken)
+
+    def test_health_check_runs_once_per_reuse(self):
+        """SELECT 1 выполняется только перед первым запросом к базе."""
+        database = self.make_database()
+        database.ensure_connection()
+        statements = []
+        database.connection.set_trace_callback(statements.append)
+        for _ in range(2):
+            database.close_if_unusable_or_obsolete()
+            for _ in range(2):
+                with database.cursor() as cursor:
+                    cursor.execute('SELECT 2')
+        self.assertEqual(statements.count('SELECT 1'), 2)
+
+    def test_expired_connection_is_not_pooled(self):
+        """Соединение старше CONN_MAX_AGE закрывается, а не идёт в пул."""
+        database = self.make_database(pool_size=1)
+        database.ensure_connection()
+        expired = database.connection
+        max_age = database.settings_dict['CONN_MAX_AGE']
+        database.created_at -= max_age
+        database.close_at -= max_age
+        database.close_if_unusable_or_obsolete()
+        self.assertIsNone(database.connection)
+        database.ensure_connection()
+        self.assertIsNot(database.connection, expired)
+
+    def test_server_timing_reports_connection_setup(self):
+        """Время открытия соединений видно только по токену перехвата."""
+        response = self.client.get('/')
+        self.assertNotIn('Server-Timing', response)
+        response = self.client.get('/', HTTP_X_QUERY_CAPTURE=sign_token())
+        self.assertRegex(
+            response['Server-Timing'], r'^db-connect;dur=\d+\.\d{3}$')
+
+    def test_connection_benchmark_command(self):
+        """Бенчмарк соединений сравнивает режимы CONN_MAX_AGE и пул."""
+        stdout = StringIO()
+        call_command('benchmark_connections', requests=3, stdout=stdout)
+        for mode in ('per-request', 'persistent', 'pool'):
+            with self.subTest(mode=mode):
+                self.assertIn(f'{mode}:', stdout.getvalue())
+
+    def test_benchmark_command(self):
+        """Бенчмарк сравнивает стандартный и настроенный бэкенды."""
+        stdout = StringIO()
+        call_command(
+            'benchmark_sqlite',
+            seconds=0.2,
+            readers=1,
+            writers=1,
+            stdout=stdout,
+        )
+        output = stdout.getvalue()
+        self.assertIn('stock:', output)
+        self.assertIn('tuned:', output)
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS])
+class ReplicaRouterTests(TestCase):
+    def read_alias(self):
+        return router.db_for_read(User)
+
+    def test_reads_use_replica_only_when_enabled(self):
+        """С реплики читают внутри read_from_replicas(), кроме сессий."""
+        self.assertEqual(self.read_alias(), DEFAULT_DB_ALIAS)
+        with read_from_replicas():
+            self.assertEqual(self.read_alias(), REPLICA_ALIAS)
+            self.assertEqual(
+                router.db_for_read(Session), DEFAULT_DB_ALIAS)
+        with read_from_replicas(enabled=False):
+            self.assertEqual(self.read_alias(), DEFAULT_DB_ALIAS)
+
+    @override_settings(DATABASE_REPLICAS=[REPLICA_ALIAS, 'replica-other'])
+    def test_request_reads_from_one_replica(self):
+        """Все чтения одного запроса идут на одну и ту же реплику."""
+        with read_from_replicas():
+            aliases = {self.read_alias() for _ in range(50)}
+        self.assertEqual(len(aliases), 1)
+
+    def test_write_pins_reads_to_primary(self):
+        """После записи чтения до конца запроса идут на основную базу."""
+        with read_from_replicas() as state:
+            self.assertEqual(router.db_for_write(User), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.read_alias(), DEFAULT_DB_ALIAS)
+        self.assertTrue(state.wrote)
+
+    def test_middleware_sets_sticky_cookie_after_write(self):
+        """После записи cookie возвращает чтения на основную базу."""
+        aliases = []
+
+        def view(request):
+            aliases.append(self.read_alias())
+            if request.method == 'POST':
+                router.db_for_write(User)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+        response = middleware(factory.post('/'))
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        request = factory.get('/')
+        request.COOKIES[STICKY_COOKIE] = '1'
+        middleware(request)
+        self.assertEqual(
+            aliases, [REPLICA_ALIAS, DEFAULT_DB_ALIAS, DEFAULT_DB_ALIAS])
+
+
+class ASGIHandlerTests(TestCase):
+    def setUp(self):
+        self.handler = ASGIHandler(threads=1)
+        self.addCleanup(self.handler.executor.shutdown)
+
+    def call(self, scope, *messages):
+        sent = []
+        incoming = list(messages)
+
+        async def receive():
+            if not incoming:
+                # Клиент больше ничего не шлёт, но и не отключается.
+                await asyncio.Event().wait()
+            return incoming.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        return sent
+
+    def test_http_request_is_served_by_django(self):
+        """Запрос ASGI обрабатывается Django в потоке пула."""
+        start, body = self.call(
+            {
+                'type': 'http',
+                'method': 'GET',
+                'path': '/nonexist-page/',
+                'query_string': b'',
+                'http_version': '1.1',
+                'headers': [(b'host', b'testserver')],
+            },
+            {'type': 'http.request', 'body': b'', 'more_body': False},
+        )
+        self.assertEqual(start['status'], HTTPStatus.NOT_FOUND)
+        for name, value in start['headers']:
+            with self.subTest(header=name):
+                self.assertEqual(value, value.strip())
+        self.assertIn(b'Custom 404', body['body'])
+
+    @override_settings(ROOT_URLCONF='core.tests')
+    def test_async_stream_is_closed_after_sending(self):
+        """request_finished приходит только после всего потока."""
+        stream_events.clear()
+
+        def finished(**kwargs):
+            stream_events.append('finished')
+
+        request_finished.connect(finished)
+        self.addCleanup(request_finished.disconnect, finished)
+        sent = self.call(
+            {
+                'type': 'http',
+                'method': 'GET',
+                'path': '/stream/',
+                'query_string': b'',
+                'http_version': '1.1',
+                'headers': [(b'host', b'testserver')],
+            },
+            {'type': 'http.request', 'body': b'', 'more_body': False},
+        )
+        self.assertEqual(
+            [message.get('body') for message in sent[1:]],
+            [*STREAM_CHUNKS, None],
+        )
+        self.assertEqual(stream_events, [*STREAM_CHUNKS, 'finished'])
+
+    def test_lifespan(self):
+        """Сервер получает подтверждение запуска и остановки."""
+        sent = self.call(
+            {'type': 'lifespan'},
+            {'type': 'lifespan.startup'},
+            {'type': 'lifespan.shutdown'},
+        )
+        self.assertEqual(
+            [message['type'] for message in sent],
+            ['lifespan.startup.complete', 'lifespan.shutdown.complete'],
+        )
+
+
+class ChannelTests(TestCase):
+    def setUp(self):
+        self.channel = Channel()
+
+    def publish_later(self):
+        timer = threading.Timer(0.05, self.channel.publish)
+        timer.start()
+        self.addCleanup(timer.cancel)
+
+    def test_publish_from_thread_wakes_coroutine(self):
+        """Публикация из другого потока будит сопрограмму."""
+        async def wait():
+            self.publish_later()
+            return await self.channel.wait_async(0, CHANNEL_TIMEOUT)
+
+        started = time.monotonic()
+        self.assertEqual(asyncio.run(wait()), 1)
+        self.assertLess(time.monotonic() - started, CHANNEL_TIMEOUT)
+        self.assertEqual(self.channel.waiters, set())
+
+
+def observe_in_worker():
+    recorder.observe_request('posts:index', 'GET', 0.2, RequestStats(), 10)
+    recorder.flush()
+
+
+@override_settings(METRICS_TOKEN=METRICS_TOKEN)
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        recorder.reset()
+
+    def test_requests_are_recorded_by_view(self):
+        """/metrics отдаёт гистограммы по имени представления."""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION=f'Bearer {METRICS_TOKEN}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        metrics = response.content.decode()
+        labels = 'view="posts:index",method="GET"'
+        for line in (
+            '# TYPE yatube_request_duration_seconds histogram',
+            f'yatube_request_duration_seconds_count{{{labels}}} 1.0',
+            f'yatube_request_duration_seconds_bucket{{{labels},le="+Inf"}}',
+            f'yatube_request_db_queries_count{{{labels}}} 1.0',
+            f'yatube_request_template_seconds_count{{{labels}}} 1.0',
+            f'yatube_response_size_bytes_count{{{labels}}} 1.0',
+        ):
+            with self.subTest(line=line):
+                self.assertIn(line, metrics)
+
+    def test_unknown_methods_share_one_label(self):
+        """Незнакомые методы попадают в метку other."""
+        for method in ('PROPFIND', 'X-CUSTOM'):
+            self.client.generic(method, reverse('posts:index'))
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",method="other"} 2.0',
+            recorder.render(),
+        )
+
+    @override_settings(METRICS_FLUSH_INTERVAL=0)
+    def test_flush_errors_do_not_fail_requests(self):
+        """Ошибка записи метрик логируется, наблюдения не теряются."""
+        with mock.patch.object(
+            Recorder, 'write',
+            side_effect=sqlite3.OperationalError('database is locked'),
+        ), self.assertLogs('core.metrics', 'ERROR'):
+            response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",method="GET"} 1.0',
+            recorder.render(),
+        )
+
+    def test_request_stats_count_queries(self):
+        """Счётчик запроса видит SQL-запросы всех соединений."""
+        with RequestStats().collect() as stats:
+            User.objects.count()
+            User.objects.exists()
+        self.assertEqual(stats.queries, 2)
+        self.assertGreater(stats.db_time, 0)
+
+    def test_metrics_are_shared_between_workers(self):
+        """Наблюдения другого процесса видны в общем файле."""
+        location = os.path.join(self.directory, 'metrics.sqlite3')
+        with override_settings(METRICS_LOCATION=location):
+            worker = multiprocessing.get_context('fork').Process(
+                target=observe_in_worker)
+            worker.start()
+            worker.join()
+            observe_in_worker()
+            metrics = recorder.render()
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",method="GET"} 2.0',
+            metrics,
+        )
+
+    def test_metrics_are_not_public(self):
+        """Без верного токена /metrics не отдаётся."""
+        for headers in (
+            {},
+            {'HTTP_AUTHORIZATION': 'Bearer wrong-token'},
+            {'HTTP_AUTHORIZATION': METRICS_TOKEN},
+        ):
+            with self.subTest(headers=headers):
+                response = self.client.get(reverse('metrics'), **headers)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_without_token_are_disabled(self):
+        """Без настроенного токена /metrics не отдаётся никому."""
+        response = self.client.get(
+            reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class QueryCaptureTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user-{number}')
+            for number in range(3)
+        ]
+
+    def test_fingerprint_ignores_values(self):
+        """Запросы с разными значениями дают одну форму."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM t WHERE a = 1 AND b = 'x''y'"),
+            fingerprint('SELECT *  FROM t\nWHERE a = %s AND b = %s'),
+        )
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            'SELECT * FROM t WHERE id IN (...)',
+        )
+
+    def test_repeated_queries_in_template_are_reported(self):
+        """N+1 в шаблоне попадает в журнал с местом в шаблоне."""
+        template = engines['django'].from_string(
+            '{% for user in users %}\n'
+            '{{ user.groups.count }}\n'
+            '{% endfor %}'
+        )
+        with QueryCapture().collect() as capture:
+            template.render({'users': User.objects.all()})
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            capture.report('test')
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('повторён 3 раз', logs.output[0])
+        self.assertIn('шаблон <unknown source>:2', logs.output[0])
+        self.assertEqual(capture.queries, 4)
+
+    @override_settings(QUERY_CAPTURE_SLOW_SECONDS=0)
+    def test_slow_queries_are_reported_with_code_line(self):
+        """Медленный запрос попадает в журнал со строкой кода."""
+        with QueryCapture().collect() as capture:
+            User.objects.count()
+        with self.assertLogs('core.queries', 'WARNING') as logs:
+            capture.report('test')
+        self.assertIn('Медленный запрос', logs.output[0])
+        self.assertIn('core/tests.py:', logs.output[0])
+
+    def test_signed_header_enables_capture(self):
+        """Подписанный заголовок включает перехват, чужой — нет."""
+        response = self.client.get(
+            reverse('posts:index'), HTTP_X_QUERY_CAPTURE=sign_token())
+        self.assertRegex(
+            response['X-Query-Capture'],
+            r'^queries=\d+; repeated=0; slow=\d+$',
+        )
+        response = self.client.get(
+            reverse('posts:index'), HTTP_X_QUERY_CAPTURE='on:forged')
+        self.assertNotIn('X-Query-Capture', response)
@@ -1,4 +1,9 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from .metrics import recorder
 
 
 def page_not_found(request, exception):
@@ -15,3 +20,13 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики всех воркеров для Prometheus; только с METRICS_TOKEN."""
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if not settings.METRICS_TOKEN or not constant_time_compare(
+            authorization, f'Bearer {settings.METRICS_TOKEN}'):
+        raise Http404
+    return HttpResponse(
+        recorder.render(), content_type='text/plain; version=0.0.4')
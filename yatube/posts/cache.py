@@ -0,0 +1,137 @@
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .counters import get_author_stats
+from .models import AuthorStats, Post, User
+
+PAGE_GENERATION_KEY = 'posts:pages:generation'
+PAGE_KEY_TEMPLATE = 'posts:page:{generation}:{path}'
+PROFILE_KEY_TEMPLATE = 'posts:profile:{username}'
+
+# Поля, которые выводятся в карточке поста includes/post_pattern.html.
+CARD_USER_FIELDS = ('username', 'first_name', 'last_name')
+CARD_GROUP_FIELDS = ('title', 'slug')
+
+
+def expire_post_cards(**lookup):
+    """
+    Сбрасывает закэшированные карточки постов, выбранных lookup.
+    Ключ фрагмента содержит Post.updated, поэтому достаточно сдвинуть
+    эту дату — старые записи кэша просто перестают читаться.
+    """
+    Post.objects.filter(**lookup).update(updated=timezone.now())
+
+
+def fields_changed(instance, fields, update_fields=None):
+    """Проверяет перед сохранением, меняются ли поля, видимые в карточке."""
+    if instance.pk is None:
+        return False
+    if update_fields is not None and not set(fields) & set(update_fields):
+        return False
+    saved = type(instance).objects.filter(
+        pk=instance.pk).values(*fields).first()
+    return saved is not None and any(
+        saved[field] != getattr(instance, field) for field in fields
+    )
+
+
+def page_generation():
+    """
+    Текущее поколение кэша страниц. Если счётчик вытеснен из кэша, он
+    начинается заново с текущего времени в миллисекундах, чтобы не
+    совпасть с уже использованными поколениями.
+    """
+    generation = cache.get(PAGE_GENERATION_KEY)
+    if generation is None:
+        cache.add(PAGE_GENERATION_KEY, int(time.time() * 1000), None)
+        generation = cache.get(PAGE_GENERATION_KEY)
+    return generation
+
+
+def expire_pages():
+    """Сбрасывает все закэшированные страницы за O(1): новое поколение."""
+    try:
+        cache.incr(PAGE_GENERATION_KEY)
+    except ValueError:
+        page_generation()
+
+
+def page_cache_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return PAGE_KEY_TEMPLATE.format(generation=page_generation(), path=path)
+
+
+def cache_anonymous_page(view):
+    """
+    Кэширует ответ view для анонимных GET-запросов. Время жизни задаётся
+    по имени маршрута в settings.PAGE_CACHE_TIMEOUTS; маршруты без
+    записи не кэшируются. Ключ содержит полный путь с ?after=/?page=.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.PAGE_CACHE_TIMEOUTS.get(
+            request.resolver_match.view_name)
+        if (
+            not timeout
+            or request.method != 'GET'
+            or request.user.is_authenticated
+        ):
+            return view(request, *args, **kwargs)
+        key = page_cache_key(request)
+        response = cache.get(key)
+        if response is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response, timeout)
+        return response
+    return wrapper
+
+
+def profile_key(username):
+    return PROFILE_KEY_TEMPLATE.format(username=username)
+
+
+def get_profile(username):
+    """
+    Шапка профиля: (автор, его счётчики, id последнего поста или None)
+    из кэша, без запросов к базе. Автор и счётчики — несохранённые
+    экземпляры User и AuthorStats только с полями шапки и карточек
+    постов. None, если пользователя нет.
+    """
+    key = profile_key(username)
+    summary = cache.get(key)
+    if summary is None:
+        author = User.objects.select_related('stats').filter(
+            username=username).first()
+        if author is None:
+            return None
+        stats = get_author_stats(author)
+        summary = {
+            'user': {
+                field: getattr(author, field)
+                for field in ('pk',) + CARD_USER_FIELDS
+            },
+            'stats': {
+                'posts_count': stats.posts_count,
+                'followers_count': stats.followers_count,
+                'following_count': stats.following_count,
+            },
+            'latest_post_id': author.posts.values_list(
+                'pk', flat=True).first(),
+        }
+        cache.set(key, summary, settings.PROFILE_CACHE_TIMEOUT)
+    author = User(**summary['user'])
+    stats = AuthorStats(user=author, **summary['stats'])
+    return author, stats, summary['latest_post_id']
+
+
+def expire_profiles(*user_ids):
+    """Сбрасывает шапки профилей пользователей с этими id."""
+    usernames = User.objects.filter(pk__in=user_ids).values_list(
+        'username', flat=True)
+    cache.delete_many([profile_key(username) for username in usernames])
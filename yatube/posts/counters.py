@@ -0,0 +1,191 @@
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Group, GroupStats, Post, User
+
+AUTHOR_COUNTERS = {
+    'posts_count': (Post, 'author'),
+    'comments_count': (Comment, 'author'),
+    'followers_count': (Follow, 'author'),
+    'following_count': (Follow, 'user'),
+}
+GROUP_COUNTERS = {
+    'posts_count': (Post, 'group'),
+}
+
+
+def count_rows(counters, pk):
+    return {
+        field: model.objects.filter(**{f'{column}_id': pk}).count()
+        for field, (model, column) in counters.items()
+    }
+
+
+def rebuild_author_stats(user_id):
+    """Пересчитывает счётчики автора по таблицам и сохраняет их."""
+    with transaction.atomic():
+        stats, _ = AuthorStats.objects.update_or_create(
+            user_id=user_id, defaults=count_rows(AUTHOR_COUNTERS, user_id))
+    return stats
+
+
+def rebuild_group_stats(group_id):
+    """Пересчитывает число постов группы и сохраняет его."""
+    with transaction.atomic():
+        stats, _ = GroupStats.objects.update_or_create(
+            group_id=group_id, defaults=count_rows(GROUP_COUNTERS, group_id))
+    return stats
+
+
+def get_author_stats(user):
+    """
+    Счётчики автора за O(1). Если строки ещё нет (автор без постов
+    или счётчики сброшены), она пересчитывается и создаётся.
+    """
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        return rebuild_author_stats(user.pk)
+
+
+def get_group_stats(group):
+    try:
+        return group.stats
+    except GroupStats.DoesNotExist:
+        return rebuild_group_stats(group.pk)
+
+
+def change_counters(model, lookup, rebuild, **deltas):
+    """
+    Атомарно сдвигает счётчики одной строки выражением F().
+
+    Увеличение несуществующей строки создаёт её пересчётом. Уменьшение,
+    которое увело бы счётчик ниже нуля, значит, что строка разошлась
+    с таблицами (например, после bulk_create), — тогда она удаляется
+    и будет пересчитана при следующем чтении.
+    """
+    queryset = model.objects.filter(**lookup)
+    for field, delta in deltas.items():
+        if delta < 0:
+            queryset = queryset.filter(**{f'{field}__gte': -delta})
+    updated = queryset.update(**{
+        field: F(field) + delta for field, delta in deltas.items()
+    })
+    if updated:
+        return
+    if all(delta > 0 for delta in deltas.values()):
+        rebuild()
+    else:
+        model.objects.filter(**lookup).delete()
+
+
+def comments_subquery():
+    """Число комментариев поста из внешнего запроса к Post."""
+    return Coalesce(
+        Subquery(
+            Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+                'post').annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def rebuild_post_comments(post_id):
+    """Пересчитывает Post.comments_count одного поста по таблице."""
+    Post.objects.filter(pk=post_id).update(comments_count=comments_subquery())
+
+
+def change_post_comments(post_id, delta):
+    """
+    Сдвигает Post.comments_count на delta. Если счётчик ушёл бы ниже
+    нуля, он разошёлся с таблицей и пересчитывается.
+    """
+    queryset = Post.objects.filter(pk=post_id)
+    if delta < 0:
+        queryset = queryset.filter(comments_count__gte=-delta)
+    if not queryset.update(comments_count=F('comments_count') + delta):
+        rebuild_post_comments(post_id)
+
+
+def change_author_stats(user_id, **deltas):
+    if user_id is None:
+        return
+    change_counters(
+        AuthorStats,
+        {'user_id': user_id},
+        lambda: rebuild_author_stats(user_id),
+        **deltas
+    )
+
+
+def change_group_stats(group_id, **deltas):
+    if group_id is None:
+        return
+    change_counters(
+        GroupStats,
+        {'group_id': group_id},
+        lambda: rebuild_group_stats(group_id),
+        **deltas
+    )
+
+
+def aggregate_counters(counters):
+    """Считает все счётчики сразу группировкой, без запроса на строку."""
+    totals = {}
+    for field, (model, column) in counters.items():
+        rows = model.objects.values_list(f'{column}_id').annotate(
+            total=Count('pk')).order_by()
+        for pk, total in rows:
+            if pk is not None:
+                totals.setdefault(pk, {})[field] = total
+    return totals
+
+
+def repair_counters(model, owner_model, owner_field, counters, dry_run=False):
+    """
+    Сверяет счётчики с таблицами и исправляет разошедшиеся строки.
+    Возвращает число исправленных (или найденных при dry_run) строк.
+    """
+    expected = aggregate_counters(counters)
+    empty = {field: 0 for field in counters}
+    existing = {
+        getattr(stats, f'{owner_field}_id'): stats
+        for stats in model.objects.all()
+    }
+    repaired = 0
+    with transaction.atomic():
+        for pk in owner_model.objects.values_list('pk', flat=True):
+            values = {**empty, **expected.get(pk, {})}
+            stats = existing.get(pk)
+            if stats is not None and all(
+                getattr(stats, field) == value
+                for field, value in values.items()
+            ):
+                continue
+            repaired += 1
+            if not dry_run:
+                model.objects.update_or_create(
+                    **{f'{owner_field}_id': pk}, defaults=values)
+    return repaired
+
+
+def repair_author_stats(dry_run=False):
+    return repair_counters(
+        AuthorStats, User, 'user', AUTHOR_COUNTERS, dry_run)
+
+
+def repair_group_stats(dry_run=False):
+    return repair_counters(
+        GroupStats, Group, 'group', GROUP_COUNTERS, dry_run)
+
+
+def repair_post_comments(dry_run=False):
+    """Исправляет Post.comments_count, разошедшиеся с таблицей Comment."""
+    drifted = Post.objects.annotate(actual=comments_subquery()).exclude(
+        comments_count=F('actual')).values_list('pk', flat=True)
+    post_ids = list(drifted)
+    if post_ids and not dry_run:
+        Post.objects.filter(pk__in=post_ids).update(
+            comments_count=comments_subquery())
+    return len(post_ids)
@@ -0,0 +1,107 @@
+"""
+Потоковая выгрузка постов, комментариев и подписок в NDJSON или CSV.
+
+Строки читаются .iterator(chunk_size=EXPORT_CHUNK_SIZE) по возрастанию
+id и сразу превращаются в текст, поэтому память не зависит от размера
+таблицы. Выгрузку можно продолжить с места обрыва: after_id — последний
+полученный id, since — нижняя граница даты создания.
+"""
+import csv
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Post
+
+# Таблица → (модель, колонки, поле даты создания или None).
+EXPORTS = {
+    'posts': (
+        Post,
+        (
+            'id',
+            'text',
+            'pub_date',
+            'updated',
+            'author_id',
+            'group_id',
+            'image',
+            'comments_count',
+        ),
+        'pub_date',
+    ),
+    'comments': (
+        Comment,
+        ('id', 'post_id', 'author_id', 'text', 'created'),
+        'created',
+    ),
+    'follows': (Follow, ('id', 'user_id', 'author_id'), None),
+}
+FORMATS = ('ndjson', 'csv')
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+class Echo:
+    """Буфер для csv.writer, который сразу отдаёт записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def parse_since(value):
+    """Дата ISO 8601; без часового пояса считается в TIME_ZONE."""
+    since = parse_datetime(value)
+    if since is None:
+        raise ValueError(f'Неверная дата {value}.')
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def export_rows(table, after_id=None, since=None):
+    """Кортежи значений колонок таблицы по возрастанию id."""
+    if table not in EXPORTS:
+        raise ValueError(f'Неизвестная таблица {table}.')
+    model, columns, date_field = EXPORTS[table]
+    rows = model.objects.order_by('pk')
+    if after_id is not None:
+        rows = rows.filter(pk__gt=after_id)
+    if since is not None:
+        if date_field is None:
+            raise ValueError(f'В таблице {table} нет даты создания.')
+        rows = rows.filter(**{f'{date_field}__gte': since})
+    return columns, rows.values_list(*columns).iterator(
+        chunk_size=settings.EXPORT_CHUNK_SIZE)
+
+
+def export_lines(table, export_format, after_id=None, since=None):
+    """
+    Строки выгрузки в формате ndjson или csv (с заголовком). Ошибки
+    в параметрах поднимаются сразу, до первой строки.
+    """
+    if export_format not in FORMATS:
+        raise ValueError(f'Неизвестный формат {export_format}.')
+    columns, rows = export_rows(table, after_id, since)
+    if export_format == 'csv':
+        return csv_lines(columns, rows)
+    return ndjson_lines(columns, rows)
+
+
+def ndjson_lines(columns, rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def csv_lines(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([
+            value.isoformat() if hasattr(value, 'isoformat') else value
+            for value in row
+        ])
@@ -0,0 +1,39 @@
+"""
+Querysets лент и страницы поста. Ими пользуются и HTML-страницы
+(posts.views), и JSON API (api.views), поэтому у обоих одинаковые
+select_related и одинаковая паджинация курсорами.
+"""
+from core.paginator import CursorPaginator
+
+from .models import Post
+from .timeline import timeline_posts
+
+
+def index_feed():
+    return Post.objects.select_related('author', 'group')
+
+
+def group_feed(group):
+    return group.groups.select_related('author')
+
+
+def author_feed(author):
+    return author.posts.select_related('group')
+
+
+def follow_feed(user):
+    return timeline_posts(user).select_related('author', 'group')
+
+
+def post_detail_queryset():
+    return Post.objects.select_related('author__stats', 'group')
+
+
+def paginate(request, object_list, per_page):
+    """Страница ленты по параметрам запроса page, after и before."""
+    paginator = CursorPaginator(object_list, per_page)
+    return paginator.get_page(
+        request.GET.get('page'),
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
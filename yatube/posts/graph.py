@@ -0,0 +1,164 @@
+"""
+Граф подписок в компактном виде: для каждого пользователя —
+отсортированные массивы id тех, на кого он подписан (followees), и его
+подписчиков (followers), плюс массив авторов, чьи посты читатели
+забирают напрямую (см. timeline.is_pulled).
+
+Массивы лежат в общем кэше как байты array('I') под ключом с версией
+пользователя. Запись подписки сдвигает версии сразу и ещё раз после
+коммита: если читатель успел положить в кэш массив до коммита, он
+остаётся под старой версией и больше не читается. Содержимое ключа с
+версией не меняется, поэтому процесс держит последние массивы у себя
+(GRAPH_LOCAL_SIZE штук) и при попадании читает из общего кэша только
+номер версии.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AuthorStats, Follow
+
+# 4 байта на id; id больше 2**32 - 1 array('I') не примет.
+TYPECODE = 'I'
+VERSION_KEY_TEMPLATE = 'posts:graph:{kind}:{owner}:version'
+ARRAY_KEY_TEMPLATE = 'posts:graph:{kind}:{owner}:{version}'
+FOLLOWEES = 'followees'
+FOLLOWERS = 'followers'
+PULLED = 'pulled'
+
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def version_key(kind, owner):
+    return VERSION_KEY_TEMPLATE.format(kind=kind, owner=owner)
+
+
+def get_version(kind, owner):
+    """
+    Версия массива. Если счётчик вытеснен из кэша, он начинается с
+    текущего времени в миллисекундах, как поколение кэша страниц.
+    """
+    key = version_key(kind, owner)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(kind, owner):
+    try:
+        cache.incr(version_key(kind, owner))
+    except ValueError:
+        get_version(kind, owner)
+
+
+def load(kind, owner):
+    if kind == FOLLOWEES:
+        rows = Follow.objects.filter(user_id=owner).values_list('author_id')
+    elif kind == FOLLOWERS:
+        rows = Follow.objects.filter(author_id=owner).values_list('user_id')
+    else:
+        rows = AuthorStats.objects.filter(
+            followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('user_id')
+    return array(TYPECODE, sorted(pk for pk, in rows))
+
+
+def get_array(kind, owner):
+    key = ARRAY_KEY_TEMPLATE.format(
+        kind=kind, owner=owner, version=get_version(kind, owner))
+    with _local_lock:
+        ids = _local.get(key)
+        if ids is not None:
+            _local.move_to_end(key)
+            return ids
+    data = cache.get(key)
+    if data is None:
+        ids = load(kind, owner)
+        cache.set(key, ids.tobytes(), settings.GRAPH_CACHE_TIMEOUT)
+    else:
+        ids = array(TYPECODE)
+        ids.frombytes(data)
+    with _local_lock:
+        _local[key] = ids
+        while len(_local) > settings.GRAPH_LOCAL_SIZE:
+            _local.popitem(last=False)
+    return ids
+
+
+def followees(user_id):
+    """Отсортированные id авторов, на которых подписан пользователь."""
+    return get_array(FOLLOWEES, user_id)
+
+
+def followers(user_id):
+    """Отсортированные id подписчиков пользователя."""
+    return get_array(FOLLOWERS, user_id)
+
+
+def pulled_authors():
+    """Отсортированные id авторов, посты которых не рассылаются по лентам."""
+    return get_array(PULLED, 'all')
+
+
+def contains(ids, pk):
+    position = bisect_left(ids, pk)
+    return position < len(ids) and ids[position] == pk
+
+
+def is_following(user_id, author_id):
+    return contains(followees(user_id), author_id)
+
+
+def intersection(left, right):
+    """
+    Общие id двух отсортированных массивов. Если один много меньше,
+    его элементы ищутся в другом двоичным поиском, иначе — слияние.
+    """
+    if len(left) > len(right):
+        left, right = right, left
+    if len(left) * 8 < len(right):
+        return array(TYPECODE, (pk for pk in left if contains(right, pk)))
+    common = array(TYPECODE)
+    i = j = 0
+    while i < len(left) and j < len(right):
+        if left[i] < right[j]:
+            i += 1
+        elif left[i] > right[j]:
+            j += 1
+        else:
+            common.append(left[i])
+            i += 1
+            j += 1
+    return common
+
+
+def expire_follow(user_id, author_id):
+    """Сдвигает версии массивов обоих концов подписки."""
+    def bump():
+        bump_version(FOLLOWEES, user_id)
+        bump_version(FOLLOWERS, author_id)
+
+    bump()
+    transaction.on_commit(bump)
+    followers_count = AuthorStats.objects.filter(
+        user_id=author_id).values_list('followers_count', flat=True).first()
+    # Автор только что перешёл порог рассылки в одну или другую сторону.
+    if followers_count in (
+        settings.TIMELINE_FANOUT_LIMIT,
+        settings.TIMELINE_FANOUT_LIMIT + 1,
+    ):
+        expire_pulled()
+
+
+def expire_pulled():
+    bump_version(PULLED, 'all')
+    transaction.on_commit(lambda: bump_version(PULLED, 'all'))
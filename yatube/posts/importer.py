@@ -0,0 +1,251 @@
+"""
+Массовый импорт постов и комментариев из NDJSON: по объекту JSON на
+строку.
+
+    {"type": "post", "text": "...", "group": "slug", "author": "login"}
+    {"type": "comment", "post": 12, "text": "...", "author": "login"}
+
+type по умолчанию post, group необязателен. Строки проверяются правилами
+PostForm и CommentForm и пишутся через bulk_create пачками по
+IMPORT_BATCH_SIZE, каждая пачка — в своей транзакции. Ошибочные строки
+попадают в отчёт и не мешают остальным строкам пачки.
+
+bulk_create не шлёт сигналы, поэтому счётчики, ленты подписок,
+поисковый индекс и кэш страниц обновляются здесь же.
+"""
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.forms import modelform_factory
+
+from .cache import expire_pages, expire_profiles
+from .counters import (
+    change_author_stats,
+    change_group_stats,
+    change_post_comments,
+)
+from .forms import CommentForm, PostForm
+from .models import Comment, Group, Post, User
+from .search import index_posts
+from .timeline import fan_out_posts
+
+# Группа приходит слагом и проверяется одним запросом на пачку,
+# остальные поля — правилами PostForm.
+PostRowForm = modelform_factory(Post, form=PostForm, fields=['text'])
+# Типы значений полей строки; bool в Python — тоже int, но номером
+# поста быть не может.
+ROW_FIELD_TYPES = {
+    'type': (str, 'Ожидается строка.'),
+    'text': (str, 'Ожидается строка.'),
+    'author': (str, 'Ожидается строка.'),
+    'group': (str, 'Ожидается строка.'),
+    'post': (int, 'Ожидается целое число.'),
+}
+
+
+def new_report():
+    return {'posts': 0, 'comments': 0, 'errors': []}
+
+
+def add_error(report, line, errors):
+    report['errors'].append({'line': line, 'errors': errors})
+
+
+def form_errors(form):
+    return {
+        field: [str(error) for error in errors]
+        for field, errors in form.errors.items()
+    }
+
+
+def created_ids(model, objects):
+    """
+    id строк, вставленных bulk_create. SQLite в Django 2.2 их не
+    возвращает; но внутри транзакции после вставки таблица заблокирована
+    на запись, а id выдаются по AUTOINCREMENT, так что новые строки —
+    последние по id.
+    """
+    if all(obj.pk is not None for obj in objects):
+        return [obj.pk for obj in objects]
+    ids = model.objects.order_by('-pk').values_list('pk', flat=True)
+    return list(ids[:len(objects)])[::-1]
+
+
+def type_errors(row):
+    return {
+        field: [message]
+        for field, (expected, message) in ROW_FIELD_TYPES.items()
+        if row.get(field) is not None and (
+            not isinstance(row[field], expected)
+            or isinstance(row[field], bool)
+        )
+    }
+
+
+def parse_lines(batch, report):
+    """Строки пачки, которые разобрались в объект JSON с верными типами."""
+    rows = []
+    for line, raw in batch:
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            row = None
+        if not isinstance(row, dict):
+            add_error(report, line, {
+                '__all__': ['Строка должна быть объектом JSON.']})
+            continue
+        errors = type_errors(row)
+        if errors:
+            add_error(report, line, errors)
+            continue
+        rows.append((line, row))
+    return rows
+
+
+def resolve_author(row, author, authors):
+    """Автор строки или сообщение об ошибке."""
+    username = row.get('author')
+    if author is not None:
+        if username not in (None, author.username):
+            return None, 'Можно импортировать только свои записи.'
+        return author, None
+    if username is None:
+        return None, 'Не указан автор.'
+    if username not in authors:
+        return None, f'Пользователь {username} не найден.'
+    return authors[username], None
+
+
+def build_post(row, author, groups):
+    form = PostRowForm(data={'text': row.get('text')})
+    errors = {} if form.is_valid() else form_errors(form)
+    slug = row.get('group') or None
+    if slug and slug not in groups:
+        errors['group'] = [f'Группа {slug} не найдена.']
+    if errors:
+        return None, errors
+    post = form.save(commit=False)
+    post.author = author
+    post.group = groups.get(slug) if slug else None
+    return post, None
+
+
+def build_comment(row, author, post_ids):
+    form = CommentForm(data={'text': row.get('text')})
+    errors = {} if form.is_valid() else form_errors(form)
+    if row.get('post') not in post_ids:
+        errors['post'] = [f'Пост {row.get("post")} не найден.']
+    if errors:
+        return None, errors
+    comment = form.save(commit=False)
+    comment.author = author
+    comment.post_id = row['post']
+    return comment, None
+
+
+def build_objects(rows, author, report):
+    """Проверяет строки пачки; связанные объекты — запросом на пачку."""
+    groups = Group.objects.in_bulk(
+        {row['group'] for _, row in rows if row.get('group')},
+        field_name='slug',
+    )
+    authors = {}
+    if author is None:
+        authors = User.objects.in_bulk(
+            {row['author'] for _, row in rows if row.get('author')},
+            field_name='username',
+        )
+    post_ids = set(Post.objects.filter(pk__in=[
+        row['post'] for _, row in rows if row.get('post') is not None
+    ]).values_list('pk', flat=True))
+    posts, comments = [], []
+    for line, row in rows:
+        row_author, author_error = resolve_author(row, author, authors)
+        kind = row.get('type', 'post')
+        if kind == 'post':
+            obj, errors = build_post(row, row_author, groups)
+            objects = posts
+        elif kind == 'comment':
+            obj, errors = build_comment(row, row_author, post_ids)
+            objects = comments
+        else:
+            obj, errors = None, {'type': [f'Неизвестный тип {kind}.']}
+        if author_error:
+            errors = {**(errors or {}), 'author': [author_error]}
+        if errors:
+            add_error(report, line, errors)
+        else:
+            objects.append(obj)
+    return posts, comments
+
+
+def after_posts_created(posts):
+    authors = Counter(p.author_id for p in posts)
+    for author_id, count in authors.items():
+        change_author_stats(author_id, posts_count=count)
+    expire_profiles(*authors)
+    for group_id, count in Counter(p.group_id for p in posts).items():
+        change_group_stats(group_id, posts_count=count)
+    by_author = {}
+    for post in posts:
+        by_author.setdefault(post.author_id, []).append(post.pk)
+    for author_id, post_ids in by_author.items():
+        fan_out_posts(author_id, post_ids)
+    index_posts(post.pk for post in posts)
+
+
+def after_comments_created(comments):
+    for author_id, count in Counter(c.author_id for c in comments).items():
+        change_author_stats(author_id, comments_count=count)
+    for post_id, count in Counter(c.post_id for c in comments).items():
+        change_post_comments(post_id, count)
+    index_posts({comment.post_id for comment in comments})
+
+
+def import_batch(batch, author, report):
+    rows = parse_lines(batch, report)
+    posts, comments = build_objects(rows, author, report)
+    if not posts and not comments:
+        return
+    try:
+        with transaction.atomic():
+            Post.objects.bulk_create(posts)
+            for post, pk in zip(posts, created_ids(Post, posts)):
+                post.pk = pk
+            Comment.objects.bulk_create(comments)
+            after_posts_created(posts)
+            after_comments_created(comments)
+    except DatabaseError as error:
+        message = f'Пачка до строки {batch[-1][0]} не записана: {error}'
+        add_error(report, batch[0][0], {'__all__': [message]})
+        return
+    report['posts'] += len(posts)
+    report['comments'] += len(comments)
+
+
+def import_lines(lines, author=None, batch_size=None):
+    """
+    Импортирует строки NDJSON (str или bytes). Если задан author, все
+    записи создаются от его имени, иначе автор берётся из поля author.
+    Возвращает отчёт: число созданных постов и комментариев и ошибки
+    по номерам строк.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    report = new_report()
+    batch = []
+    for line, raw in enumerate(lines, start=1):
+        if isinstance(raw, bytes):
+            raw = raw.decode('utf-8', errors='replace')
+        if not raw.strip():
+            continue
+        batch.append((line, raw))
+        if len(batch) == batch_size:
+            import_batch(batch, author, report)
+            batch = []
+    if batch:
+        import_batch(batch, author, report)
+    if report['posts'] or report['comments']:
+        expire_pages()
+    return report
@@ -0,0 +1,97 @@
+"""
+Новые посты на главной и в ленте подписок без перезагрузки страницы:
+поток Server-Sent Events с карточками постов.
+
+post_create после коммита публикует событие в канал NEW_POSTS. Поток по
+событию читает из базы посты своей ленты с id больше курсора и
+отправляет их карточки; курсор — id последнего показанного поста из
+параметра after или заголовка Last-Event-ID, с которым EventSource сам
+переподключается. Канал живёт в памяти процесса, поэтому без события
+лента всё равно проверяется раз в LIVE_FEED_HEARTBEAT секунд — так
+видны и посты, созданные другими процессами.
+
+Под WSGI ожидание заняло бы поток сервера на всё время, пока открыта
+вкладка, поэтому поток отдаёт новые посты один раз и закрывается, а
+браузер переподключается через LIVE_FEED_POLL_RETRY миллисекунд —
+короткий опрос. Под ASGI (core.asgi) ожидание идёт в событийном цикле,
+а поток из пула обработчика берётся только на чтение из базы.
+"""
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.template.loader import render_to_string
+
+from core import asgi
+from core.pubsub import Channel
+
+NEW_POSTS = Channel()
+PING = ': ping\n\n'
+
+
+def publish_new_post():
+    transaction.on_commit(NEW_POSTS.publish)
+
+
+def post_event(post):
+    html = render_to_string('includes/post_pattern.html', {'post': post})
+    data = json.dumps({'id': post.pk, 'html': html}, ensure_ascii=False)
+    return f'id: {post.pk}\nevent: post\ndata: {data}\n\n'
+
+
+def parse_cursor(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class LiveFeed:
+    """Поток событий о постах ленты feed новее поста after."""
+
+    def __init__(self, feed, after=None):
+        self.feed = feed.order_by('pk')
+        if after is None:
+            after = feed.order_by('-pk').values_list('pk', flat=True).first()
+        self.after = after or 0
+        self.version = NEW_POSTS.version
+
+    def new_events(self):
+        """Карточки всех постов новее курсора, пачками из базы."""
+        events = []
+        while True:
+            posts = list(self.feed.filter(
+                pk__gt=self.after)[:settings.LIVE_FEED_BATCH])
+            events.extend(post_event(post) for post in posts)
+            if posts:
+                self.after = posts[-1].pk
+            if len(posts) < settings.LIVE_FEED_BATCH:
+                return ''.join(events) or PING
+
+    def poll(self):
+        """new_events для потока вне запроса: соединения закрываются."""
+        close_old_connections()
+        try:
+            return self.new_events()
+        finally:
+            close_old_connections()
+
+    def timeout(self, deadline):
+        return min(settings.LIVE_FEED_HEARTBEAT, deadline - time.monotonic())
+
+    def __iter__(self):
+        yield f'retry: {settings.LIVE_FEED_POLL_RETRY}\n\n'
+        yield self.new_events()
+
+    async def __aiter__(self):
+        yield f'retry: {settings.LIVE_FEED_RETRY}\n\n'
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic() + settings.LIVE_FEED_ASYNC_SECONDS
+        while True:
+            yield await loop.run_in_executor(asgi.executor.get(), self.poll)
+            timeout = self.timeout(deadline)
+            if timeout <= 0:
+                return
+            self.version = await NEW_POSTS.wait_async(self.version, timeout)
@@ -0,0 +1,198 @@
+"""
+Нагрузочный сценарий для страниц posts/urls.py: асинхронные клиенты на
+asyncio шлют запросы к запущенному серверу и меряют время ответа по
+маршрутам.
+
+Адреса берутся из базы с тем же перекосом, что у живых посетителей:
+чаще — популярные авторы и группы и свежие посты (данные удобно
+сгенерировать командой seed_yatube). Часть клиентов входит на сайт:
+сессия создаётся прямо в базе, пароль не нужен. Живые ленты (SSE),
+отправка комментария (POST с CSRF) и подписка/отписка (меняют данные)
+в сценарий не входят.
+"""
+import asyncio
+import random
+import time
+from http import HTTPStatus
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import (
+    BACKEND_SESSION_KEY,
+    HASH_SESSION_KEY,
+    SESSION_KEY,
+)
+from django.urls import reverse
+
+from .models import AuthorStats, Follow, GroupStats, Post, User
+from .seeding import WORDS, skewed
+
+# Маршрут → (вес в смеси запросов, нужен ли вход).
+ROUTES = {
+    'posts:index': (30, False),
+    'posts:post_detail': (25, False),
+    'posts:profile': (15, False),
+    'posts:group_list': (10, False),
+    'posts:search': (5, False),
+    'posts:follow_index': (10, True),
+    'posts:post_edit': (3, True),
+    'posts:post_create': (2, True),
+}
+# Сколько популярных авторов, групп и свежих постов участвуют в выборе.
+SAMPLE_SIZE = 1000
+SKEW = 2
+PERCENTILES = (0.5, 0.95, 0.99)
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def session_cookie(user):
+    """Cookie сессии вошедшего пользователя, как после login()."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f'{settings.SESSION_COOKIE_NAME}={session.session_key}'
+
+
+class Scenario:
+    """Адреса маршрутов и сессии читателей для нагрузки."""
+
+    def __init__(self, routes=None, sessions=10, seed=None):
+        self.rnd = random.Random(seed)
+        self.routes = {name: ROUTES[name] for name in routes or ROUTES}
+        self.authors = list(
+            AuthorStats.objects.order_by('-followers_count').values_list(
+                'user__username', flat=True)[:SAMPLE_SIZE])
+        self.groups = list(
+            GroupStats.objects.order_by('-posts_count').values_list(
+                'group__slug', flat=True)[:SAMPLE_SIZE])
+        self.posts = list(
+            Post.objects.values_list('pk', flat=True)[:SAMPLE_SIZE])
+        readers = User.objects.filter(
+            pk__in=Follow.objects.values('user_id'),
+            posts__isnull=False,
+        ).distinct()[:sessions]
+        self.readers = [
+            (
+                session_cookie(reader),
+                reader.posts.values_list('pk', flat=True).first(),
+            )
+            for reader in readers
+        ]
+
+    def pick(self, items):
+        return items[skewed(self.rnd, len(items), SKEW)]
+
+    def available(self, logged_in):
+        """Маршруты, для которых в базе нашлось что запрашивать."""
+        data = {
+            'posts:group_list': self.groups,
+            'posts:profile': self.authors,
+            'posts:post_detail': self.posts,
+        }
+        return [
+            name for name, (_, login) in self.routes.items()
+            if (logged_in or not login) and data.get(name, True)
+        ]
+
+    def path(self, name, reader=None):
+        if name == 'posts:group_list':
+            return reverse(name, args=[self.pick(self.groups)])
+        if name == 'posts:profile':
+            return reverse(name, args=[self.pick(self.authors)])
+        if name == 'posts:post_detail':
+            return reverse(name, args=[self.pick(self.posts)])
+        if name == 'posts:post_edit':
+            return reverse(name, args=[reader[1]])
+        if name == 'posts:search':
+            query = ' '.join(self.rnd.sample(WORDS, self.rnd.randint(1, 2)))
+            return f'{reverse(name)}?{urlencode({"q": query})}'
+        return reverse(name)
+
+
+async def fetch(host, port, path, cookie=None):
+    """GET-запрос; возвращает код ответа, тело читается целиком."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        headers = [
+            f'GET {path} HTTP/1.1',
+            f'Host: {host}',
+            'User-Agent: yatube-load',
+            'Accept: text/html',
+            'Connection: close',
+        ]
+        if cookie:
+            headers.append(f'Cookie: {cookie}')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+        status = (await reader.readline()).split()
+        await reader.read()
+        return int(status[1]) if len(status) > 1 else None
+    finally:
+        writer.close()
+
+
+async def run_load(url, scenario, seconds, clients, logged_in_share):
+    """
+    Гоняет clients клиентов seconds секунд. Возвращает по маршрутам
+    (времена ответов 200, число ошибок); ошибка — любой другой код,
+    в том числе редирект на вход, или обрыв соединения.
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    deadline = time.monotonic() + seconds
+    latencies = {name: [] for name in scenario.routes}
+    errors = dict.fromkeys(scenario.routes, 0)
+
+    async def client(number):
+        reader = None
+        if scenario.readers and number < clients * logged_in_share:
+            reader = scenario.readers[number % len(scenario.readers)]
+        names = scenario.available(reader is not None)
+        weights = [scenario.routes[name][0] for name in names]
+        while names and time.monotonic() < deadline:
+            name = scenario.rnd.choices(names, weights)[0]
+            path = scenario.path(name, reader)
+            started = time.monotonic()
+            try:
+                status = await fetch(
+                    host, port, path, reader and reader[0])
+            except OSError:
+                status = None
+            if status == HTTPStatus.OK:
+                latencies[name].append(time.monotonic() - started)
+            else:
+                errors[name] += 1
+
+    await asyncio.gather(*(client(number) for number in range(clients)))
+    return {name: (latencies[name], errors[name]) for name in latencies}
+
+
+def report_lines(results, seconds):
+    """Строки отчёта: запросов в секунду и перцентили по маршрутам."""
+    lines = []
+    total = []
+    for name, (latencies, errors) in results.items():
+        total.extend(latencies)
+        lines.append(report_line(name, latencies, errors, seconds))
+    errors = sum(errors for _, errors in results.values())
+    lines.append(report_line('всего', total, errors, seconds))
+    return lines
+
+
+def report_line(name, latencies, errors, seconds):
+    if not latencies:
+        return f'{name}: ни одного ответа, ошибок {errors}'
+    latencies = sorted(latencies)
+    values = ', '.join(
+        f'p{share * 100:.0f} {percentile(latencies, share) * 1000:.1f} мс'
+        for share in PERCENTILES
+    )
+    return (
+        f'{name}: {len(latencies) / seconds:.1f} запросов/с, {values}, '
+        f'ошибок {errors}'
+    )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.exporter import EXPORTS, FORMATS, export_lines, parse_since
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает посты, комментарии или подписки в NDJSON '
+        'или CSV. Выгрузку можно продолжить с id или даты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('table', choices=sorted(EXPORTS))
+        parser.add_argument(
+            '--format', choices=FORMATS, default='ndjson', dest='format')
+        parser.add_argument(
+            '--after-id',
+            type=int,
+            help='Выгружать строки с id больше этого.',
+        )
+        parser.add_argument(
+            '--since',
+            help='Выгружать строки, созданные не раньше этой даты.',
+        )
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        try:
+            since = options['since'] and parse_since(options['since'])
+            lines = export_lines(
+                options['table'],
+                options['format'],
+                after_id=options['after_id'],
+                since=since or None,
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8',
+                      newline='') as output:
+                output.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
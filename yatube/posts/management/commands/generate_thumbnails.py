@@ -0,0 +1,45 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.models import Post
+from posts.thumbnails import run_task, safe_generate_thumbnail
+
+
+class Command(BaseCommand):
+    help = (
+        'Готовит миниатюры для уже загруженных изображений постов '
+        '(media/posts/), у которых их ещё нет.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать миниатюры и для постов, где они уже есть.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=settings.POST_THUMBNAIL_WORKERS or 1,
+            help='Сколько потоков делают миниатюры (1 — в текущем).',
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='')
+        if not options['all']:
+            posts = posts.filter(Q(thumbnail='') | Q(image_variants=''))
+        post_ids = list(posts.values_list('pk', flat=True))
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                for _ in executor.map(run_task, post_ids):
+                    pass
+        else:
+            for post_id in post_ids:
+                safe_generate_thumbnail(post_id)
+        ready = Post.objects.filter(pk__in=post_ids).exclude(thumbnail='')
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюр готово: {ready.count()} из {len(post_ids)}.'
+        ))
@@ -0,0 +1,52 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importer import import_lines
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует посты и комментарии из файла NDJSON (по объекту '
+        'JSON на строку, формат — в posts.importer). Ошибочные строки '
+        'пропускаются и перечисляются в отчёте.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Файл NDJSON; «-» — читать из stdin.')
+        parser.add_argument(
+            '--author',
+            help='Создавать все записи от имени этого пользователя.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Строк в одной пачке (по умолчанию IMPORT_BATCH_SIZE).',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] is not None and options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля.')
+        author = None
+        if options['author']:
+            author = User.objects.filter(username=options['author']).first()
+            if author is None:
+                raise CommandError(
+                    f'Пользователь {options["author"]} не найден.')
+        if options['path'] == '-':
+            report = import_lines(
+                sys.stdin, author, batch_size=options['batch_size'])
+        else:
+            with open(options['path'], encoding='utf-8') as lines:
+                report = import_lines(
+                    lines, author, batch_size=options['batch_size'])
+        for error in report['errors']:
+            self.stderr.write(json.dumps(error, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано постов: {report["posts"]}, '
+            f'комментариев: {report["comments"]}, '
+            f'ошибок: {len(report["errors"])}.'
+        ))
@@ -0,0 +1,47 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from posts.loadtest import ROUTES, Scenario, report_lines, run_load
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный тест страниц posts/urls.py против запущенного '
+        'сервера: запросов в секунду и p50/p95/p99 по маршрутам. Данные '
+        'для него готовит seed_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000')
+        parser.add_argument('--seconds', type=float, default=30)
+        parser.add_argument('--clients', type=int, default=20)
+        parser.add_argument(
+            '--logged-in',
+            type=float,
+            default=0.5,
+            help='Доля клиентов, вошедших на сайт.',
+        )
+        parser.add_argument(
+            '--routes',
+            nargs='+',
+            choices=sorted(ROUTES),
+            help='Только эти маршруты (по умолчанию все).',
+        )
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        scenario = Scenario(
+            routes=options['routes'],
+            sessions=options['clients'],
+            seed=options['seed'],
+        )
+        results = asyncio.run(run_load(
+            options['url'],
+            scenario,
+            options['seconds'],
+            options['clients'],
+            options['logged_in'],
+        ))
+        for line in report_lines(results, options['seconds']):
+            self.stdout.write(line)
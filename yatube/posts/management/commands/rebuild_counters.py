@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import (
+    repair_author_stats,
+    repair_group_stats,
+    repair_post_comments,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет денормализованные счётчики авторов, групп и постов '
+        'с таблицами Post, Comment и Follow и исправляет разошедшиеся.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, сколько счётчиков разошлось.',
+        )
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        authors = repair_author_stats(dry_run=dry_run)
+        groups = repair_group_stats(dry_run=dry_run)
+        posts = repair_post_comments(dry_run=dry_run)
+        action = 'Разошлось' if dry_run else 'Исправлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action}: авторов — {authors}, групп — {groups}, '
+            f'постов — {posts}.'
+        ))
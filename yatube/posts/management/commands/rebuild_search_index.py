@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.search import is_available, rebuild_index
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново строит полнотекстовый индекс постов и комментариев. '
+        'Нужна после bulk_create и правок постов через update().'
+    )
+
+    def handle(self, *args, **options):
+        if not is_available():
+            raise CommandError(
+                'Полнотекстовый поиск работает только на SQLite.')
+        indexed = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Постов в поисковом индексе: {indexed}.'
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import TimelineEntry
+from posts.timeline import rebuild_timelines
+
+
+class Command(BaseCommand):
+    help = (
+        'Заново собирает материализованные ленты подписок по таблице '
+        'Follow. Нужна для починки лент и после того, как автор '
+        'опустился под лимит рассылки.'
+    )
+
+    def handle(self, *args, **options):
+        rebuild_timelines()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в лентах: {TimelineEntry.objects.count()}.'
+        ))
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.seeding import Seeder
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими пользователями, группами, '
+        'подписками, постами и комментариями с перекосом популярности, '
+        'как у живой сети, для нагрузочных тестов (load_yatube).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=100000,
+            help='Сколько подписок разыграть; повторы отбрасываются.',
+        )
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument(
+            '--days',
+            type=int,
+            default=365,
+            help='За сколько последних дней распределить посты.',
+        )
+        parser.add_argument(
+            '--seed', type=int, help='Зерно генератора для повторяемости.')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        seeder = Seeder(
+            seed=options['seed'],
+            days=options['days'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        seeder.run(
+            users=options['users'],
+            groups=options['groups'],
+            follows=options['follows'],
+            posts=options['posts'],
+            comments=options['comments'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово за {time.monotonic() - started:.0f} с.'))
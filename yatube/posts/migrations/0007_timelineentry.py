@@ -0,0 +1,65 @@
+# Generated by Django 2.2.16 on 2026-10-18 17:48
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+
+def fill_timelines(apps, schema_editor):
+    """
+    Раскладывает посты по лентам уже существующих подписок, как
+    rebuild_timelines. Счётчики AuthorStats ещё могут быть не собраны,
+    поэтому подписчики авторов считаются по самой таблице Follow.
+    """
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    pulled = set(
+        Follow.objects.order_by().values('author').annotate(
+            followers=Count('pk'),
+        ).filter(
+            followers__gt=settings.TIMELINE_FANOUT_LIMIT,
+        ).values_list('author', flat=True)
+    )
+    follows = Follow.objects.exclude(author__in=pulled).order_by(
+        'author').values_list('author_id', 'user_id')
+    author_id, posts, entries = None, [], []
+    for follow_author_id, user_id in follows.iterator():
+        if follow_author_id != author_id:
+            author_id = follow_author_id
+            posts = list(Post.objects.filter(author_id=author_id).values_list(
+                'pk', flat=True)[:settings.TIMELINE_BACKFILL])
+        entries.extend(
+            TimelineEntry(user_id=user_id, post_id=post_id)
+            for post_id in posts
+        )
+        if len(entries) >= settings.TIMELINE_BATCH_SIZE:
+            TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+            entries = []
+    TimelineEntry.objects.bulk_create(entries, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0006_author_group_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TimelineEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_entries', to='posts.Post', verbose_name='Пост')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='timeline', to=settings.AUTH_USER_MODEL, verbose_name='Читатель')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'unique_together': {('user', 'post')},
+            },
+        ),
+        migrations.RunPython(fill_timelines, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,101 @@
+import re
+
+import snowballstemmer
+from django.db import migrations
+
+# Копии из posts.search на момент миграции: она не должна меняться
+# вместе с кодом приложения.
+SEARCH_TABLE = 'posts_search'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+BATCH_SIZE = 500
+
+
+def normalizer():
+    """Функция, превращающая текст в строку основ слов через пробел."""
+    russian = snowballstemmer.stemmer('russian')
+    english = snowballstemmer.stemmer('english')
+    stems = {}
+
+    def stem(word):
+        if word not in stems:
+            stemmer = russian if CYRILLIC.search(word) else english
+            stems[word] = stemmer.stemWord(word)
+        return stems[word]
+
+    def normalize(text):
+        words = WORD.findall(text.lower().replace('ё', 'е'))
+        return ' '.join(stem(word) for word in words)
+
+    return normalize
+
+
+def create_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "text, comments, tokenize='unicode61 remove_diacritics 2')"
+    )
+
+
+def drop_search_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(f'DROP TABLE {SEARCH_TABLE}')
+
+
+def fill_search_table(apps, schema_editor):
+    """Индексирует уже существующие посты, как rebuild_search_index."""
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    normalize = normalizer()
+    posts = Post.objects.order_by('pk').values_list('pk', 'text')
+    batch = []
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            index_batch(schema_editor, Comment, normalize, batch)
+            batch = []
+    if batch:
+        index_batch(schema_editor, Comment, normalize, batch)
+
+
+def index_batch(schema_editor, Comment, normalize, posts):
+    comments = {}
+    for post_id, text in Comment.objects.filter(
+            post_id__in=[pk for pk, _ in posts]).values_list(
+                'post_id', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    with schema_editor.connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, text, comments) '
+            'VALUES (%s, %s, %s)',
+            [
+                (
+                    post_id,
+                    normalize(text),
+                    normalize(' '.join(comments.get(post_id, ()))),
+                )
+                for post_id, text in posts
+            ],
+        )
+
+
+class Migration(migrations.Migration):
+    """
+    Виртуальная таблица SQLite FTS5 для posts.search, сразу заполненная
+    существующими постами; дальше индекс поддерживается сигналами. На
+    других СУБД таблица не создаётся и поиск ничего не находит.
+    """
+
+    dependencies = [
+        ('posts', '0012_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_table, drop_search_table),
+        migrations.RunPython(fill_search_table, migrations.RunPython.noop),
+    ]
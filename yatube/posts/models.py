@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from django.contrib.auth import get_user_model
 
@@ -21,11 +23,17 @@ class Group(models.Model):
 
 
 class Post(models.Model):
+    DENORMALIZED_FIELDS = ('comments_count', 'thumbnail', 'image_variants')
 
     text = models.TextField(
         'Текст поста'
     )
     pub_date = models.DateTimeField('Дата публикации', auto_now_add=True)
+    updated = models.DateTimeField(
+        'Дата изменения',
+        auto_now=True,
+        help_text='Версия карточки поста в кэше шаблонов.',
+    )
     author = models.ForeignKey(
         User,
         blank=True,
@@ -49,15 +57,84 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    thumbnail = models.ImageField(
+        'Миниатюра',
+        blank=True,
+        editable=False,
+        help_text='Заполняется в фоне модулем posts.thumbnails.',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+        help_text='Денормализованный счётчик, см. posts.counters.',
+    )
+    image_variants = models.TextField(
+        'Варианты изображения',
+        blank=True,
+        editable=False,
+        help_text=(
+            'JSON: MIME-тип → список [ширина, файл]. '
+            'Заполняется в фоне модулем posts.thumbnails.'
+        ),
+    )
 
     class Meta:
         ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(
+                fields=['author', 'pub_date'],
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=['group', 'pub_date'],
+                name='post_group_pub_date_idx',
+            ),
+        ]
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Денормализованные поля пишут UPDATE-ом по id счётчики и пул
+        # миниатюр. Полное сохранение поста, загруженного до этого,
+        # затёрло бы их старыми значениями, поэтому оно их не пишет.
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.DENORMALIZED_FIELDS
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def card_image(self):
+        """
+        Миниатюра, а пока её нет (пост старше миниатюр или пул ещё не
+        успел) — исходное изображение.
+        """
+        return self.thumbnail or self.image
+
+    @property
+    def image_sources(self):
+        """Источники для <picture>: MIME-тип и srcset по ширинам."""
+        if not self.image_variants:
+            return []
+        storage = self.thumbnail.storage
+        return [
+            {
+                'type': mime_type,
+                'srcset': ', '.join(
+                    f'{storage.url(name)} {width}w'
+                    for width, name in variants
+                ),
+            }
+            for mime_type, variants in json.loads(self.image_variants).items()
+        ]
+
 
 class Comment(CreatedModel):
     post = models.ForeignKey(
@@ -78,6 +155,10 @@ class Comment(CreatedModel):
 
     class Meta:
         ordering = ['created']
+        indexes = [
+            models.Index(
+                fields=['post', 'created'], name='comment_post_created_idx'),
+        ]
         verbose_name = 'Комментарии'
         verbose_name_plural = 'Комментарии'
 
@@ -98,3 +179,74 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор'
     )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, которые поддерживаются сигналами posts.signals."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Автор'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика автора'
+        verbose_name_plural = 'Статистика авторов'
+
+    def __str__(self):
+        return f'{self.user}: {self.posts_count}'
+
+
+class GroupStats(models.Model):
+    """Число постов группы, поддерживается сигналами posts.signals."""
+    group = models.OneToOneField(
+        Group,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Группа'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+
+    class Meta:
+        verbose_name = 'Статистика группы'
+        verbose_name_plural = 'Статистика групп'
+
+    def __str__(self):
+        return f'{self.group}: {self.posts_count}'
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя, заполняется при публикации."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+
+    class Meta:
+        unique_together = ('user', 'post')
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+
+    def __str__(self):
+        return f'{self.user}: {self.post_id}'
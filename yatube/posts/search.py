@@ -0,0 +1,235 @@
+"""
+Полнотекстовый поиск по постам и комментариям на SQLite FTS5.
+
+В виртуальной таблице posts_search на каждый пост одна строка с rowid,
+равным id поста: колонка text — текст поста, comments — тексты его
+комментариев. В индекс попадают не слова, а их основы (стеммер Snowball
+для русского и английского), поэтому «котов» находит «коты» и «кот».
+Строки обновляются сигналами в той же транзакции, что и сам пост;
+новый комментарий только дописывается к строке поста, остальные
+не перечитываются. После bulk_create и правок через update() индекс
+пересобирает команда rebuild_search_index. FTS5 — расширение SQLite:
+на других СУБД индекса нет, запись в него пропускается, а поиск ничего
+не находит.
+"""
+import re
+import threading
+from functools import lru_cache
+
+import snowballstemmer
+from django.conf import settings
+from django.core.paginator import Page
+from django.db import connection, transaction
+
+from core.paginator import decode_cursor, encode_cursor
+
+from .models import Comment, Post
+
+SEARCH_TABLE = 'posts_search'
+WORD = re.compile(r'\w+')
+CYRILLIC = re.compile('[а-я]')
+MAX_QUERY_TERMS = 10
+# Строк в одном INSERT: три параметра на строку, а старые сборки SQLite
+# принимают не больше 999 параметров.
+INSERT_ROWS = 300
+# Основ в кэше: слова в текстах повторяются по закону Ципфа, и стеммер
+# иначе занимает почти всё время индексации.
+STEM_CACHE_SIZE = 100000
+
+_stemmers = threading.local()
+
+
+@lru_cache(maxsize=STEM_CACHE_SIZE)
+def stem(word):
+    """Основа слова; объекты стеммеров не потокобезопасны."""
+    if not hasattr(_stemmers, 'russian'):
+        _stemmers.russian = snowballstemmer.stemmer('russian')
+        _stemmers.english = snowballstemmer.stemmer('english')
+    if CYRILLIC.search(word):
+        return _stemmers.russian.stemWord(word)
+    return _stemmers.english.stemWord(word)
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    """Текст как строка основ слов через пробел."""
+    words = WORD.findall(text.lower().replace('ё', 'е'))
+    return ' '.join(stem(word) for word in words)
+
+
+def match_expression(query):
+    """
+    Запрос пользователя как выражение MATCH: все слова обязательны,
+    каждое — префикс основы. Пустая строка, если слов нет.
+    """
+    terms = normalize(query).split()[:MAX_QUERY_TERMS]
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def index_posts(post_ids):
+    """Пересобирает строки индекса для постов; удалённые убирает."""
+    post_ids = list(post_ids)
+    if not post_ids or not is_available():
+        return
+    texts = dict(
+        Post.objects.filter(pk__in=post_ids).values_list('pk', 'text'))
+    comments = {}
+    for post_id, text in Comment.objects.filter(
+            post_id__in=texts).values_list('post_id', 'text'):
+        comments.setdefault(post_id, []).append(text)
+    rows = [
+        (
+            post_id,
+            normalize(text),
+            normalize(' '.join(comments.get(post_id, ()))),
+        )
+        for post_id, text in texts.items()
+    ]
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})',
+            post_ids,
+        )
+        # Одним INSERT на несколько строк, а не executemany: его не умеет
+        # записывать debug_toolbar при DEBUG.
+        for start in range(0, len(rows), INSERT_ROWS):
+            chunk = rows[start:start + INSERT_ROWS]
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE} (rowid, text, comments) '
+                'VALUES ' + ', '.join(['(%s, %s, %s)'] * len(chunk)),
+                [value for row in chunk for value in row],
+            )
+
+
+def add_comment(post_id, text):
+    """
+    Дописывает основы нового комментария к строке поста. Если строки
+    нет, пересобирает её целиком.
+    """
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {SEARCH_TABLE} '
+            "SET comments = ltrim(comments || ' ' || %s) WHERE rowid = %s",
+            [normalize(text), post_id],
+        )
+        if not cursor.rowcount:
+            index_posts([post_id])
+
+
+def remove_post(post_id):
+    if not is_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild_index():
+    """Заново строит индекс по всем постам. Возвращает их число."""
+    batch_size = settings.SEARCH_BATCH_SIZE
+    indexed = 0
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        batch = []
+        for post_id in Post.objects.order_by('pk').values_list(
+                'pk', flat=True).iterator(chunk_size=batch_size):
+            batch.append(post_id)
+            if len(batch) == batch_size:
+                index_posts(batch)
+                indexed += len(batch)
+                batch = []
+        index_posts(batch)
+        indexed += len(batch)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"INSERT INTO {SEARCH_TABLE} ({SEARCH_TABLE}) "
+                "VALUES ('optimize')"
+            )
+    return indexed
+
+
+def ranked_ids(expression, per_page, after=None, before=None):
+    """
+    id постов по возрастанию bm25 (чем меньше, тем релевантнее) с
+    ключом (ранг, id) для курсоров. Возвращает до per_page + 1 пар.
+    """
+    text_weight, comments_weight = settings.SEARCH_RANK_WEIGHTS
+    params = [text_weight, comments_weight, expression]
+    where = ''
+    order = 'score, rowid'
+    if after:
+        where = 'WHERE score > %s OR (score = %s AND rowid > %s)'
+        params += [after[0], after[0], after[1]]
+    elif before:
+        where = 'WHERE score < %s OR (score = %s AND rowid < %s)'
+        params += [before[0], before[0], before[1]]
+        order = 'score DESC, rowid DESC'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT rowid, score FROM ('
+            f'SELECT rowid, bm25({SEARCH_TABLE}, %s, %s) AS score '
+            f'FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s'
+            f') {where} ORDER BY {order} LIMIT %s',
+            params + [per_page + 1],
+        )
+        return cursor.fetchall()
+
+
+def result_page(rows, number, has_previous, has_next):
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows])
+    page = Page(
+        [posts[post_id] for post_id, _ in rows if post_id in posts],
+        number,
+        None,
+    )
+    page.previous_cursor = (
+        encode_cursor(number, rows[0][1], rows[0][0])
+        if has_previous and rows else None
+    )
+    page.next_cursor = (
+        encode_cursor(number, rows[-1][1], rows[-1][0]) if has_next else None
+    )
+    return page
+
+
+def search_page(query, per_page, after=None, before=None):
+    """
+    Страница результатов поиска с курсорами next_cursor и
+    previous_cursor, как у core.paginator.CursorPaginator. Ошибочный
+    курсор или курсор за концом выдачи ведут на первую страницу.
+    """
+    expression = match_expression(query)
+    if not expression or not is_available():
+        return result_page([], 1, has_previous=False, has_next=False)
+    after = after and decode_cursor(after, parse_key=float)
+    before = before and decode_cursor(before, parse_key=float)
+    if after:
+        rows = ranked_ids(expression, per_page, after=after[1:])
+        if rows:
+            return result_page(
+                rows[:per_page],
+                after[0] + 1,
+                has_previous=True,
+                has_next=len(rows) > per_page,
+            )
+    elif before:
+        rows = ranked_ids(expression, per_page, before=before[1:])
+        if rows:
+            has_previous = len(rows) > per_page
+            return result_page(
+                rows[:per_page][::-1],
+                max(before[0] - 1, 2) if has_previous else 1,
+                has_previous=has_previous,
+                has_next=True,
+            )
+    rows = ranked_ids(expression, per_page)
+    return result_page(
+        rows[:per_page], 1, has_previous=False, has_next=len(rows) > per_page)
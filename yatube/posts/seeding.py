@@ -0,0 +1,278 @@
+"""
+Синтетические данные для проверки страниц на объёме: пользователи,
+группы, подписки, посты и комментарии с перекосом, как у живой сети.
+
+Популярность автора — степенной закон: номер автора берётся как
+count * random() ** skew, так что немногие первые авторы собирают
+большую часть подписчиков и постов; так же выбираются «горячие» группы
+и свежие посты для комментариев. Строки пишутся bulk_create пачками по
+SEED_BATCH_SIZE, каждая в своей транзакции, с явными pk, поэтому
+память не растёт с объёмом.
+
+bulk_create не шлёт сигналы, поэтому счётчики, ленты подписок и
+поисковый индекс заполняются в конце одним проходом по новым строкам,
+как команды rebuild_*, но только для созданного здесь.
+"""
+import random
+from array import array
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from .cache import expire_pages
+from .counters import AUTHOR_COUNTERS, GROUP_COUNTERS, aggregate_counters
+from .graph import expire_pulled
+from .models import (
+    AuthorStats,
+    Comment,
+    Follow,
+    Group,
+    GroupStats,
+    Post,
+    TimelineEntry,
+    User,
+)
+from .search import index_posts
+
+SEED_PREFIX = 'seed'
+# Насколько сильно выбор смещён к первым элементам (1 — равномерно).
+AUTHOR_SKEW = 3
+GROUP_SKEW = 2
+COMMENT_SKEW = 2
+# Доля постов без группы.
+NO_GROUP_SHARE = 0.2
+POST_WORDS = (5, 40)
+COMMENT_WORDS = (3, 15)
+COMMENT_DELAY = timedelta(days=3)
+WORDS = (
+    'кот', 'собака', 'город', 'утро', 'вечер', 'дорога', 'книга', 'музыка',
+    'фильм', 'погода', 'работа', 'отпуск', 'море', 'горы', 'лес', 'река',
+    'поезд', 'самолёт', 'кофе', 'чай', 'завтрак', 'ужин', 'друг', 'семья',
+    'праздник', 'фотография', 'прогулка', 'спорт', 'футбол', 'бег',
+    'программа', 'код', 'ошибка', 'релиз', 'сервер', 'база', 'новость',
+    'история', 'мысль', 'идея', 'вопрос', 'ответ', 'сегодня', 'вчера',
+    'завтра', 'очень', 'снова', 'наконец', 'красивый', 'новый', 'старый',
+    'большой', 'маленький', 'первый', 'последний', 'интересный', 'смешной',
+)
+TIMELINE_SQL = (
+    'INSERT OR IGNORE INTO {timeline} (user_id, post_id) '
+    'SELECT follow.user_id, post.id FROM {follow} AS follow '
+    'JOIN (SELECT id, author_id, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS place '
+    'FROM {post}) AS post ON post.author_id = follow.author_id '
+    'JOIN {stats} AS stats ON stats.user_id = follow.author_id '
+    'WHERE follow.user_id BETWEEN %s AND %s AND post.place <= %s '
+    'AND stats.followers_count <= %s'
+)
+
+
+def skewed(rnd, count, skew):
+    """Номер от 0 до count - 1, малые номера выпадают чаще."""
+    return int(count * rnd.random() ** skew)
+
+
+def words(rnd, bounds):
+    return ' '.join(rnd.choices(WORDS, k=rnd.randint(*bounds)))
+
+
+def next_pk(model):
+    return (model.objects.aggregate(top=Max('pk'))['top'] or 0) + 1
+
+
+def chunks(count, size):
+    for start in range(0, count, size):
+        yield start, min(start + size, count)
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Даёт задать поля auto_now и auto_now_add вручную."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Seeder:
+    """Создаёт данные одного прогона seed_yatube."""
+
+    def __init__(self, seed=None, days=365, batch_size=None, log=None):
+        self.rnd = random.Random(seed)
+        self.batch_size = batch_size or settings.SEED_BATCH_SIZE
+        self.now = timezone.now()
+        self.start = self.now - timedelta(days=days)
+        self.log = log or (lambda message: None)
+        self.users = self.groups = self.posts = range(0)
+
+    def bulk(self, model, objects, **kwargs):
+        # Размер одного INSERT Django выбирает сам по лимитам SQLite.
+        with transaction.atomic():
+            model.objects.bulk_create(objects, **kwargs)
+
+    def create_users(self, count):
+        first = next_pk(User)
+        # Хэш один на всех: make_password для миллиона строк — часы.
+        password = make_password(None)
+        for start, stop in chunks(count, self.batch_size):
+            self.bulk(User, [
+                User(
+                    pk=first + number,
+                    username=f'{SEED_PREFIX}-{first + number}',
+                    password=password,
+                )
+                for number in range(start, stop)
+            ])
+        self.users = range(first, first + count)
+        self.log(f'Пользователей: {count}')
+
+    def create_groups(self, count):
+        first = next_pk(Group)
+        self.bulk(Group, [
+            Group(
+                pk=pk,
+                title=f'Группа {pk}',
+                slug=f'{SEED_PREFIX}-{pk}',
+                description=words(self.rnd, POST_WORDS),
+            )
+            for pk in range(first, first + count)
+        ])
+        self.groups = range(first, first + count)
+        self.log(f'Групп: {count}')
+
+    def create_follows(self, count):
+        """Читатель — любой, автор — по степенному закону."""
+        users = self.users
+        if len(users) < 2:
+            return
+        for start, stop in chunks(count, self.batch_size):
+            pairs = set()
+            for _ in range(start, stop):
+                follower = self.rnd.choice(users)
+                author = users[skewed(self.rnd, len(users), AUTHOR_SKEW)]
+                if follower != author:
+                    pairs.add((follower, author))
+            self.bulk(
+                Follow,
+                [Follow(user_id=user, author_id=author)
+                 for user, author in pairs],
+                ignore_conflicts=True,
+            )
+        created = Follow.objects.filter(
+            user_id__gte=users[0], user_id__lte=users[-1]).count()
+        self.log(f'Подписок: {created}')
+
+    def post_date(self, number, count):
+        """Даты растут вместе с pk, как у настоящих постов."""
+        return self.start + (self.now - self.start) * (number + 1) / count
+
+    def create_posts(self, count, comments):
+        """
+        Посты и комментарии к ним. Число комментариев каждого поста
+        разыгрывается заранее (свежие посты обсуждают больше), поэтому
+        comments_count записывается сразу, без пересчёта.
+        """
+        if not self.users or not count:
+            return
+        first = next_pk(Post)
+        counts = array('L', [0]) * count
+        for _ in range(comments):
+            counts[count - 1 - skewed(self.rnd, count, COMMENT_SKEW)] += 1
+        users, groups = self.users, self.groups
+        post_fields = (
+            Post._meta.get_field('pub_date'),
+            Post._meta.get_field('updated'),
+            Comment._meta.get_field('created'),
+        )
+        with explicit_dates(*post_fields):
+            for start, stop in chunks(count, self.batch_size):
+                posts = []
+                for number in range(start, stop):
+                    pub_date = self.post_date(number, count)
+                    group = None
+                    if groups and self.rnd.random() >= NO_GROUP_SHARE:
+                        group = groups[
+                            skewed(self.rnd, len(groups), GROUP_SKEW)]
+                    posts.append(Post(
+                        pk=first + number,
+                        text=words(self.rnd, POST_WORDS),
+                        pub_date=pub_date,
+                        updated=pub_date,
+                        author_id=users[
+                            skewed(self.rnd, len(users), AUTHOR_SKEW)],
+                        group_id=group,
+                        comments_count=counts[number],
+                    ))
+                self.bulk(Post, posts)
+                self.bulk(Comment, [
+                    Comment(
+                        post_id=post.pk,
+                        author_id=self.rnd.choice(users),
+                        text=words(self.rnd, COMMENT_WORDS),
+                        created=min(
+                            self.now,
+                            post.pub_date
+                            + COMMENT_DELAY * self.rnd.random(),
+                        ),
+                    )
+                    for post in posts
+                    for _ in range(post.comments_count)
+                ])
+        self.posts = range(first, first + count)
+        self.log(f'Постов: {count}, комментариев: {comments}')
+
+    def create_stats(self):
+        for model, owners, owner_field, counters in (
+            (AuthorStats, self.users, 'user_id', AUTHOR_COUNTERS),
+            (GroupStats, self.groups, 'group_id', GROUP_COUNTERS),
+        ):
+            totals = aggregate_counters(counters)
+            empty = {field: 0 for field in counters}
+            for start, stop in chunks(len(owners), self.batch_size):
+                self.bulk(model, [
+                    model(**{owner_field: pk, **empty, **totals.get(pk, {})})
+                    for pk in owners[start:stop]
+                ])
+
+    def create_timelines(self):
+        """Как rebuild_timelines, но одним INSERT ... SELECT."""
+        if not self.users:
+            return
+        sql = TIMELINE_SQL.format(
+            timeline=TimelineEntry._meta.db_table,
+            follow=Follow._meta.db_table,
+            post=Post._meta.db_table,
+            stats=AuthorStats._meta.db_table,
+        )
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(sql, [
+                self.users[0],
+                self.users[-1],
+                settings.TIMELINE_BACKFILL,
+                settings.TIMELINE_FANOUT_LIMIT,
+            ])
+            self.log(f'Записей в лентах: {cursor.rowcount}')
+
+    def index(self):
+        for start, stop in chunks(len(self.posts), settings.SEARCH_BATCH_SIZE):
+            with transaction.atomic():
+                index_posts(self.posts[start:stop])
+
+    def run(self, users, groups, follows, posts, comments):
+        self.create_users(users)
+        self.create_groups(groups)
+        self.create_follows(follows)
+        self.create_posts(posts, comments)
+        self.create_stats()
+        self.create_timelines()
+        self.index()
+        expire_pulled()
+        expire_pages()
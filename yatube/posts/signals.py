@@ -0,0 +1,222 @@
+from django.core.cache import cache
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from .cache import (
+    CARD_GROUP_FIELDS,
+    CARD_USER_FIELDS,
+    expire_pages,
+    expire_post_cards,
+    expire_profiles,
+    fields_changed,
+    profile_key,
+)
+from .counters import (
+    change_author_stats,
+    change_group_stats,
+    change_post_comments,
+)
+from .graph import expire_follow
+from .models import Comment, Follow, Group, Post, User
+from .search import add_comment, index_posts, remove_post
+from .thumbnails import schedule_thumbnail
+from .timeline import backfill, fan_out_post, trim
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, **kwargs):
+    instance._saved_group_id = None
+    instance._saved_image = ''
+    if instance.pk is not None:
+        saved = Post.objects.filter(pk=instance.pk).values_list(
+            'group_id', 'image').first()
+        if saved is not None:
+            instance._saved_group_id, instance._saved_image = saved
+    instance._image_changed = (
+        (instance.image.name or '') != (instance._saved_image or ''))
+    if instance._image_changed:
+        # Миниатюры старого изображения больше не подходят; в базе их
+        # сбрасывает schedule_post_thumbnail, Post.save их не пишет.
+        instance.thumbnail = ''
+        instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def count_saved_post(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, posts_count=1)
+        change_group_stats(instance.group_id, posts_count=1)
+        return
+    old_group_id = getattr(instance, '_saved_group_id', None)
+    if old_group_id != instance.group_id:
+        change_group_stats(old_group_id, posts_count=-1)
+        change_group_stats(instance.group_id, posts_count=1)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, posts_count=-1)
+    change_group_stats(instance.group_id, posts_count=-1)
+
+
+@receiver(post_save, sender=Comment)
+def count_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, comments_count=1)
+        change_post_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, comments_count=-1)
+    change_post_comments(instance.post_id, -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_saved_follow(sender, instance, created, **kwargs):
+    if created:
+        change_author_stats(instance.author_id, followers_count=1)
+        change_author_stats(instance.user_id, following_count=1)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    change_author_stats(instance.author_id, followers_count=-1)
+    change_author_stats(instance.user_id, following_count=-1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_saved_post(sender, instance, created, **kwargs):
+    if created:
+        fan_out_post(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_thumbnail(sender, instance, created, **kwargs):
+    if not getattr(instance, '_image_changed', False):
+        return
+    if not created:
+        Post.objects.filter(pk=instance.pk).update(
+            thumbnail='', image_variants='')
+    if instance.image:
+        schedule_thumbnail(instance.pk)
+
+
+@receiver(post_save, sender=Post)
+def index_saved_post(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        index_posts([instance.pk])
+
+
+@receiver(post_delete, sender=Post)
+def unindex_deleted_post(sender, instance, **kwargs):
+    remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def index_saved_comment(sender, instance, created, **kwargs):
+    if created:
+        add_comment(instance.post_id, instance.text)
+    else:
+        index_posts([instance.post_id])
+
+
+@receiver(post_delete, sender=Comment)
+def unindex_deleted_comment(sender, instance, **kwargs):
+    index_posts([instance.post_id])
+
+
+@receiver(post_save, sender=Follow)
+def backfill_followed_author(sender, instance, created, **kwargs):
+    if created:
+        backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def trim_unfollowed_author(sender, instance, **kwargs):
+    trim(instance.user_id, instance.author_id)
+
+
+@receiver(pre_save, sender=Group)
+def check_group_card_fields(sender, instance, update_fields=None, **kwargs):
+    instance._card_changed = fields_changed(
+        instance, CARD_GROUP_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=Group)
+def expire_group_cards(sender, instance, **kwargs):
+    if getattr(instance, '_card_changed', False):
+        expire_post_cards(group=instance)
+    expire_pages()
+
+
+@receiver(pre_delete, sender=Group)
+def expire_deleted_group_cards(sender, instance, **kwargs):
+    # Group у постов обнуляется одним UPDATE без сигналов, поэтому
+    # карточки сбрасываются заранее, пока посты группы ещё видны.
+    expire_post_cards(group=instance)
+
+
+@receiver(pre_save, sender=User)
+def check_author_card_fields(sender, instance, update_fields=None, **kwargs):
+    instance._card_changed = fields_changed(
+        instance, CARD_USER_FIELDS, update_fields)
+
+
+@receiver(post_save, sender=User)
+def expire_author_cards(sender, instance, **kwargs):
+    if getattr(instance, '_card_changed', False):
+        expire_post_cards(author=instance)
+        expire_pages()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Group)
+def expire_feed_pages(sender, **kwargs):
+    expire_pages()
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def expire_author_profile(sender, instance, created=True, **kwargs):
+    if created:
+        expire_profiles(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def expire_follow_profiles(sender, instance, created=True, **kwargs):
+    if created:
+        expire_follow(instance.user_id, instance.author_id)
+        expire_profiles(instance.user_id, instance.author_id)
+        # Анонимам профиль отдаётся из кэша страниц вместе с шапкой.
+        expire_pages()
+
+
+@receiver(pre_save, sender=User)
+def remember_saved_username(sender, instance, update_fields=None, **kwargs):
+    instance._saved_username = None
+    if instance.pk is not None and (
+            update_fields is None or 'username' in update_fields):
+        instance._saved_username = User.objects.filter(
+            pk=instance.pk).values_list('username', flat=True).first()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def expire_user_profile(sender, instance, update_fields=None, **kwargs):
+    # Вход обновляет только last_login — шапка от этого не меняется.
+    if update_fields is not None and not (
+            set(update_fields) & set(CARD_USER_FIELDS)):
+        return
+    cache.delete_many([
+        profile_key(username) for username in
+        {instance.username, getattr(instance, '_saved_username', None)}
+        if username
+    ])
@@ -0,0 +1,67 @@
+import csv
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from ..exporter import export_lines
+from ..models import Comment, Follow, Post, User
+
+TEST_USERNAME = 'test-user'
+TEST_READER_USERNAME = 'test-reader'
+TEST_POST_TEXT = 'Тест текст поста, с запятой'
+TEST_COMMENT_TEXT = 'Тестовый текст комментария'
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        cls.posts = [
+            Post.objects.create(text=TEST_POST_TEXT, author=cls.user)
+            for _ in range(3)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text=TEST_COMMENT_TEXT)
+        Follow.objects.create(user=cls.reader, author=cls.user)
+
+    def test_ndjson_export_resumes_after_id(self):
+        """NDJSON выгружается по возрастанию id с продолжением после id."""
+        rows = [
+            json.loads(line) for line in export_lines(
+                'posts', 'ndjson', after_id=ExportTest.posts[0].pk)
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [post.pk for post in ExportTest.posts[1:]],
+        )
+        self.assertEqual(rows[0]['text'], TEST_POST_TEXT)
+        self.assertEqual(rows[0]['author_id'], ExportTest.user.pk)
+
+    def test_csv_export_has_header(self):
+        """CSV начинается с заголовка и экранирует текст."""
+        rows = list(csv.reader(export_lines('comments', 'csv')))
+        self.assertEqual(
+            rows[0], ['id', 'post_id', 'author_id', 'text', 'created'])
+        self.assertEqual(rows[1][3], TEST_COMMENT_TEXT)
+
+    def test_export_since_filters_by_date(self):
+        """Выгрузка с since пропускает строки, созданные раньше."""
+        since = ExportTest.posts[-1].pub_date
+        rows = list(export_lines('posts', 'ndjson', since=since))
+        self.assertEqual(len(rows), 1)
+        with self.assertRaises(ValueError):
+            export_lines('follows', 'ndjson', since=since)
+
+    def test_export_yatube_command(self):
+        """Команда export_yatube пишет выгрузку в stdout."""
+        output = StringIO()
+        call_command('export_yatube', 'follows', stdout=output)
+        row = json.loads(output.getvalue())
+        self.assertEqual(row['user_id'], ExportTest.reader.pk)
+        with self.assertRaises(CommandError):
+            call_command('export_yatube', 'posts', since='вчера')
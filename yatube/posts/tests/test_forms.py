@@ -1,6 +1,10 @@
+import json
 import shutil
 import tempfile
+from io import StringIO
+from unittest import mock
 
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
@@ -8,6 +12,7 @@ from django.conf import settings
 
 from ..forms import PostForm, CommentForm
 from ..models import Post, User, Comment
+from ..thumbnails import generate_thumbnail
 
 TEST_USERNAME = 'test-user'
 TEST_POST_TEXT = 'Тест текст поста'
@@ -23,7 +28,7 @@ TEST_IMAGE = (
 )
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class PostFormTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -110,6 +115,152 @@ class PostFormTests(TestCase):
             )
         )
 
+    def test_edit_post_saves_post_once(self):
+        """Правка поста сохраняет его один раз: сигналы не дублируются."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT, author=PostFormTests.user)
+        with mock.patch('posts.signals.index_posts') as index_posts:
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={'text': TEST_POST_NEW_TEXT},
+            )
+        index_posts.assert_called_once_with([post.pk])
+
+    def test_stale_post_save_keeps_denormalized_fields(self):
+        """
+        Сохранение поста, загруженного раньше, не затирает счётчик
+        комментариев и готовую миниатюру.
+        """
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=PostFormTests.user,
+            image=SimpleUploadedFile(
+                name='stale.gif',
+                content=TEST_IMAGE,
+                content_type='image/gif',
+            ),
+        )
+        stale = Post.objects.get(pk=post.pk)
+        Comment.objects.create(
+            post=post, author=PostFormTests.user, text=TEST_COMMENT_TEXT)
+        generate_thumbnail(post.pk)
+        stale.text = TEST_POST_NEW_TEXT
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual(post.text, TEST_POST_NEW_TEXT)
+        self.assertEqual(post.comments_count, 1)
+        self.assertTrue(post.thumbnail)
+        self.assertTrue(post.image_variants)
+
+    def test_new_image_resets_thumbnail(self):
+        """Новое изображение сбрасывает миниатюру старого."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=PostFormTests.user,
+            image=SimpleUploadedFile(
+                name='first.gif',
+                content=TEST_IMAGE,
+                content_type='image/gif',
+            ),
+        )
+        generate_thumbnail(post.pk)
+        post.refresh_from_db()
+        with mock.patch('posts.signals.schedule_thumbnail') as schedule:
+            post.image = SimpleUploadedFile(
+                name='second.gif', content=TEST_IMAGE,
+                content_type='image/gif')
+            post.save()
+        schedule.assert_called_once_with(post.pk)
+        post.refresh_from_db()
+        self.assertFalse(post.thumbnail)
+        self.assertFalse(post.image_variants)
+
+    def test_image_upload_schedules_thumbnail(self):
+        """Сохранение формы с изображением ставит миниатюру в очередь."""
+        uploaded = SimpleUploadedFile(
+            name='queued.gif', content=TEST_IMAGE, content_type='image/gif')
+        with mock.patch('posts.signals.schedule_thumbnail') as schedule:
+            self.authorized_client.post(
+                reverse('posts:post_create'),
+                data={'text': TEST_POST_TEXT, 'image': uploaded},
+            )
+        post = Post.objects.get(image='posts/queued.gif')
+        schedule.assert_called_once_with(post.pk)
+
+    def test_generate_thumbnail_fills_post_thumbnail(self):
+        """Фоновая задача сохраняет готовую миниатюру в посте."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=PostFormTests.user,
+            image=SimpleUploadedFile(
+                name='thumb.gif',
+                content=TEST_IMAGE,
+                content_type='image/gif',
+            ),
+        )
+        name = generate_thumbnail(post.pk)
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail.name, name)
+        self.assertTrue(post.thumbnail.storage.exists(name))
+        self.assertIn('image/webp', json.loads(post.image_variants))
+
+    def test_post_card_offers_responsive_variants(self):
+        """Карточка поста отдаёт варианты изображения через <picture>."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=PostFormTests.user,
+            image=SimpleUploadedFile(
+                name='variants.gif',
+                content=TEST_IMAGE,
+                content_type='image/gif',
+            ),
+        )
+        generate_thumbnail(post.pk)
+        post.refresh_from_db()
+        webp = {
+            source['type']: source['srcset'] for source in post.image_sources
+        }['image/webp']
+        self.assertRegex(webp, r'^/media/posts/variants/\S+\.webp 320w$')
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(
+            response, f'<source type="image/webp" srcset="{webp}"')
+
+    def test_post_card_falls_back_to_image_without_thumbnail(self):
+        """Пока миниатюры нет, карточка показывает исходное изображение."""
+        with mock.patch('posts.signals.schedule_thumbnail'):
+            post = Post.objects.create(
+                text=TEST_POST_TEXT,
+                author=PostFormTests.user,
+                image=SimpleUploadedFile(
+                    name='original.gif',
+                    content=TEST_IMAGE,
+                    content_type='image/gif',
+                ),
+            )
+        self.assertFalse(post.thumbnail)
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=(post.pk,)),
+        ):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, f'src="{post.image.url}"')
+
+    def test_generate_thumbnails_command_backfills_posts(self):
+        """Команда generate_thumbnails делает недостающие миниатюры."""
+        post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=PostFormTests.user,
+            image=SimpleUploadedFile(
+                name='old.gif',
+                content=TEST_IMAGE,
+                content_type='image/gif',
+            ),
+        )
+        call_command('generate_thumbnails', workers=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertTrue(post.thumbnail)
+
 
 class CommentFormTests(TestCase):
     @classmethod
@@ -0,0 +1,83 @@
+from array import array
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..graph import (
+    followees,
+    followers,
+    intersection,
+    is_following,
+    pulled_authors,
+)
+from ..models import Follow, Post, TimelineEntry, User
+from ..timeline import timeline_posts
+
+TEST_USERNAME = 'graph-user-{}'
+TEST_POST_TEXT = 'Пост популярного автора'
+USERS_COUNT = 4
+
+
+class FollowGraphTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=TEST_USERNAME.format(number))
+            for number in range(USERS_COUNT)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def follow(self, user, *authors):
+        for author in authors:
+            Follow.objects.create(user=user, author=author)
+
+    def test_arrays_follow_writes(self):
+        """Массивы отсортированы и меняются при подписке и отписке."""
+        reader, *authors = FollowGraphTest.users
+        self.assertEqual(list(followees(reader.pk)), [])
+        self.follow(reader, *reversed(authors))
+        self.assertEqual(
+            list(followees(reader.pk)), sorted(a.pk for a in authors))
+        self.assertEqual(list(followers(authors[0].pk)), [reader.pk])
+        self.assertTrue(is_following(reader.pk, authors[0].pk))
+        Follow.objects.filter(user=reader, author=authors[0]).delete()
+        self.assertFalse(is_following(reader.pk, authors[0].pk))
+        self.assertEqual(list(followers(authors[0].pk)), [])
+
+    def test_cached_arrays_do_not_query_database(self):
+        """Повторное чтение массива не обращается к базе."""
+        reader, author = FollowGraphTest.users[:2]
+        self.follow(reader, author)
+        followees(reader.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(is_following(reader.pk, author.pk))
+
+    def test_intersection(self):
+        """Пересечение совпадает с пересечением множеств."""
+        for left, right in (
+            (range(0, 100, 2), range(0, 100, 3)),
+            (range(5, 8), range(0, 1000)),
+            (range(0), range(10)),
+        ):
+            with self.subTest(left=left, right=right):
+                self.assertEqual(
+                    list(intersection(array('I', left), array('I', right))),
+                    sorted(set(left) & set(right)),
+                )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_pulled_authors_follow_threshold(self):
+        """Автор за порогом рассылки читается лентой напрямую."""
+        author, *readers = FollowGraphTest.users
+        self.assertEqual(list(pulled_authors()), [])
+        self.follow(readers[0], author)
+        self.follow(readers[1], author)
+        self.assertEqual(list(pulled_authors()), [author.pk])
+        post = Post.objects.create(text=TEST_POST_TEXT, author=author)
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        self.assertIn(post, timeline_posts(readers[0]))
+        Follow.objects.filter(user=readers[1], author=author).delete()
+        self.assertEqual(list(pulled_authors()), [])
@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..importer import import_lines
+from ..models import AuthorStats, Follow, Group, Post, User
+from ..search import search_page
+
+TEST_USERNAME = 'test-user'
+TEST_READER_USERNAME = 'test-reader'
+TEST_POST_TEXT = 'Импортированный пост про котов'
+TEST_COMMENT_TEXT = 'Импортированный комментарий'
+TEST_GROUP_TITLE = 'Тест группа'
+TEST_GROUP_SLUG = 'test-slug'
+TEST_GROUP_DESCRIPTION = 'Тест описание группы'
+
+
+def ndjson(*rows):
+    return [json.dumps(row, ensure_ascii=False) for row in rows]
+
+
+class ImportPostsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP_TITLE,
+            slug=TEST_GROUP_SLUG,
+            description=TEST_GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(text=TEST_POST_TEXT, author=cls.user)
+
+    def test_valid_rows_are_imported_in_batches(self):
+        """Строки пишутся пачками, счётчики и ленты обновляются."""
+        Follow.objects.create(
+            user=ImportPostsTest.reader, author=ImportPostsTest.user)
+        report = import_lines(
+            ndjson(
+                *({'text': TEST_POST_TEXT, 'group': TEST_GROUP_SLUG}
+                  for _ in range(5)),
+                {
+                    'type': 'comment',
+                    'post': ImportPostsTest.post.pk,
+                    'text': TEST_COMMENT_TEXT,
+                },
+            ),
+            ImportPostsTest.user,
+            batch_size=2,
+        )
+        self.assertEqual(
+            report, {'posts': 5, 'comments': 1, 'errors': []})
+        stats = AuthorStats.objects.get(user=ImportPostsTest.user)
+        self.assertEqual(stats.posts_count, 6)
+        self.assertEqual(stats.comments_count, 1)
+        self.assertEqual(ImportPostsTest.group.groups.count(), 5)
+        self.assertEqual(ImportPostsTest.reader.timeline.count(), 6)
+        ImportPostsTest.post.refresh_from_db()
+        self.assertEqual(ImportPostsTest.post.comments_count, 1)
+        self.assertEqual(len(search_page('котов', 10)), 6)
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        """Ошибочные строки попадают в отчёт, остальные записываются."""
+        lines = ['не json'] + ndjson(
+            {'text': ''},
+            {'text': TEST_POST_TEXT, 'group': 'no-such-group'},
+            {'type': 'comment', 'post': 0, 'text': TEST_COMMENT_TEXT},
+            {'text': TEST_POST_TEXT, 'author': TEST_READER_USERNAME},
+            {'text': TEST_POST_TEXT},
+        )
+        report = import_lines(lines, ImportPostsTest.user)
+        self.assertEqual(report['posts'], 1)
+        self.assertEqual(
+            [(error['line'], sorted(error['errors']))
+             for error in report['errors']],
+            [
+                (1, ['__all__']),
+                (2, ['text']),
+                (3, ['group']),
+                (4, ['post']),
+                (5, ['author']),
+            ],
+        )
+
+    def test_rows_with_wrong_value_types_are_reported(self):
+        """Списки, объекты и bool вместо строк и номеров — ошибка строки."""
+        lines = ndjson(
+            {'type': 'comment', 'post': [1], 'text': TEST_COMMENT_TEXT},
+            {'type': 'comment', 'post': True, 'text': TEST_COMMENT_TEXT},
+            {'text': TEST_POST_TEXT, 'author': ['a']},
+            {'text': TEST_POST_TEXT, 'group': {'slug': TEST_GROUP_SLUG}},
+            {'type': ['post'], 'text': TEST_POST_TEXT},
+            {'text': [TEST_POST_TEXT]},
+            {'text': TEST_POST_TEXT},
+        )
+        for author in (ImportPostsTest.user, None):
+            with self.subTest(author=author):
+                report = import_lines(lines, author)
+                self.assertEqual(
+                    [(error['line'], sorted(error['errors']))
+                     for error in report['errors']],
+                    [
+                        (1, ['post']),
+                        (2, ['post']),
+                        (3, ['author']),
+                        (4, ['group']),
+                        (5, ['type']),
+                        (6, ['text']),
+                    ] + ([(7, ['author'])] if author is None else []),
+                )
+
+    def test_import_posts_command(self):
+        """Команда import_posts берёт автора из строки файла."""
+        handle, path = tempfile.mkstemp(suffix='.ndjson')
+        self.addCleanup(os.remove, path)
+        with os.fdopen(handle, 'w', encoding='utf-8') as file:
+            file.write('\n'.join(ndjson(
+                {'text': TEST_POST_TEXT, 'author': TEST_READER_USERNAME},
+                {'text': TEST_POST_TEXT, 'author': 'nobody'},
+            )))
+        call_command(
+            'import_posts', path, stdout=StringIO(), stderr=StringIO())
+        self.assertEqual(
+            Post.objects.filter(author=ImportPostsTest.reader).count(), 1)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_import_posts_command_rejects_bad_batch_size(self):
+        """Команда import_posts не принимает размер пачки меньше единицы."""
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_posts', '-', batch_size=0,
+                stdout=StringIO(), stderr=StringIO(),
+            )
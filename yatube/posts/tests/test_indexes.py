@@ -0,0 +1,80 @@
+import re
+
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+TEST_USERNAME = 'test-user'
+TEST_READER_USERNAME = 'test-reader'
+TEST_POST_TEXT = 'Тест текст поста'
+TEST_GROUP_TITLE = 'Тест группа'
+TEST_GROUP_SLUG = 'test-slug'
+TEST_GROUP_DESCRIPTION = 'Тест описание группы'
+TEST_COMMENT_TEXT = 'Тестовый текст комментария'
+FEED_TABLES = (
+    'posts_post',
+    'posts_comment',
+    'posts_follow',
+    'posts_timelineentry',
+)
+FULL_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+class FeedIndexesTest(TestCase):
+    """Запросы лент идут по индексам, а не полным проходом по таблице."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP_TITLE,
+            slug=TEST_GROUP_SLUG,
+            description=TEST_GROUP_DESCRIPTION,
+        )
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        posts = [
+            Post.objects.create(
+                text=TEST_POST_TEXT, author=cls.user, group=cls.group)
+            for _ in range(3)
+        ]
+        Comment.objects.create(
+            post=posts[0], author=cls.reader, text=TEST_COMMENT_TEXT)
+        cls.pages = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': TEST_GROUP_SLUG}),
+            reverse('posts:profile', kwargs={'username': TEST_USERNAME}),
+            reverse('posts:post_detail', kwargs={'post_id': posts[0].pk}),
+            reverse('posts:follow_index'),
+        ]
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(FeedIndexesTest.reader)
+
+    def full_scans(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = [row[-1] for row in cursor.fetchall()]
+        scans = []
+        for step in plan:
+            match = FULL_SCAN.match(step)
+            if match and match.group(1) in FEED_TABLES:
+                scans.append(step)
+        return scans
+
+    def test_feed_queries_use_indexes(self):
+        """Каждый запрос страниц лент использует индекс."""
+        for page in FeedIndexesTest.pages:
+            with self.subTest(page=page):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(page)
+                for query in queries.captured_queries:
+                    sql = query['sql']
+                    if not sql.startswith('SELECT'):
+                        continue
+                    self.assertEqual(self.full_scans(sql), [], sql)
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from unittest import mock
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core import asgi
+
+from ..live import NEW_POSTS, PING, LiveFeed
+from ..models import Follow, Post, User
+
+TEST_USERNAME = 'test-user'
+TEST_OTHER_USERNAME = 'test-other'
+TEST_READER_USERNAME = 'test-reader'
+TEST_POST_TEXT = 'Тест текст поста'
+TEST_NEW_POST_TEXT = 'Новый пост'
+
+
+def read_events(response):
+    """События потока SSE как список (id, данные)."""
+    content = b''.join(response.streaming_content).decode()
+    events = []
+    for block in content.split('\n\n'):
+        fields = dict(
+            line.split(': ', 1) for line in block.splitlines()
+            if not line.startswith(':')
+        )
+        if fields.get('event') == 'post':
+            events.append((int(fields['id']), json.loads(fields['data'])))
+    return events
+
+
+class LiveFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.other = User.objects.create_user(username=TEST_OTHER_USERNAME)
+        cls.reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.post = Post.objects.create(text=TEST_POST_TEXT, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(LiveFeedTest.reader)
+
+    def test_stream_sends_cards_of_new_posts(self):
+        """Поток присылает карточки постов новее курсора."""
+        posts = [
+            Post.objects.create(text=TEST_NEW_POST_TEXT, author=author)
+            for author in (LiveFeedTest.user, LiveFeedTest.other)
+        ]
+        response = self.guest_client.get(
+            reverse('posts:live'), {'after': LiveFeedTest.post.pk})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = read_events(response)
+        self.assertEqual(
+            [event_id for event_id, _ in events],
+            [post.pk for post in posts],
+        )
+        self.assertIn(TEST_NEW_POST_TEXT, events[0][1]['html'])
+
+    def test_wsgi_stream_is_a_single_poll(self):
+        """Под WSGI поток не ждёт событий и просит опросить позже."""
+        response = self.guest_client.get(reverse('posts:live'))
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith(
+            f'retry: {settings.LIVE_FEED_POLL_RETRY}\n\n'))
+
+    @override_settings(LIVE_FEED_ASYNC_SECONDS=0)
+    def test_async_stream_polls_in_handler_pool(self):
+        """Под ASGI база читается в пуле обработчика запроса."""
+        threads = []
+
+        def poll():
+            threads.append(threading.current_thread().name)
+            return PING
+
+        async def read(feed):
+            asgi.executor.set(pool)
+            return [chunk async for chunk in feed]
+
+        live_feed = LiveFeed(Post.objects.all())
+        with ThreadPoolExecutor(thread_name_prefix='handler') as pool, \
+                mock.patch.object(live_feed, 'poll', poll):
+            asyncio.run(read(live_feed))
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith('handler'))
+
+    def test_stream_without_cursor_starts_from_latest_post(self):
+        """Без курсора старые посты не присылаются."""
+        response = self.guest_client.get(reverse('posts:live'))
+        self.assertEqual(read_events(response), [])
+
+    def test_follow_stream_contains_followed_authors_only(self):
+        """Поток подписок присылает только посты избранных авторов."""
+        post = Post.objects.create(
+            text=TEST_NEW_POST_TEXT, author=LiveFeedTest.user)
+        Post.objects.create(
+            text=TEST_NEW_POST_TEXT, author=LiveFeedTest.other)
+        response = self.authorized_client.get(
+            reverse('posts:follow_live'),
+            HTTP_LAST_EVENT_ID=str(LiveFeedTest.post.pk),
+        )
+        self.assertEqual(
+            [event_id for event_id, _ in read_events(response)], [post.pk])
+        response = self.guest_client.get(reverse('posts:follow_live'))
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+
+    def test_post_create_publishes_event(self):
+        """Новый пост будит подписчиков канала после коммита."""
+        version = NEW_POSTS.version
+        with mock.patch(
+            'posts.live.transaction.on_commit',
+            side_effect=lambda callback: callback(),
+        ):
+            client = Client()
+            client.force_login(LiveFeedTest.user)
+            client.post(
+                reverse('posts:post_create'), {'text': TEST_NEW_POST_TEXT})
+        self.assertEqual(NEW_POSTS.version, version + 1)
+
+    def test_index_page_subscribes_to_stream(self):
+        """Первая страница главной подключает живое обновление."""
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(
+            response,
+            f'{reverse("posts:live")}?after={LiveFeedTest.post.pk}',
+        )
@@ -1,8 +1,14 @@
+from io import StringIO
+
+from django.core.management import call_command
 from django.test import TestCase
 
-from ..models import Group, Post, User, Comment
+from ..models import (
+    AuthorStats, Comment, Follow, Group, GroupStats, Post, User
+)
 
 TEST_USERNAME = 'test-user'
+TEST_READER_USERNAME = 'test-reader'
 TEST_POST_TEXT = 'Тест текст поста'
 TEST_GROUP_TITLE = 'Тест группа'
 TEST_GROUP_SLUG = 'test-slug'
@@ -54,3 +60,104 @@ class PostModelTest(TestCase):
                         object._meta.get_field(field).verbose_name,
                         verbose_name
                     )
+
+
+class StatsModelTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP_TITLE,
+            slug=TEST_GROUP_SLUG,
+            description=TEST_GROUP_DESCRIPTION,
+        )
+
+    def get_stats(self, user):
+        return AuthorStats.objects.get(user=user)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются вместе с постами, комментариями и подписками."""
+        post = Post.objects.create(
+            author=StatsModelTest.user,
+            text=TEST_POST_TEXT,
+            group=StatsModelTest.group,
+        )
+        Comment.objects.create(
+            post=post, author=StatsModelTest.reader, text=TEST_COMMENT_TEXT)
+        follow = Follow.objects.create(
+            user=StatsModelTest.reader, author=StatsModelTest.user)
+        author_stats = self.get_stats(StatsModelTest.user)
+        reader_stats = self.get_stats(StatsModelTest.reader)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(reader_stats.comments_count, 1)
+        self.assertEqual(reader_stats.following_count, 1)
+        self.assertEqual(
+            GroupStats.objects.get(group=StatsModelTest.group).posts_count, 1)
+        follow.delete()
+        post.delete()
+        author_stats.refresh_from_db()
+        reader_stats.refresh_from_db()
+        self.assertEqual(author_stats.posts_count, 0)
+        self.assertEqual(author_stats.followers_count, 0)
+        self.assertEqual(reader_stats.comments_count, 0)
+        self.assertEqual(reader_stats.following_count, 0)
+
+    def test_group_change_moves_post_count(self):
+        """Смена группы поста переносит его в счётчике новой группы."""
+        post = Post.objects.create(
+            author=StatsModelTest.user,
+            text=TEST_POST_TEXT,
+            group=StatsModelTest.group,
+        )
+        post.group = None
+        post.save()
+        self.assertEqual(
+            GroupStats.objects.get(group=StatsModelTest.group).posts_count, 0)
+
+    def test_rebuild_counters_repairs_drift(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create(
+            Post(author=StatsModelTest.user, text=TEST_POST_TEXT)
+            for _ in range(3)
+        )
+        AuthorStats.objects.update_or_create(
+            user=StatsModelTest.user, defaults={'posts_count': 1})
+        call_command('rebuild_counters', stdout=StringIO())
+        self.assertEqual(self.get_stats(StatsModelTest.user).posts_count, 3)
+
+    def test_post_comments_count_follows_comments(self):
+        """Post.comments_count меняется вместе с комментариями поста."""
+        post = Post.objects.create(
+            author=StatsModelTest.user, text=TEST_POST_TEXT)
+        comments = [
+            Comment.objects.create(
+                post=post,
+                author=StatsModelTest.reader,
+                text=TEST_COMMENT_TEXT,
+            )
+            for _ in range(2)
+        ]
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+        comments[0].delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+    def test_rebuild_counters_repairs_post_comments(self):
+        """Команда rebuild_counters пересчитывает комментарии постов."""
+        post = Post.objects.create(
+            author=StatsModelTest.user, text=TEST_POST_TEXT)
+        Comment.objects.bulk_create(
+            Comment(
+                post=post,
+                author=StatsModelTest.reader,
+                text=TEST_COMMENT_TEXT,
+            )
+            for _ in range(3)
+        )
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 3)
@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+from ..counters import (
+    repair_author_stats,
+    repair_group_stats,
+    repair_post_comments,
+)
+from ..timeline import rebuild_timelines
+
+USERS_COUNT = 200
+GROUPS_COUNT = 20
+POSTS_COUNT = 3000
+COMMENTS_COUNT = 2000
+FOLLOWS_PER_USER = 15
+REPEATS = 5
+TEST_USERNAME = 'perf-user-{}'
+TEST_POST_TEXT = 'Пост под нагрузкой {}'
+TEST_COMMENT_TEXT = 'Комментарий под нагрузкой {}'
+REPORT_ENV = 'YATUBE_PERF_REPORT'
+# Предельное число SQL-запросов с пустым кэшем и с прогретым и медианное
+# время (секунды) на страницу. Запросы сессии и пользователя
+# авторизованного клиента учтены.
+BUDGETS = {
+    'posts:index': (3, 3, 0.5),
+    'posts:group_list': (4, 4, 0.5),
+    'posts:profile': (6, 3, 0.5),
+    'posts:post_detail': (4, 4, 0.5),
+    'posts:follow_index': (5, 3, 0.5),
+}
+
+
+class QueryBudgetTest(TestCase):
+    """
+    Бюджет SQL-запросов и времени ответа страниц на реалистичном объёме
+    данных. Если задана переменная окружения YATUBE_PERF_REPORT,
+    результаты пишутся в этот файл в формате JSON.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        rnd = random.Random(0)
+        User.objects.bulk_create(
+            User(username=TEST_USERNAME.format(number))
+            for number in range(USERS_COUNT)
+        )
+        users = list(User.objects.all())
+        Group.objects.bulk_create(
+            Group(title=f'Группа {number}', slug=f'group-{number}')
+            for number in range(GROUPS_COUNT)
+        )
+        groups = list(Group.objects.all())
+        Post.objects.bulk_create(
+            (
+                Post(
+                    text=TEST_POST_TEXT.format(number),
+                    author=rnd.choice(users),
+                    group=rnd.choice(groups + [None]),
+                )
+                for number in range(POSTS_COUNT)
+            ),
+            batch_size=500,
+        )
+        posts = list(Post.objects.values_list('pk', flat=True))
+        Comment.objects.bulk_create(
+            (
+                Comment(
+                    post_id=rnd.choice(posts),
+                    author=rnd.choice(users),
+                    text=TEST_COMMENT_TEXT.format(number),
+                )
+                for number in range(COMMENTS_COUNT)
+            ),
+            batch_size=500,
+        )
+        Follow.objects.bulk_create(
+            (
+                Follow(user=user, author=author)
+                for user in users
+                for author in rnd.sample(users, FOLLOWS_PER_USER)
+                if author != user
+            ),
+            batch_size=500,
+        )
+        # bulk_create не шлёт сигналов: счётчики и ленты собираются так,
+        # как это сделали бы rebuild_counters и rebuild_timelines.
+        rebuild_timelines()
+        repair_author_stats()
+        repair_group_stats()
+        repair_post_comments()
+        cls.user = users[0]
+        cls.group = groups[0]
+        cls.post = Post.objects.filter(comments__isnull=False).first()
+        cls.pages = {
+            'posts:index': reverse('posts:index'),
+            'posts:group_list': reverse(
+                'posts:group_list', kwargs={'slug': cls.group.slug}),
+            'posts:profile': reverse(
+                'posts:profile', kwargs={'username': cls.user.username}),
+            'posts:post_detail': reverse(
+                'posts:post_detail', kwargs={'post_id': cls.post.pk}),
+            'posts:follow_index': reverse('posts:follow_index'),
+        }
+        cls.results = {}
+
+    @classmethod
+    def tearDownClass(cls):
+        report_path = os.environ.get(REPORT_ENV)
+        if report_path:
+            with open(report_path, 'w', encoding='utf-8') as report:
+                json.dump(cls.results, report, ensure_ascii=False, indent=2)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(QueryBudgetTest.user)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = self.authorized_client.get(url)
+        return response, len(queries), time.perf_counter() - started
+
+    def measure(self, url):
+        """
+        Первый запрос — с пустыми кэшами, остальные REPEATS — с
+        прогретыми. Возвращает ответ, число запросов к базе в первом и
+        последнем запросе и медианное время прогретых.
+        """
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        _, cold_queries, _ = self.get(url)
+        timings = []
+        for _ in range(REPEATS):
+            response, warm_queries, seconds = self.get(url)
+            timings.append(seconds)
+        return response, cold_queries, warm_queries, statistics.median(
+            timings)
+
+    def test_pages_fit_budget(self):
+        """Страницы укладываются в бюджет запросов и времени."""
+        for view_name, url in QueryBudgetTest.pages.items():
+            with self.subTest(view_name=view_name):
+                max_cold, max_warm, max_seconds = BUDGETS[view_name]
+                response, cold, warm, seconds = self.measure(url)
+                QueryBudgetTest.results[view_name] = {
+                    'url': url,
+                    'status': response.status_code,
+                    'cold_queries': cold,
+                    'max_cold_queries': max_cold,
+                    'queries': warm,
+                    'max_queries': max_warm,
+                    'median_ms': round(seconds * 1000, 2),
+                    'max_ms': max_seconds * 1000,
+                }
+                self.assertEqual(response.status_code, 200)
+                self.assertLessEqual(cold, max_cold)
+                self.assertLessEqual(warm, max_warm)
+                self.assertLessEqual(seconds, max_seconds)
@@ -0,0 +1,124 @@
+from importlib import import_module
+from io import StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.apps import apps
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post, User
+
+TEST_USERNAME = 'test-user'
+TEST_CAT_TEXT = 'Коты гуляют сами по себе'
+TEST_DOG_TEXT = 'Собака лает, караван идёт'
+TEST_COMMENT_TEXT = 'А у меня живёт кот'
+SEARCH_MIGRATION = 'posts.migrations.0013_posts_search'
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.cat_post = Post.objects.create(
+            text=TEST_CAT_TEXT, author=cls.user)
+        cls.dog_post = Post.objects.create(
+            text=TEST_DOG_TEXT, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query, **params):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query, **params})
+        return response, list(response.context['page_obj'])
+
+    def test_search_uses_russian_stems(self):
+        """Поиск находит пост по другой форме слова."""
+        response, posts = self.search('котов')
+        self.assertTemplateUsed(response, 'posts/search.html')
+        self.assertEqual(posts, [SearchViewTest.cat_post])
+
+    def test_search_finds_posts_by_comments(self):
+        """Пост находится по тексту комментария к нему."""
+        Comment.objects.create(
+            post=SearchViewTest.dog_post,
+            author=SearchViewTest.user,
+            text=TEST_COMMENT_TEXT,
+        )
+        _, posts = self.search('кот')
+        self.assertEqual(
+            posts, [SearchViewTest.cat_post, SearchViewTest.dog_post])
+
+    def test_new_comment_does_not_reindex_post(self):
+        """
+        Новый комментарий дописывается к строке индекса, остальные
+        комментарии поста не перечитываются; удаление убирает его.
+        """
+        with mock.patch('posts.signals.index_posts') as index_posts:
+            comment = Comment.objects.create(
+                post=SearchViewTest.dog_post,
+                author=SearchViewTest.user,
+                text=TEST_COMMENT_TEXT,
+            )
+        index_posts.assert_not_called()
+        _, posts = self.search('живет')
+        self.assertEqual(posts, [SearchViewTest.dog_post])
+        comment.delete()
+        _, posts = self.search('живет')
+        self.assertEqual(posts, [])
+
+    def test_index_follows_post_changes(self):
+        """Правка и удаление поста сразу видны в поиске."""
+        post = Post.objects.create(
+            text=TEST_DOG_TEXT, author=SearchViewTest.user)
+        post.text = TEST_CAT_TEXT
+        post.save()
+        _, posts = self.search('собака')
+        self.assertEqual(posts, [SearchViewTest.dog_post])
+        post.delete()
+        _, posts = self.search('кот гуляет')
+        self.assertEqual(posts, [SearchViewTest.cat_post])
+
+    def test_empty_query_returns_nothing(self):
+        """Пустой запрос не возвращает постов."""
+        _, posts = self.search('  ')
+        self.assertEqual(posts, [])
+
+    @override_settings(SORT_POSTS=2)
+    def test_search_pages_by_cursor(self):
+        """Результаты листаются курсорами вперёд и назад без повторов."""
+        Post.objects.bulk_create(
+            Post(text=TEST_CAT_TEXT, author=SearchViewTest.user)
+            for _ in range(3)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        response, first = self.search('кот')
+        cursor = response.context['page_obj'].next_cursor
+        response, second = self.search('кот', after=cursor)
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.number, 2)
+        self.assertIsNone(page_obj.next_cursor)
+        self.assertEqual(len({post.pk for post in first + second}), 4)
+        _, back = self.search('кот', before=page_obj.previous_cursor)
+        self.assertEqual(back, first)
+
+    def test_migration_indexes_existing_posts(self):
+        """Миграция с таблицей индекса сразу индексирует старые посты."""
+        Comment.objects.create(
+            post=SearchViewTest.dog_post,
+            author=SearchViewTest.user,
+            text=TEST_COMMENT_TEXT,
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('DELETE FROM posts_search')
+        # Внутри транзакции теста schema_editor() для SQLite недоступен,
+        # а миграции от него нужно только соединение.
+        import_module(SEARCH_MIGRATION).fill_search_table(
+            apps, SimpleNamespace(connection=connection))
+        _, posts = self.search('кот')
+        self.assertEqual(
+            posts, [SearchViewTest.cat_post, SearchViewTest.dog_post])
@@ -0,0 +1,91 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import LiveServerTestCase, TestCase
+
+from ..counters import (
+    repair_author_stats,
+    repair_group_stats,
+    repair_post_comments,
+)
+from ..loadtest import ROUTES
+from ..models import Comment, Follow, Group, Post, TimelineEntry, User
+from ..search import search_page
+from ..seeding import WORDS, Seeder
+from ..timeline import rebuild_timelines
+
+USERS_COUNT = 30
+GROUPS_COUNT = 3
+FOLLOWS_COUNT = 100
+POSTS_COUNT = 120
+COMMENTS_COUNT = 200
+
+
+def seed():
+    Seeder(seed=0, batch_size=50).run(
+        users=USERS_COUNT,
+        groups=GROUPS_COUNT,
+        follows=FOLLOWS_COUNT,
+        posts=POSTS_COUNT,
+        comments=COMMENTS_COUNT,
+    )
+
+
+class SeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        seed()
+
+    def test_rows_are_created(self):
+        """Создаётся заданное число строк, подписки без повторов."""
+        self.assertEqual(User.objects.count(), USERS_COUNT)
+        self.assertEqual(Group.objects.count(), GROUPS_COUNT)
+        self.assertEqual(Post.objects.count(), POSTS_COUNT)
+        self.assertEqual(Comment.objects.count(), COMMENTS_COUNT)
+        self.assertGreater(Follow.objects.count(), 0)
+        self.assertLessEqual(Follow.objects.count(), FOLLOWS_COUNT)
+
+    def test_popularity_is_skewed(self):
+        """Самый популярный автор собирает заметную долю подписок."""
+        top = User.objects.order_by('-stats__followers_count').first()
+        self.assertGreater(
+            top.stats.followers_count * USERS_COUNT, Follow.objects.count())
+
+    def test_dates_follow_ids(self):
+        """Даты постов растут вместе с id и лежат в прошлом."""
+        dates = list(Post.objects.order_by('pk').values_list(
+            'pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        self.assertNotEqual(dates[0], dates[-1])
+
+    def test_derived_tables_are_consistent(self):
+        """Счётчики, ленты и индекс совпадают с пересборкой."""
+        self.assertEqual(repair_author_stats(dry_run=True), 0)
+        self.assertEqual(repair_group_stats(dry_run=True), 0)
+        self.assertEqual(repair_post_comments(dry_run=True), 0)
+        entries = set(TimelineEntry.objects.values_list('user', 'post'))
+        rebuild_timelines()
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list('user', 'post')), entries)
+        self.assertTrue(any(len(search_page(word, 1)) for word in WORDS))
+
+
+class LoadTest(LiveServerTestCase):
+    def test_load_command_reports_every_route(self):
+        """Нагрузочный тест отчитывается по всем маршрутам без ошибок."""
+        seed()
+        stdout = StringIO()
+        call_command(
+            'load_yatube',
+            url=self.live_server_url,
+            seconds=1,
+            clients=2,
+            seed=0,
+            stdout=stdout,
+        )
+        output = stdout.getvalue()
+        for name in ROUTES:
+            with self.subTest(route=name):
+                self.assertIn(f'{name}:', output)
+        self.assertRegex(output, r'всего: [\d.]+ запросов/с, p50 .*ошибок 0')
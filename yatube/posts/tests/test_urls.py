@@ -31,7 +31,8 @@ class PostURLTests(TestCase):
             reverse('posts:group_list', kwargs={'slug': TEST_GROUP_SLUG}),
             reverse('posts:profile', kwargs={'username': TEST_USERNAME}),
             reverse('posts:post_detail', kwargs={
-                'post_id': PostURLTests.post.id})
+                'post_id': PostURLTests.post.id}),
+            reverse('posts:search'),
         ]
         cls.pages_templates = {
             reverse('posts:index'): 'posts/index.html',
@@ -46,6 +47,7 @@ class PostURLTests(TestCase):
                 'posts:post_edit', kwargs={'post_id': PostURLTests.post.id}):
                 'posts/create_post.html',
             reverse('posts:post_create'): 'posts/create_post.html',
+            reverse('posts:search'): 'posts/search.html',
         }
 
     def setUp(self):
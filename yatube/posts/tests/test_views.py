@@ -1,13 +1,21 @@
 import tempfile
 import shutil
+from importlib import import_module
 
 from django.test import Client, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django import forms
+from django.apps import apps
 from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.utils import dateformat
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post, User, Comment, Follow
+from ..models import Group, Post, User, Comment, Follow, TimelineEntry
+from ..timeline import rebuild_timelines
 
 TEST_USERNAME = 'test-user'
 TEST_POST_TEXT = 'Тест текст поста'
@@ -21,11 +29,17 @@ TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 TEST_COMMENT_TEXT = 'Тестовый текст комментария'
 TEST_FOLLOWER_USERNAME = 'test-follower-user'
 TEST_FOLLOWING_USERNAME = 'test-following-user'
+TEST_READER_USERNAME = 'test-reader-user'
+TIMELINE_MIGRATION = 'posts.migrations.0007_timelineentry'
 TEST_FOLLOWER_POST_TEXT = 'Тестовый текст поста Подписчика'
 TEST_FOLLOWING_POST_TEXT = 'Тестовый текст поста Автора'
+TEST_NEW_POST_TEXT = 'Новый пост Автора'
+TEST_EDITED_POST_TEXT = 'Исправленный текст поста'
+TEST_AUTHOR_FIRST_NAME = 'Лев'
+TEST_RENAMED_USERNAME = 'renamed-user'
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class PostViewsTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -183,12 +197,22 @@ class PostViewsTests(TestCase):
             response.context['post'].image, PostViewsTests.post.image)
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class PostViewsCacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username=TEST_USERNAME)
+        cls.group = Group.objects.create(
+            title=TEST_GROUP_TITLE,
+            slug=TEST_GROUP_SLUG,
+            description=TEST_GROUP_DESCRIPTION,
+        )
+        cls.post = Post.objects.create(
+            text=TEST_POST_TEXT,
+            author=cls.user,
+            group=cls.group,
+        )
 
     @classmethod
     def tearDownClass(cls):
@@ -199,6 +223,58 @@ class PostViewsCacheTest(TestCase):
         self.authorized_client = Client()
         self.authorized_client.force_login(PostViewsCacheTest.user)
 
+    def get_index(self):
+        return self.authorized_client.get(
+            reverse('posts:index')).content.decode()
+
+    def test_post_card_is_cached(self):
+        """Карточка поста попадает в кэш фрагментов."""
+        self.get_index()
+        post = Post.objects.get(pk=PostViewsCacheTest.post.pk)
+        key = make_template_fragment_key('post_card', [
+            post.pk, dateformat.format(post.updated, 'U.u'), '0', '0'])
+        self.assertIn(TEST_POST_TEXT, caches['template_fragments'].get(key))
+
+    def test_post_edit_refreshes_card(self):
+        """После правки поста карточка показывает новый текст."""
+        self.get_index()
+        self.authorized_client.post(
+            reverse(
+                'posts:post_edit',
+                kwargs={'post_id': PostViewsCacheTest.post.pk}
+            ),
+            {'text': TEST_EDITED_POST_TEXT},
+        )
+        self.assertIn(TEST_EDITED_POST_TEXT, self.get_index())
+
+    def test_author_name_change_refreshes_card(self):
+        """После смены имени автора карточка показывает новое имя."""
+        self.get_index()
+        user = User.objects.get(pk=PostViewsCacheTest.user.pk)
+        user.first_name = TEST_AUTHOR_FIRST_NAME
+        user.save()
+        self.assertIn(TEST_AUTHOR_FIRST_NAME, self.get_index())
+
+    def test_group_rename_refreshes_card(self):
+        """После смены slug группы карточка ведёт на новый адрес."""
+        self.get_index()
+        group = Group.objects.get(pk=PostViewsCacheTest.group.pk)
+        group.slug = TEST_SECOND_GROUP_SLUG
+        group.save()
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': TEST_SECOND_GROUP_SLUG})
+        self.assertIn(group_url, self.get_index())
+
+    def test_group_delete_refreshes_card(self):
+        """После удаления группы карточка не ведёт на её страницу."""
+        self.get_index()
+        Group.objects.get(pk=PostViewsCacheTest.group.pk).delete()
+        group_url = reverse(
+            'posts:group_list', kwargs={'slug': TEST_GROUP_SLUG})
+        content = self.get_index()
+        self.assertIn(TEST_POST_TEXT, content)
+        self.assertNotIn(group_url, content)
+
 
 class PaginatorViewsTest(TestCase):
     @classmethod
@@ -244,8 +320,60 @@ class PaginatorViewsTest(TestCase):
                     len(response.context['page_obj']),
                     PaginatorViewsTest.second_page_posts_count)
 
+    def test_next_cursor_page_contains_three_records(self):
+        """По курсору after открывается вторая страница без повторов."""
+        for page in PaginatorViewsTest.paginator_pages:
+            with self.subTest(page=page):
+                first_page = self.authorized_client.get(
+                    page).context['page_obj']
+                response = self.authorized_client.get(
+                    page, {'after': first_page.next_cursor})
+                second_page = response.context['page_obj']
+                self.assertEqual(
+                    len(second_page),
+                    PaginatorViewsTest.second_page_posts_count)
+                self.assertEqual(second_page.number, 2)
+                self.assertIsNone(second_page.next_cursor)
+                self.assertFalse(
+                    set(first_page.object_list) & set(second_page.object_list))
+
+    def test_previous_cursor_returns_first_page(self):
+        """По курсору before со второй страницы открывается первая."""
+        page = reverse('posts:index')
+        first_page = self.authorized_client.get(page).context['page_obj']
+        second_page = self.authorized_client.get(
+            page, {'after': first_page.next_cursor}).context['page_obj']
+        response = self.authorized_client.get(
+            page, {'before': second_page.previous_cursor})
+        self.assertEqual(
+            list(response.context['page_obj'].object_list),
+            list(first_page.object_list))
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+    def test_invalid_cursor_returns_first_page(self):
+        """Испорченный курсор ведёт на первую страницу."""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'after': 'не-курсор'})
+        self.assertEqual(
+            len(response.context['page_obj']),
+            PaginatorViewsTest.first_page_posts_count)
+
+    def test_cursor_pages_do_not_count_posts(self):
+        """Страницы ленты строятся без COUNT(*) по таблице постов."""
+        page = reverse('posts:index')
+        first_page = self.authorized_client.get(page).context['page_obj']
+        for params in ({}, {'after': first_page.next_cursor}, {'page': 2}):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    self.authorized_client.get(page, params)
+                self.assertFalse([
+                    query for query in queries.captured_queries
+                    if 'COUNT(' in query['sql']
+                ])
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, POST_THUMBNAIL_WORKERS=0)
 class FollowViewsTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -269,6 +397,8 @@ class FollowViewsTest(TestCase):
         shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
 
     def setUp(self):
+        # Граф подписок в кэше переживает откат транзакции теста.
+        cache.clear()
         self.authorized_follower = Client()
         self.authorized_follower.force_login(FollowViewsTest.follower)
         self.authorized_following = Client()
@@ -357,3 +487,233 @@ class FollowViewsTest(TestCase):
             reverse('posts:follow_index'))
         self.assertEqual(
             response_following.context['page_obj'].paginator.count, 0)
+
+    def test_unfollow_removes_posts_from_timeline(self):
+        """После отписки посты автора пропадают из ленты подписок."""
+        follow = Follow.objects.create(
+            user=FollowViewsTest.follower, author=FollowViewsTest.following)
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=FollowViewsTest.follower,
+            post=FollowViewsTest.following_post,
+        ).exists())
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=FollowViewsTest.follower).exists())
+
+    def test_new_post_is_fanned_out_to_followers(self):
+        """Новый пост автора сразу попадает в ленты его подписчиков."""
+        Follow.objects.create(
+            user=FollowViewsTest.follower, author=FollowViewsTest.following)
+        self.authorized_following.post(
+            reverse('posts:post_create'), {'text': TEST_NEW_POST_TEXT})
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=FollowViewsTest.follower,
+            post__text=TEST_NEW_POST_TEXT,
+        ).exists())
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=0)
+    def test_popular_author_posts_are_pulled(self):
+        """Посты популярного автора читаются напрямую, без рассылки."""
+        Follow.objects.create(
+            user=FollowViewsTest.follower, author=FollowViewsTest.following)
+        self.authorized_following.post(
+            reverse('posts:post_create'), {'text': TEST_NEW_POST_TEXT})
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=FollowViewsTest.follower).exists())
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            [TEST_NEW_POST_TEXT, TEST_FOLLOWING_POST_TEXT],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_migration_fills_timelines_of_existing_follows(self):
+        """
+        Миграция с таблицей лент раскладывает посты по уже существующим
+        подпискам, кроме авторов за лимитом рассылки.
+        """
+        reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        for user, author in (
+            (FollowViewsTest.follower, FollowViewsTest.following),
+            (reader, FollowViewsTest.follower),
+            (FollowViewsTest.following, FollowViewsTest.follower),
+        ):
+            Follow.objects.create(user=user, author=author)
+        TimelineEntry.objects.all().delete()
+        import_module(TIMELINE_MIGRATION).fill_timelines(apps, None)
+        self.assertEqual(
+            list(TimelineEntry.objects.values_list('user', 'post')),
+            [(FollowViewsTest.follower.pk, FollowViewsTest.following_post.pk)],
+        )
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_author_back_under_fanout_limit_is_refilled_by_rebuild(self):
+        """
+        Отписка не пишет в ленты других подписчиков; посты, написанные
+        автором за лимитом рассылки, возвращает rebuild_timelines.
+        """
+        reader = User.objects.create_user(username=TEST_READER_USERNAME)
+        Follow.objects.create(
+            user=FollowViewsTest.follower, author=FollowViewsTest.following)
+        follow = Follow.objects.create(
+            user=reader, author=FollowViewsTest.following)
+        self.authorized_following.post(
+            reverse('posts:post_create'), {'text': TEST_NEW_POST_TEXT})
+        follow.delete()
+        new_post_entries = TimelineEntry.objects.filter(
+            user=FollowViewsTest.follower, post__text=TEST_NEW_POST_TEXT)
+        self.assertFalse(new_post_entries.exists())
+        rebuild_timelines()
+        self.assertTrue(new_post_entries.exists())
+        response = self.authorized_follower.get(reverse('posts:follow_index'))
+        self.assertEqual(
+            [post.text for post in response.context['page_obj']],
+            [TEST_NEW_POST_TEXT, TEST_FOLLOWING_POST_TEXT],
+        )
+
+    def test_follow_index_queries_do_not_depend_on_page_size(self):
+        """
+        Число запросов ленты подписок не растёт с числом постов на
+        странице: счётчик комментариев берётся из самого поста.
+        """
+        Follow.objects.create(
+            user=FollowViewsTest.follower, author=FollowViewsTest.following)
+        for _ in range(5):
+            post = Post.objects.create(
+                text=TEST_NEW_POST_TEXT, author=FollowViewsTest.following)
+            Comment.objects.create(
+                post=post,
+                author=FollowViewsTest.follower,
+                text=TEST_COMMENT_TEXT,
+            )
+        # Первый запрос кладёт в кэш граф подписок читателя.
+        self.authorized_follower.get(reverse('posts:follow_index'))
+        queries = []
+        for page_size in (1, 6):
+            with self.subTest(page_size=page_size):
+                with override_settings(SORT_POSTS=page_size):
+                    with CaptureQueriesContext(connection) as captured:
+                        response = self.authorized_follower.get(
+                            reverse('posts:follow_index'))
+                self.assertEqual(
+                    len(response.context['page_obj']), page_size)
+                self.assertContains(response, 'Комментарии: 1')
+                queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username=TEST_USERNAME)
+        Post.objects.create(text=TEST_POST_TEXT, author=cls.user)
+
+    def setUp(self):
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(PageCacheTest.user)
+
+    def test_anonymous_index_is_cached(self):
+        """Повторный анонимный запрос главной отдаётся из кэша."""
+        first = self.guest_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            second = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(first.content, second.content)
+
+    def test_new_post_expires_cached_pages(self):
+        """Новый пост сразу виден анонимам: поколение кэша сменилось."""
+        self.guest_client.get(reverse('posts:index'))
+        Post.objects.create(text=TEST_NEW_POST_TEXT, author=PageCacheTest.user)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, TEST_NEW_POST_TEXT)
+
+    def test_authorized_pages_are_not_cached(self):
+        """Страницы для авторизованных пользователей не кэшируются."""
+        self.authorized_client.get(reverse('posts:index'))
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+
+    @override_settings(PAGE_CACHE_TIMEOUTS={})
+    def test_routes_without_timeout_are_not_cached(self):
+        """Маршрут без записи в PAGE_CACHE_TIMEOUTS не кэшируется."""
+        self.guest_client.get(reverse('posts:index'))
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertIsNotNone(response.context)
+
+
+class ProfileCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.follower = User.objects.create_user(
+            username=TEST_FOLLOWER_USERNAME)
+        cls.author = User.objects.create_user(
+            username=TEST_FOLLOWING_USERNAME)
+        Post.objects.create(text=TEST_POST_TEXT, author=cls.author)
+        cls.url = reverse(
+            'posts:profile', kwargs={'username': TEST_FOLLOWING_USERNAME})
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ProfileCacheTest.follower)
+
+    def test_cached_header_does_not_query_database(self):
+        """Повторный показ шапки профиля не читает автора и подписки."""
+        self.authorized_client.get(ProfileCacheTest.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_client.get(ProfileCacheTest.url)
+        tables = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('posts_follow', tables)
+        self.assertNotIn('posts_authorstats', tables)
+        self.assertEqual(response.context['count'], 1)
+        self.assertEqual(
+            response.context['page_obj'][0].author.username,
+            TEST_FOLLOWING_USERNAME,
+        )
+
+    def test_follow_expires_cached_header(self):
+        """Подписка и отписка сразу видны в шапке профиля."""
+        self.authorized_client.get(ProfileCacheTest.url)
+        for action, following, followers in (
+            ('posts:profile_follow', True, 1),
+            ('posts:profile_unfollow', False, 0),
+        ):
+            with self.subTest(action=action):
+                self.authorized_client.get(reverse(
+                    action, kwargs={'username': TEST_FOLLOWING_USERNAME}))
+                response = self.authorized_client.get(ProfileCacheTest.url)
+                self.assertEqual(response.context['following'], following)
+                self.assertEqual(
+                    response.context['author_stats'].followers_count,
+                    followers,
+                )
+
+    def test_follow_expires_cached_anonymous_profile(self):
+        """Гость сразу видит новое число подписчиков в шапке профиля."""
+        guest_client = Client()
+        guest_client.get(ProfileCacheTest.url)
+        Follow.objects.create(
+            user=ProfileCacheTest.follower, author=ProfileCacheTest.author)
+        response = guest_client.get(ProfileCacheTest.url)
+        self.assertContains(response, 'Подписчиков: 1,')
+
+    def test_new_post_expires_cached_header(self):
+        """Новый пост меняет счётчик в шапке профиля."""
+        self.authorized_client.get(ProfileCacheTest.url)
+        Post.objects.create(
+            text=TEST_NEW_POST_TEXT, author=ProfileCacheTest.author)
+        response = self.authorized_client.get(ProfileCacheTest.url)
+        self.assertEqual(response.context['count'], 2)
+        self.assertEqual(
+            response.context['page_obj'][0].text, TEST_NEW_POST_TEXT)
+
+    def test_rename_expires_old_username(self):
+        """После смены имени старый адрес профиля отдаёт 404."""
+        self.authorized_client.get(ProfileCacheTest.url)
+        author = User.objects.get(pk=ProfileCacheTest.author.pk)
+        author.username = TEST_RENAMED_USERNAME
+        author.save()
+        response = self.authorized_client.get(ProfileCacheTest.url)
+        self.assertEqual(response.status_code, 404)
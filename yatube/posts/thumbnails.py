@@ -0,0 +1,158 @@
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+from sorl.thumbnail import get_thumbnail
+
+from .cache import expire_pages
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'posts/variants'
+VARIANT_TYPES = {
+    'AVIF': ('image/avif', 'avif'),
+    'WEBP': ('image/webp', 'webp'),
+    'JPEG': ('image/jpeg', 'jpg'),
+}
+
+_executor = None
+_executor_pid = None
+
+
+def get_executor():
+    """Пул потоков процесса; после fork воркера создаётся заново."""
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.POST_THUMBNAIL_WORKERS,
+            thread_name_prefix='thumbnails',
+        )
+        _executor_pid = os.getpid()
+    return _executor
+
+
+def wait_for_thumbnails():
+    """
+    Дожидается задач пула процесса (тестам — перед очисткой базы и
+    MEDIA_ROOT). Следующая задача создаст пул заново.
+    """
+    global _executor
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=True)
+    _executor = None
+
+
+def variant_formats():
+    """Форматы из POST_IMAGE_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [
+        image_format for image_format in settings.POST_IMAGE_FORMATS
+        if image_format in Image.SAVE and image_format in VARIANT_TYPES
+    ]
+
+
+def make_variants(image):
+    """
+    Режет изображение с пропорциями POST_THUMBNAIL_GEOMETRY по ширинам
+    POST_IMAGE_WIDTHS (не больше исходной) в каждом из форматов.
+    Возвращает {MIME-тип: [[ширина, файл], ...]} для Post.image_variants.
+    """
+    width, height = map(int, settings.POST_THUMBNAIL_GEOMETRY.split('x'))
+    with image.open('rb'):
+        source = Image.open(image)
+        source.load()
+    if source.mode not in ('RGB', 'RGBA'):
+        source = source.convert(
+            'RGBA' if 'transparency' in source.info else 'RGB')
+    widths = sorted(settings.POST_IMAGE_WIDTHS)
+    widths = [size for size in widths if size <= source.width] or widths[:1]
+    stem = os.path.splitext(os.path.basename(image.name))[0]
+    digest = hashlib.md5(image.name.encode()).hexdigest()[:8]
+    variants = {}
+    for image_format in variant_formats():
+        mime_type, extension = VARIANT_TYPES[image_format]
+        picture = source
+        if image_format == 'JPEG' and picture.mode == 'RGBA':
+            picture = picture.convert('RGB')
+        variants[mime_type] = []
+        for size in widths:
+            resized = ImageOps.fit(
+                picture, (size, round(size * height / width)), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                image_format,
+                quality=settings.POST_IMAGE_QUALITY.get(image_format, 75),
+            )
+            name = image.storage.save(
+                f'{VARIANTS_DIR}/{stem}-{digest}-{size}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+            variants[mime_type].append([size, name])
+    return variants
+
+
+def generate_thumbnail(post_id):
+    """
+    Готовит миниатюру изображения поста через sorl-thumbnail и варианты
+    для <picture>, сохраняет их в Post.thumbnail и Post.image_variants.
+    Возвращает имя файла миниатюры или None.
+    """
+    post = Post.objects.filter(pk=post_id).only('pk', 'image').first()
+    if post is None or not post.image:
+        return None
+    if not post.image.storage.exists(post.image.name):
+        logger.warning('Нет файла %s для поста %s', post.image.name, post_id)
+        return None
+    thumbnail = get_thumbnail(
+        post.image,
+        settings.POST_THUMBNAIL_GEOMETRY,
+        **settings.POST_THUMBNAIL_OPTIONS
+    )
+    variants = make_variants(post.image)
+    # Если изображение успели заменить, миниатюры старого не сохраняем.
+    updated = Post.objects.filter(pk=post_id, image=post.image.name).update(
+        thumbnail=thumbnail.name,
+        image_variants=json.dumps(variants),
+        updated=timezone.now(),
+    )
+    if updated:
+        expire_pages()
+    return thumbnail.name
+
+
+def safe_generate_thumbnail(post_id):
+    try:
+        generate_thumbnail(post_id)
+    except Exception:
+        logger.exception('Не удалось сделать миниатюру поста %s', post_id)
+
+
+def run_task(post_id):
+    """Задача пула: поток закрывает свои соединения с БД по завершении."""
+    try:
+        safe_generate_thumbnail(post_id)
+    finally:
+        connections.close_all()
+
+
+def schedule_thumbnail(post_id):
+    """
+    После коммита транзакции отправляет генерацию миниатюры в пул
+    потоков. При POST_THUMBNAIL_WORKERS = 0 миниатюра делается сразу.
+    """
+    def submit():
+        if settings.POST_THUMBNAIL_WORKERS:
+            get_executor().submit(run_task, post_id)
+        else:
+            safe_generate_thumbnail(post_id)
+    transaction.on_commit(submit)
@@ -0,0 +1,84 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .graph import followees, intersection, pulled_authors
+from .models import AuthorStats, Follow, Post, TimelineEntry
+
+
+def is_pulled(author_id):
+    """У авторов с огромным числом подписчиков ленту не рассылаем."""
+    return AuthorStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=settings.TIMELINE_FANOUT_LIMIT,
+    ).exists()
+
+
+def add_entries(user_ids, post_ids):
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=post_id)
+            for user_id in user_ids
+            for post_id in post_ids
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def fan_out_posts(author_id, post_ids):
+    """Раскладывает новые посты автора по лентам всех его подписчиков."""
+    if author_id is None or is_pulled(author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=author_id).values_list('user_id', flat=True)
+    add_entries(list(followers), post_ids)
+
+
+def fan_out_post(post):
+    fan_out_posts(post.author_id, [post.pk])
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту нового подписчика последние посты автора."""
+    if is_pulled(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', flat=True)[:settings.TIMELINE_BACKFILL]
+    add_entries([user_id], list(posts))
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id).delete()
+
+
+def timeline_posts(user):
+    """
+    Лента подписок: посты из материализованной ленты читателя плюс
+    посты авторов, которые читаются напрямую (см. is_pulled). Без
+    подписок лента пуста без запроса.
+    """
+    authors = followees(user.pk)
+    if not authors:
+        return Post.objects.none()
+    inbox = TimelineEntry.objects.filter(user=user).values('post_id')
+    pulled = intersection(authors, pulled_authors())
+    if not pulled:
+        return Post.objects.filter(pk__in=inbox)
+    return Post.objects.filter(Q(pk__in=inbox) | Q(author__in=list(pulled)))
+
+
+def rebuild_timelines():
+    """
+    Заново собирает все ленты по текущим подпискам. Так же в ленты
+    попадают посты, написанные автором за лимитом рассылки, если он с
+    тех пор опустился под лимит: при отписке ленты не трогаются, иначе
+    одна отписка писала бы в ленты всех подписчиков.
+    """
+    with transaction.atomic():
+        TimelineEntry.objects.all().delete()
+        follows = Follow.objects.values_list('user_id', 'author_id')
+        for user_id, author_id in follows.iterator():
+            backfill(user_id, author_id)
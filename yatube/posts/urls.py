@@ -14,6 +14,10 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'),
     path('follow/', views.follow_index, name='follow_index'),
+    path('live/', views.live, name='live'),
+    path(
+        'follow/live/', views.live, {'follow': True}, name='follow_live'),
+    path('search/', views.search, name='search'),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
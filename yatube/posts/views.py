@@ -1,25 +1,36 @@
 from django.contrib.auth import get_user_model
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.conf import settings
-
+from django.http import (
+    Http404,
+    HttpResponseForbidden,
+    StreamingHttpResponse,
+)
+
+from .cache import cache_anonymous_page, get_profile
+from .counters import get_author_stats, get_group_stats
+from .feeds import (
+    author_feed,
+    follow_feed,
+    group_feed,
+    index_feed,
+    paginate,
+    post_detail_queryset,
+)
 from .forms import PostForm, CommentForm
+from .graph import is_following
+from .live import LiveFeed, parse_cursor, publish_new_post
 from .models import Post, Group, User, Follow
+from .search import search_page
 
 User = get_user_model()
 
 
-def paginator(request, object_list, per_page):
-    paginate = Paginator(object_list, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginate.get_page(page_number)
-    return page_obj
-
-
+@cache_anonymous_page
 def index(request):
-    posts = Post.objects.select_related('author', 'group')
-    page_obj = paginator(request, posts, settings.SORT_POSTS)
+    posts = index_feed()
+    page_obj = paginate(request, posts, settings.SORT_POSTS)
     template = 'posts/index.html'
     context = {
         'posts': posts,
@@ -28,33 +39,40 @@ def index(request):
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.groups.select_related('author')
-    page_obj = paginator(request, posts, settings.SORT_POSTS)
+    group = get_object_or_404(
+        Group.objects.select_related('stats'), slug=slug)
+    posts = group_feed(group)
+    page_obj = paginate(request, posts, settings.SORT_POSTS)
     template = 'posts/group_list.html'
     context = {
         'group': group,
+        'group_stats': get_group_stats(group),
         'posts': posts,
         'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
+@cache_anonymous_page
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group')
-    count = posts.count()
-    following = request.user.is_authenticated and Follow.objects.filter(
-        user=request.user,
-        author=author
-    )
-    page_obj = paginator(request, posts, settings.SORT_POSTS)
+    summary = get_profile(username)
+    if summary is None:
+        raise Http404
+    author, author_stats, latest_post_id = summary
+    # Без постов лента пуста и без запроса.
+    posts = author_feed(author) if latest_post_id else Post.objects.none()
+    page_obj = paginate(request, posts, settings.SORT_POSTS)
     context = {
         'page_obj': page_obj,
-        'count': count,
+        'count': author_stats.posts_count,
+        'author_stats': author_stats,
         'author': author,
-        'following': following,
+        'following': (
+            request.user.is_authenticated
+            and is_following(request.user.pk, author.pk)
+        ),
     }
 
     template = 'posts/profile.html'
@@ -63,11 +81,11 @@ def profile(request, username):
 
 
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(post_detail_queryset(), pk=post_id)
     post_title = post.text[:30]
     form = CommentForm(request.POST or None)
     author = post.author
-    author_posts = author.posts.all().count()
+    author_posts = get_author_stats(author).posts_count
     comments = post.comments.select_related('author')
     context = {
         'post': post,
@@ -90,6 +108,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        publish_new_post()
         return redirect('posts:profile', request.user)
     template = 'posts/create_post.html'
     context = {'form': form}
@@ -107,8 +126,7 @@ def post_edit(request, post_id):
     if post.author != request.user:
         return redirect('posts:post_detail', post_id)
     if form.is_valid():
-        edited_post = form.save()
-        edited_post.save()
+        form.save()
         return redirect('posts:post_detail', post_id)
     context = {
         'form': form,
@@ -133,18 +151,50 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginator(request, post_list, settings.SORT_POSTS)
+    post_list = follow_feed(request.user)
+    page_obj = paginate(request, post_list, settings.SORT_POSTS)
     context = {
         'page_obj': page_obj,
     }
     return render(request, 'posts/follow.html', context)
 
 
+def live(request, follow=False):
+    if follow and not request.user.is_authenticated:
+        return HttpResponseForbidden()
+    feed = follow_feed(request.user) if follow else index_feed()
+    after = parse_cursor(
+        request.META.get('HTTP_LAST_EVENT_ID', request.GET.get('after')))
+    live_feed = LiveFeed(feed, after)
+    response = StreamingHttpResponse(
+        live_feed, content_type='text/event-stream')
+    # Под ASGI поток отдаётся из событийного цикла (см. core.asgi).
+    response.async_streaming_content = live_feed
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_obj = search_page(
+        query,
+        settings.SORT_POSTS,
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    context = {
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    if author != request.user:
+    if author != request.user and not is_following(
+            request.user.pk, author.pk):
         Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:profile', username)
 
@@ -0,0 +1,13 @@
+// Новые посты появляются вверху ленты без перезагрузки страницы:
+// сервер присылает их карточки событиями post (см. posts.live).
+(function () {
+  var feed = document.querySelector('[data-live-feed]');
+  if (!feed || !window.EventSource) {
+    return;
+  }
+  var source = new EventSource(feed.getAttribute('data-live-feed'));
+  source.addEventListener('post', function (event) {
+    var post = JSON.parse(event.data);
+    feed.insertAdjacentHTML('afterbegin', post.html);
+  });
+})();
@@ -48,12 +48,18 @@ INSTALLED_APPS = [
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
+    'rest_framework',
     'sorl.thumbnail',
     'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.QueryCaptureMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ConnectionTimingMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -88,13 +94,53 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# SQLite настраивается бэкендом core.backends.sqlite3: WAL, чтобы
+# читатели не ждали писателей, и BEGIN IMMEDIATE, чтобы писатели ждали
+# друг друга busy_timeout вместо ошибки «database is locked».
+# Соединение живёт CONN_MAX_AGE секунд и проверяется перед повторным
+# использованием; многопоточным серверам можно включить пул pool_size.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 268435456,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+            'pool_size': 0,
+        },
     }
 }
 
+# Реплики только для чтения (core.routers.ReplicaRouter): с них читают
+# GET-запросы, кроме REPLICA_STICKY_SECONDS секунд после записи
+# пользователя. Локально реплику можно проверить копией файла базы:
+#     sqlite3 db.sqlite3 ".backup replica.sqlite3"
+#     YATUBE_READ_REPLICAS=replica.sqlite3 python manage.py runserver
+# (несколько файлов — через os.pathsep).
+DATABASE_REPLICAS = []
+for number, path in enumerate(filter(
+        None, os.environ.get('YATUBE_READ_REPLICAS', '').split(os.pathsep))):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'NAME': os.path.join(BASE_DIR, path),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -144,14 +190,126 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Кэш хранится в файлах SQLite (core.cache.SQLiteCache) и общий для всех
+# воркеров на сервере: попадания и сброс поколений видны каждому процессу.
+CACHE_DIR = os.path.join(BASE_DIR, 'cache')
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'default.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Карточки постов ({% cache %} в includes/post_pattern.html) живут
+    # отдельно, чтобы их вытеснение не задевало остальной кэш.
+    'template_fragments': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'template_fragments.sqlite3'),
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
 }
 
+# Тесты подменяют кэш и метрики на базы в памяти и не перехватывают
+# SQL выборочно (core.testing).
+TEST_RUNNER = 'core.testing.TestRunner'
+
+# Метрики запросов (core.metrics) для Prometheus на /metrics: общий для
+# воркеров файл, как у кэша, и как часто процесс дописывает в него свои
+# наблюдения (секунды). /metrics отвечает только на заголовок
+# Authorization: Bearer с токеном из окружения; без токена — никому:
+#     YATUBE_METRICS_TOKEN=... python manage.py runserver
+METRICS_LOCATION = os.path.join(CACHE_DIR, 'metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = 5
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+
+# Выборочный перехват SQL (core.queries): доля запросов, порог
+# медленного запроса (секунды), с какого повтора одинаковый запрос
+# считается N+1 и сколько секунд действует токен заголовка
+# X-Query-Capture.
+QUERY_CAPTURE_SAMPLE_RATE = 0.01
+QUERY_CAPTURE_SLOW_SECONDS = 0.1
+QUERY_CAPTURE_REPEAT_THRESHOLD = 3
+QUERY_CAPTURE_TOKEN_AGE = 24 * 60 * 60
+
 SORT_POSTS = 10
 
+# JSON API только для чтения (приложение api): компактный JSON без
+# браузерного интерфейса, вход по JWT или по сессии сайта.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.AllowAny',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+}
+
+# Время жизни (в секундах) кэша страниц для анонимных посетителей по
+# имени маршрута; маршруты без записи не кэшируются.
+PAGE_CACHE_TIMEOUTS = {
+    'posts:index': 20,
+    'posts:group_list': 60,
+    'posts:profile': 60,
+}
+# Шапка профиля (posts.cache) сбрасывается при записи; время жизни —
+# страховка от пропущенного сброса.
+PROFILE_CACHE_TIMEOUT = 300
+# Граф подписок (posts.graph): время жизни массивов в общем кэше и
+# сколько массивов процесс держит в памяти.
+GRAPH_CACHE_TIMEOUT = 24 * 60 * 60
+GRAPH_LOCAL_SIZE = 10000
+
+# Миниатюры изображений постов делаются в фоне пулом из
+# POST_THUMBNAIL_WORKERS потоков (0 — сразу, в том же запросе).
+POST_THUMBNAIL_GEOMETRY = '960x339'
+POST_THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+POST_THUMBNAIL_WORKERS = 2
+# Варианты изображения для <picture>/srcset: ширины в пикселях и форматы
+# по убыванию предпочтения; форматы, которые не умеет сохранять
+# установленный Pillow (AVIF до 11.2), пропускаются.
+POST_IMAGE_WIDTHS = (320, 640, 960)
+POST_IMAGE_FORMATS = ('AVIF', 'WEBP')
+POST_IMAGE_QUALITY = {'AVIF': 50, 'WEBP': 75}
+
+# Под ASGI (yatube/asgi.py, core.asgi) представления выполняются в пуле
+# из стольких потоков; у каждого потока своё соединение с базой.
+ASGI_THREADS = 8
+
+# Живое обновление лент (posts.live): проверка ленты без событий раз в
+# LIVE_FEED_HEARTBEAT секунд, длительность одного потока под ASGI, пауза
+# перед переподключением EventSource (мс) под ASGI и под WSGI, где
+# каждое подключение — один опрос, постов за запрос.
+LIVE_FEED_HEARTBEAT = 10
+LIVE_FEED_ASYNC_SECONDS = 600
+LIVE_FEED_RETRY = 3000
+LIVE_FEED_POLL_RETRY = 15000
+LIVE_FEED_BATCH = 20
+
+# Полнотекстовый поиск (posts.search): веса bm25 для текста поста и
+# текстов комментариев; размер пачки при пересборке индекса.
+SEARCH_RANK_WEIGHTS = (4.0, 1.0)
+SEARCH_BATCH_SIZE = 500
+
+# Импорт постов и комментариев из NDJSON (posts.importer): строк в
+# одной пачке bulk_create и одной транзакции.
+IMPORT_BATCH_SIZE = 500
+
+# Синтетические данные (posts.seeding, команда seed_yatube): строк в
+# одной пачке bulk_create и одной транзакции.
+SEED_BATCH_SIZE = 5000
+
+# Выгрузка таблиц (posts.exporter): строк, читаемых из базы за раз.
+EXPORT_CHUNK_SIZE = 2000
+
+# Лента подписок: авторам с числом подписчиков больше лимита посты
+# по лентам не рассылаются, читатели забирают их напрямую.
+TIMELINE_FANOUT_LIMIT = 5000
+TIMELINE_BACKFILL = 200
+TIMELINE_BATCH_SIZE = 500
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 INTERNAL_IPS = [